@@ -0,0 +1,97 @@
+"""Benchmark one NYTAPI instance shared between threads
+
+Every thread makes requests to the stub API, which responds with a fixed
+latency. Throughput should scale linearly with the number of threads, until
+the quota (if set) is reached. Run from the root of the repository with:
+    python benchmarks/contention.py --threads 1 2 4 8 16 32 --latency 0.05
+"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+# Import standard Python dependencies
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pynytimes import Quota  # noqa: E402
+from stub_server import StubProcess  # noqa: E402
+
+
+class _PoolFullCounter(logging.Handler):
+    """Counts the "Connection pool is full" warnings of urllib3"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord):
+        if "Connection pool is full" in record.getMessage():
+            self.count += 1
+
+
+def run(
+    server: StubProcess,
+    threads: int,
+    requests: int,
+    pool_maxsize: int,
+    per_minute: Optional[int],
+) -> dict[str, Any]:
+    """Make requests from threads with one shared instance"""
+    counter = _PoolFullCounter()
+    logger = logging.getLogger("urllib3.connectionpool")
+    logger.addHandler(counter)
+
+    nyt = server.client(pool_maxsize=pool_maxsize, quota=Quota(per_minute=per_minute))
+    nyt.section_list()  # Open the first connection
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: nyt.section_list(), range(requests)))
+    seconds = time.perf_counter() - start
+
+    logger.removeHandler(counter)
+    nyt.close()
+    return {
+        "threads": threads,
+        "requests_per_second": requests / seconds,
+        "pool_full_warnings": counter.count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=20, help="Per thread")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--pool-maxsize", type=int, default=None)
+    parser.add_argument("--per-minute", type=int, default=None)
+    args = parser.parse_args()
+
+    with StubProcess(archive_docs=0, latency=args.latency) as server:
+        print(f"{'threads':>8}{'req/s':>10}{'speedup':>10}{'pool full':>11}")
+        base = None
+        for threads in args.threads:
+            result = run(
+                server,
+                threads,
+                threads * args.requests,
+                args.pool_maxsize or max(threads, 1),
+                args.per_minute,
+            )
+            base = base or result["requests_per_second"]
+            print(
+                f"{threads:>8}{result['requests_per_second']:>10.1f}"
+                f"{result['requests_per_second'] / base:>10.2f}"
+                f"{result['pool_full_warnings']:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark the memory of archive metadata kept in memory
+
+Loads archive months from the stub API with and without intern_strings,
+and measures the memory that is still used by the loaded articles. Run from
+the root of the repository with:
+    python benchmarks/memory.py --months 3 --archive-docs 20000
+"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any
+
+# Import standard Python dependencies
+import argparse
+import datetime
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubProcess  # noqa: E402
+
+
+def run(server: StubProcess, months: int, intern_strings: bool) -> dict[str, Any]:
+    """Load the months and measure the memory of the result"""
+    nyt = server.client(parse_dates=True, intern_strings=intern_strings)
+    dates = [datetime.date(2020, month, 1) for month in range(1, months + 1)]
+    nyt.archive_metadata_months(dates[:1])  # Warm up caches of the stub server
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = nyt.archive_metadata_months(dates)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nyt.close()
+    return {
+        "intern_strings": intern_strings,
+        "docs": sum(len(docs) for docs in result),
+        "seconds": seconds,
+        "resident_mb": current / 2**20,
+        "peak_mb": peak / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--archive-docs", type=int, default=20000)
+    args = parser.parse_args()
+
+    with StubProcess(args.archive_docs) as server:
+        print(f"{'intern':>8}{'docs':>10}{'seconds':>10}{'MB kept':>10}{'peak MB':>10}")
+        for intern_strings in [False, True]:
+            result = run(server, args.months, intern_strings)
+            print(
+                f"{str(result['intern_strings']):>8}{result['docs']:>10}"
+                f"{result['seconds']:>10.2f}{result['resident_mb']:>10.1f}"
+                f"{result['peak_mb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Benchmark the overhead of NYTAPI methods against the local stub API
+
+Measures requests per second, p50/p99 latency, CPU time per document (of
+this process and of worker processes) and peak memory of every method. Run
+from the root of the repository with:
+    python benchmarks/run.py --archive-docs 50000 --json results.json
+"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Callable
+
+# Import standard Python dependencies
+import argparse
+import datetime
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubProcess  # noqa: E402
+
+ARCHIVE_DATE = datetime.date(2020, 1, 1)
+ARCHIVE_MONTHS = [datetime.date(2020, month, 1) for month in range(1, 5)]
+
+# Name, function and number of repeats (relative to --repeat)
+CASES: list[tuple[str, Callable[[Any], Any], float]] = [
+    ("top_stories", lambda nyt: nyt.top_stories(), 1),
+    ("most_viewed", lambda nyt: nyt.most_viewed(), 1),
+    ("most_popular_all", lambda nyt: nyt.most_popular_all(), 0.2),
+    ("article_search", lambda nyt: nyt.article_search("q", results=100), 0.2),
+    ("archive_metadata", lambda nyt: nyt.archive_metadata(ARCHIVE_DATE), 0.05),
+    (
+        "archive_metadata_months",
+        lambda nyt: nyt.archive_metadata_months(
+            ARCHIVE_MONTHS, processes=os.cpu_count()
+        ),
+        0.02,
+    ),
+    ("best_sellers_list", lambda nyt: nyt.best_sellers_list(), 1),
+    ("best_sellers_overview", lambda nyt: nyt.best_sellers_overview(), 0.5),
+    ("book_reviews", lambda nyt: nyt.book_reviews(author="Jane Doe"), 1),
+    ("tag_query", lambda nyt: nyt.tag_query("obama", max_results=10), 1),
+]
+
+
+def _count_docs(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return sum(_count_docs(value) for value in result.values())
+    if isinstance(result, list):
+        # Results of multiple months are a list of months
+        return sum(
+            _count_docs(item) if isinstance(item, (list, type(None))) else 1
+            for item in result
+        )
+    return 1
+
+
+def _children_cpu() -> float:
+    # Only includes worker processes that ended
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _requests(nyt: Any) -> int:
+    endpoints = nyt.metrics.snapshot()["endpoints"].values()
+    return sum(endpoint["requests"] for endpoint in endpoints)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(percentile / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def benchmark(
+    name: str, function: Callable[[Any], Any], nyt: Any, repeat: int
+) -> dict[str, Any]:
+    """Run a method repeat times and measure it"""
+    function(nyt)  # Warm up caches of the stub server
+
+    # Stop the worker processes of the warm up, so the CPU time of their
+    # start and of the warm up is not counted
+    nyt.close()
+
+    requests_before = _requests(nyt)
+    latencies = []
+    docs = 0
+    cpu_start = time.process_time()
+    children_cpu_start = _children_cpu()
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        docs += _count_docs(function(nyt))
+        latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall_start
+
+    # The workers are reused by every call, stop them to measure their CPU
+    nyt.close()
+    cpu = time.process_time() - cpu_start
+    children_cpu = _children_cpu() - children_cpu_start
+    requests = _requests(nyt) - requests_before
+
+    # Measure memory separately, since tracing slows down everything
+    tracemalloc.start()
+    function(nyt)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "calls": repeat,
+        "requests": requests,
+        "docs": docs,
+        "requests_per_second": requests / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "cpu_us_per_doc": (cpu + children_cpu) / max(docs, 1) * 1e6,
+        "worker_cpu_us_per_doc": children_cpu / max(docs, 1) * 1e6,
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive-docs", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--no-parse-dates", action="store_true")
+    parser.add_argument("--only", nargs="*", help="Names of the methods to run")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    # Large numbers of results are requested on purpose
+    warnings.simplefilter("ignore")
+
+    results = []
+    with StubProcess(args.archive_docs, args.latency) as server:
+        nyt = server.client(parse_dates=not args.no_parse_dates)
+
+        header = (
+            f"{'method':<24}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+            f"{'cpu us/doc':>12}{'peak MB':>10}"
+        )
+        print(header)
+        print("-" * len(header))
+        for name, function, factor in CASES:
+            if args.only and name not in args.only:
+                continue
+
+            result = benchmark(name, function, nyt, max(int(args.repeat * factor), 1))
+            results.append(result)
+            print(
+                f"{name:<24}{result['requests_per_second']:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['cpu_us_per_doc']:>12.2f}{result['peak_memory_mb']:>10.1f}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "time": datetime.datetime.now().isoformat(),
+                    "python": sys.version,
+                    "arguments": vars(args),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
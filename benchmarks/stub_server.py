@@ -0,0 +1,542 @@
+"""Local stub of the New York Times API, serving synthetic payloads
+
+Run on its own with:
+    python benchmarks/stub_server.py --port 8000 --archive-docs 50000
+"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Callable, Optional
+
+# Import standard Python dependencies
+import argparse
+import datetime
+import gzip
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Import other dependencies
+from requests.adapters import HTTPAdapter
+
+ARCHIVE_DOCS = 50000
+TOP_STORIES = 40
+MOST_POPULAR = 20
+SEARCH_HITS = 2000
+RESULTS_SEARCH = 10
+BEST_SELLERS_BOOKS = 15
+BEST_SELLERS_LISTS = 55
+
+SECTIONS = ["U.S.", "World", "Business", "Opinion", "Arts", "Sports", "Style"]
+NEWS_DESKS = ["National", "Foreign", "Business", "OpEd", "Culture", "Sports"]
+MATERIALS = ["News", "Op-Ed", "Review", "Obituary (Obit)", "Letter"]
+KEYWORD_NAMES = ["subject", "persons", "organizations", "glocations"]
+WORDS = (
+    "the senate president market court election climate city school health "
+    "war trade vote budget police storm music film game season report"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _multimedia(rng: random.Random, count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "rank": 0,
+            "subtype": rng.choice(["xlarge", "thumbnail", "wide", "jumbo"]),
+            "caption": None,
+            "credit": None,
+            "type": "image",
+            "url": f"images/2020/01/01/{rng.getrandbits(40):x}.jpg",
+            "height": rng.choice([75, 400, 600, 1365]),
+            "width": rng.choice([75, 600, 1050, 2048]),
+            "crop_name": rng.choice(["articleLarge", "thumbStandard"]),
+        }
+        for _ in range(count)
+    ]
+
+
+def make_doc(rng: random.Random, date: datetime.datetime, i: int) -> dict[str, Any]:
+    """Create a synthetic Archive or Article Search document"""
+    slug = "-".join(rng.choice(WORDS) for _ in range(5))
+    section_name = rng.choice(SECTIONS)
+    section = section_name.lower().strip(".")
+    doc_id = f"{rng.getrandbits(32):08x}-{rng.getrandbits(16):04x}-{i:012x}"
+    return {
+        "abstract": _text(rng, 25),
+        "web_url": f"https://www.nytimes.com/{date:%Y/%m/%d}/{section}/{slug}.html",
+        "snippet": _text(rng, 25),
+        "lead_paragraph": _text(rng, 45),
+        "print_section": "A",
+        "print_page": str(rng.randint(1, 30)),
+        "source": "The New York Times",
+        "multimedia": _multimedia(rng, rng.randint(0, 8)),
+        "headline": {
+            "main": _text(rng, 9),
+            "kicker": None,
+            "content_kicker": None,
+            "print_headline": _text(rng, 7),
+            "name": None,
+            "seo": None,
+            "sub": None,
+        },
+        "keywords": [
+            {
+                "name": rng.choice(KEYWORD_NAMES),
+                "value": rng.choice(WORDS).capitalize(),
+                "rank": rank,
+                "major": "N",
+            }
+            for rank in range(1, rng.randint(2, 9))
+        ],
+        "pub_date": (date + datetime.timedelta(minutes=i % 1440)).strftime(
+            "%Y-%m-%dT%H:%M:%S+0000"
+        ),
+        "document_type": "article",
+        "news_desk": rng.choice(NEWS_DESKS),
+        "section_name": section_name,
+        "byline": {
+            "original": "By Jane Doe",
+            "person": [
+                {
+                    "firstname": "Jane",
+                    "middlename": None,
+                    "lastname": "Doe",
+                    "qualifier": None,
+                    "title": None,
+                    "role": "reported",
+                    "organization": "",
+                    "rank": 1,
+                }
+            ],
+            "organization": None,
+        },
+        "type_of_material": rng.choice(MATERIALS),
+        "_id": f"nyt://article/{doc_id}",
+        "word_count": rng.randint(100, 3000),
+        "uri": f"nyt://article/{doc_id}",
+    }
+
+
+def make_story(rng: random.Random, i: int) -> dict[str, Any]:
+    """Create a synthetic Top Stories or Most Popular result"""
+    date = datetime.datetime(2023, 1, 1) + datetime.timedelta(minutes=i)
+    section = rng.choice(SECTIONS)
+    return {
+        "section": section,
+        "subsection": "",
+        "title": _text(rng, 9),
+        "abstract": _text(rng, 25),
+        "url": f"https://www.nytimes.com/2023/01/01/{section.lower()}/{i}.html",
+        "uri": f"nyt://article/{rng.getrandbits(64):016x}",
+        "byline": "By Jane Doe",
+        "item_type": "Article",
+        "updated_date": date.strftime("%Y-%m-%dT%H:%M:%S-05:00"),
+        "created_date": date.strftime("%Y-%m-%dT%H:%M:%S-05:00"),
+        "published_date": date.strftime("%Y-%m-%dT%H:%M:%S-05:00"),
+        "updated": date.strftime("%Y-%m-%d %H:%M:%S"),
+        "material_type_facet": "",
+        "kicker": "",
+        "des_facet": [rng.choice(WORDS) for _ in range(3)],
+        "org_facet": [],
+        "per_facet": [],
+        "geo_facet": [],
+        "multimedia": _multimedia(rng, 3),
+        "media": [],
+        "short_url": "",
+    }
+
+
+def make_book(rng: random.Random, rank: int) -> dict[str, Any]:
+    isbn = f"978{rng.randint(0, 10**10 - 1):010d}"
+    return {
+        "rank": rank,
+        "rank_last_week": rng.randint(0, 15),
+        "weeks_on_list": rng.randint(0, 50),
+        "primary_isbn10": isbn[3:],
+        "primary_isbn13": isbn,
+        "publisher": "Doubleday",
+        "description": _text(rng, 20),
+        "title": _text(rng, 3).upper(),
+        "author": "Jane Doe",
+        "book_image": f"https://storage.googleapis.com/du-prd/books/{isbn}.jpg",
+        "amazon_product_url": f"https://www.amazon.com/dp/{isbn[3:]}",
+        "isbns": [{"isbn10": isbn[3:], "isbn13": isbn}],
+    }
+
+
+def _sunday(date: datetime.date) -> datetime.date:
+    return date - datetime.timedelta(days=(date.weekday() + 1) % 7)
+
+
+class StubAPI:
+    """Creates the payloads of all endpoints, archive months are cached"""
+
+    def __init__(self, archive_docs: int = ARCHIVE_DOCS, seed: int = 0):
+        self.archive_docs = archive_docs
+        self.seed = seed
+        self._archive: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.routes: list[tuple[re.Pattern, Callable[..., Any]]] = [
+            (re.compile(r"/svc/topstories/v2/(\w+)\.json"), self.top_stories),
+            (re.compile(r"/svc/mostpopular/v2/(.+)\.json"), self.most_popular),
+            (re.compile(r"/svc/archive/v1/(\d+)/(\d+)\.json"), self.archive),
+            (re.compile(r"/svc/search/v2/articlesearch\.json"), self.search),
+            (re.compile(r"/svc/books/v3/lists/names\.json"), self.lists),
+            (re.compile(r"/svc/books/v3/lists/overview\.json"), self.overview),
+            (
+                re.compile(r"/svc/books/v3/lists/([\w-]+)/([\w-]+)\.json"),
+                self.best_sellers_list,
+            ),
+            (re.compile(r"/svc/books/v3/reviews\.json"), self.reviews),
+            (re.compile(r"/svc/suggest/v1/timestags"), self.tags),
+            (re.compile(r"/svc/news/v3/content/(\w+)/([\w-]+)\.json"), self.latest),
+            (re.compile(r"/svc/news/v3/content/section-list\.json"), self.sections),
+        ]
+
+    def __rng(self, *key: Any) -> random.Random:
+        return random.Random(f"{self.seed}/{'/'.join(map(str, key))}")
+
+    def response(self, path: str, params: dict[str, str]) -> Optional[bytes]:
+        """Get the JSON body of a request, None if the endpoint does not
+        exist"""
+        for pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                result = handler(params, *match.groups())
+                if isinstance(result, bytes):
+                    return result
+                return json.dumps(result).encode()
+
+        return None
+
+    def top_stories(self, params: dict[str, str], section: str) -> dict[str, Any]:
+        rng = self.__rng("top_stories", section)
+        results = [make_story(rng, i) for i in range(TOP_STORIES)]
+        return {"status": "OK", "num_results": len(results), "results": results}
+
+    def most_popular(self, params: dict[str, str], name: str) -> dict[str, Any]:
+        rng = self.__rng("most_popular", name)
+        results = [make_story(rng, i) for i in range(MOST_POPULAR)]
+
+        # Most popular results only have the date of publication
+        for result in results:
+            result["published_date"] = result["published_date"][:10]
+        return {"status": "OK", "num_results": len(results), "results": results}
+
+    def archive(self, params: dict[str, str], year: str, month: str) -> bytes:
+        key = f"{year}/{month}"
+        with self._lock:
+            if key not in self._archive:
+                rng = self.__rng("archive", key)
+                date = datetime.datetime(int(year), int(month), 1)
+                docs = [make_doc(rng, date, i) for i in range(self.archive_docs)]
+                self._archive[key] = json.dumps(
+                    {
+                        "copyright": "Copyright (c) 2023 The New York Times.",
+                        "response": {"docs": docs, "meta": {"hits": len(docs)}},
+                    }
+                ).encode()
+
+            return self._archive[key]
+
+    def search(self, params: dict[str, str]) -> dict[str, Any]:
+        page = int(params.get("page", 0))
+        rng = self.__rng("search", params.get("q"), params.get("fq"), page)
+        date = datetime.datetime(2023, 1, 1)
+        docs = [
+            make_doc(rng, date, page * RESULTS_SEARCH + i)
+            for i in range(RESULTS_SEARCH)
+            if page * RESULTS_SEARCH + i < SEARCH_HITS
+        ]
+        return {
+            "status": "OK",
+            "response": {
+                "docs": docs,
+                "meta": {"hits": SEARCH_HITS, "offset": page * 10, "time": 30},
+            },
+        }
+
+    def lists(self, params: dict[str, str]) -> dict[str, Any]:
+        results = [
+            {
+                "list_name": f"List {i}",
+                "display_name": f"List {i}",
+                "list_name_encoded": f"list-{i}",
+                "oldest_published_date": "2008-06-08",
+                "newest_published_date": "2023-01-01",
+                "updated": "WEEKLY",
+            }
+            for i in range(BEST_SELLERS_LISTS)
+        ]
+        return {"status": "OK", "num_results": len(results), "results": results}
+
+    def __list(self, name: str, date: datetime.date) -> dict[str, Any]:
+        published_date = _sunday(date)
+        rng = self.__rng("list", name, published_date)
+        return {
+            "list_name": name,
+            "list_name_encoded": name,
+            "display_name": name,
+            "updated": "WEEKLY",
+            "bestsellers_date": str(published_date - datetime.timedelta(days=15)),
+            "published_date": str(published_date),
+            "previous_published_date": str(published_date - datetime.timedelta(7)),
+            "next_published_date": "",
+            "books": [make_book(rng, i) for i in range(1, BEST_SELLERS_BOOKS + 1)],
+        }
+
+    def best_sellers_list(
+        self, params: dict[str, str], date: str, name: str
+    ) -> dict[str, Any]:
+        _date = (
+            datetime.date(2023, 1, 1)
+            if date == "current"
+            else datetime.date.fromisoformat(date)
+        )
+        return {"status": "OK", "results": self.__list(name, _date)}
+
+    def overview(self, params: dict[str, str]) -> dict[str, Any]:
+        date = datetime.date.fromisoformat(params.get("published_date", "2023-01-01"))
+        lists = [self.__list(f"list-{i}", date) for i in range(BEST_SELLERS_LISTS)]
+        return {
+            "status": "OK",
+            "results": {"published_date": str(_sunday(date)), "lists": lists},
+        }
+
+    def reviews(self, params: dict[str, str]) -> dict[str, Any]:
+        rng = self.__rng("reviews", sorted(params.items()))
+        results = [
+            {
+                "url": "https://www.nytimes.com/2020/01/01/books/review.html",
+                "publication_dt": "2020-01-01",
+                "byline": "Jane Doe",
+                "book_title": params.get("title", "Title"),
+                "book_author": params.get("author", "Author"),
+                "summary": _text(rng, 20),
+                "isbn13": [params.get("isbn", "9780000000000")],
+            }
+            for _ in range(rng.randint(0, 3))
+        ]
+        return {"status": "OK", "num_results": len(results), "results": results}
+
+    def tags(self, params: dict[str, str]) -> list[Any]:
+        query = params.get("query", "")
+        tags = [f"{query.capitalize()}{word} (Des)" for word in WORDS]
+        if "max" in params:
+            tags = tags[: int(params["max"])]
+        return [query, tags]
+
+    def sections(self, params: dict[str, str]) -> dict[str, Any]:
+        results = [
+            {"section": section.lower(), "display_name": section}
+            for section in SECTIONS
+        ]
+        return {"status": "OK", "num_results": len(results), "results": results}
+
+    def latest(
+        self, params: dict[str, str], source: str, section: str
+    ) -> dict[str, Any]:
+        return self.top_stories(params, section)
+
+
+class StubServer:
+    """Runs the stub API in a background thread
+
+    Example:
+        with StubServer() as server:
+            nyt = server.client()
+            nyt.top_stories()
+    """
+
+    def __init__(
+        self,
+        archive_docs: int = ARCHIVE_DOCS,
+        latency: float = 0.0,
+        port: int = 0,
+        gzip_level: int = 6,
+    ):
+        self.api = StubAPI(archive_docs)
+        self.latency = latency
+        self.gzip_level = gzip_level
+        self._compressed: dict[bytes, bytes] = {}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self.__handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def compress(self, body: bytes) -> bytes:
+        # Compress every payload only once, like a CDN would
+        compressed = self._compressed.get(body)
+        if compressed is None:
+            compressed = gzip.compress(body, self.gzip_level)
+            self._compressed[body] = compressed
+        return compressed
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, without this every
+            # response waits for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = server.api.response(url.path, params)
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if body is None:
+                    self.send_response(404)
+                    body = b'{"fault": "not found"}'
+                else:
+                    self.send_response(200)
+
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = server.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> StubServer:
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> StubServer:
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def mount(self, nyt: Any) -> None:
+        """Send all requests of a NYTAPI instance to this server"""
+        mount_stub(nyt, self.url)
+
+    def client(self, **kwargs: Any) -> Any:
+        """Create a NYTAPI instance that uses this server"""
+        return stub_client(self.url, **kwargs)
+
+
+def _serve(connection: Any, archive_docs: int, latency: float):
+    server = StubServer(archive_docs, latency)
+    connection.send(server.url)
+    server.httpd.serve_forever()
+
+
+class StubProcess:
+    """Runs the stub API in a separate process, so its CPU time and memory
+    are not measured together with the client
+
+    Example:
+        with StubProcess() as server:
+            nyt = server.client()
+    """
+
+    def __init__(self, archive_docs: int = ARCHIVE_DOCS, latency: float = 0.0):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._receiver = receiver
+        self.process = multiprocessing.Process(
+            target=_serve, args=(sender, archive_docs, latency), daemon=True
+        )
+        self.url = ""
+
+    def start(self) -> StubProcess:
+        self.process.start()
+        self.url = self._receiver.recv()
+        return self
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+    def __enter__(self) -> StubProcess:
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def mount(self, nyt: Any) -> None:
+        """Send all requests of a NYTAPI instance to this server"""
+        mount_stub(nyt, self.url)
+
+    def client(self, **kwargs: Any) -> Any:
+        """Create a NYTAPI instance that uses this server"""
+        return stub_client(self.url, **kwargs)
+
+
+def mount_stub(nyt: Any, url: str) -> None:
+    """Send all requests of a NYTAPI instance to the stub server at url,
+    keeping its backoff strategy"""
+    from pynytimes.api import BASE_URL
+
+    prefix = nyt.protocol + BASE_URL
+    retries = nyt.session.get_adapter(prefix).max_retries
+    adapter = StubAdapter(
+        url,
+        max_retries=retries,
+        pool_connections=nyt.pool_connections,
+        pool_maxsize=nyt.pool_maxsize,
+    )
+    nyt.session.mount(prefix, adapter)
+
+
+def stub_client(url: str, **kwargs: Any) -> Any:
+    """Create a NYTAPI instance that uses the stub server at url"""
+    from pynytimes import NYTAPI
+
+    nyt = NYTAPI("stub-key", **kwargs)
+    mount_stub(nyt, url)
+    return nyt
+
+
+class StubAdapter(HTTPAdapter):
+    """Transport adapter that sends all requests to the stub server"""
+
+    def __init__(self, url: str, **kwargs: Any):
+        self.url = url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        request.url = self.url + request.url[len(origin) :]
+        return super().send(request, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--archive-docs", type=int, default=ARCHIVE_DOCS)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubServer(args.archive_docs, args.latency, args.port)
+    print(f"Serving the stub New York Times API at {stub.url}")
+    stub.thread.run()
@@ -1,6 +1,37 @@
 """A Python 3 wrapper library for the New York Times API"""
 from .api import NYTAPI
+from .article_log import ArticleLog
+from .backfill import BackfillPlan
+from .batch import BatchResults
+from .cache import ResponseCache
+from .cassette import Cassette
+from .crawl import CrawlBackend, CrawlQueue
+from .deadline import BudgetExceededError, PartialResults
+from .metrics import Metrics
+from .pipeline import Pipeline
+from .quota import Quota, QuotaExceededError
+from .snapshots import SnapshotRecorder
+from .store import ArticleStore
+from .url_index import UrlIndex
 from .__version__ import __author__, __author_email__, __description__
 from .__version__ import __license__, __title__, __url__, __version__
 
-__all__ = ["NYTAPI"]
+__all__ = [
+    "NYTAPI",
+    "ArticleLog",
+    "ArticleStore",
+    "BackfillPlan",
+    "BatchResults",
+    "BudgetExceededError",
+    "Cassette",
+    "CrawlBackend",
+    "CrawlQueue",
+    "Metrics",
+    "PartialResults",
+    "Pipeline",
+    "Quota",
+    "QuotaExceededError",
+    "ResponseCache",
+    "SnapshotRecorder",
+    "UrlIndex",
+]
@@ -4,13 +4,23 @@
 from __future__ import annotations
 
 # Import standard Python dependencies
+import contextlib
 import datetime
 import warnings
 import math
-from typing import Any, Final, Literal, Optional, Union, TypedDict, cast
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Final, Iterator, Literal, Optional, Union
+from typing import TypedDict, cast
 
 # Import other dependencies
-from requests import Session
+from requests import Response, Session
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
@@ -18,7 +28,18 @@ from urllib3.util.retry import Retry
 from .__version__ import __title__, __version__
 
 # Import own dependencies
+from .backfill import BackfillPlan
+from .batch import BatchResults
+from .cache import ResponseCache
+from .deadline import BudgetExceededError, PartialResults, RequestBudget
+from .cassette import Cassette
 from .helpers import *
+from .metrics import BackoffRetry, Metrics, metrics_endpoint
+from .crawl import CrawlBackend, CrawlQueue, LEASE_SECONDS
+from .quota import Quota, QuotaExceededError, PriorityType, PRIORITIES
+from .quota import NYT_PER_DAY, NYT_PER_MINUTE
+from .store import ArticleStore, SEARCH_FILTERS as STORE_SEARCH_FILTERS
+from .url_index import UrlIndex
 
 # Define all URLs that are needed
 BASE_URL: Final = "api.nytimes.com/svc/"
@@ -35,6 +56,7 @@ BASE_SECTION_LIST: Final = BASE_URL + "news/v3/content/section-list.json"
 BASE_BOOK_REVIEWS: Final = BASE_BOOKS + "reviews.json"
 BASE_BEST_SELLERS_LISTS: Final = BASE_BOOKS + "lists/names.json"
 BASE_BEST_SELLERS_LIST: Final = BASE_BOOKS + "lists/"
+BASE_BEST_SELLERS_OVERVIEW: Final = BASE_BOOKS + "lists/overview.json"
 
 # Define Requests variables
 TIMEOUT: Final = (10, 30)
@@ -45,6 +67,14 @@ RETRY_STATUS_CODES = [429, 509]
 MAX_RETRIES = 10
 RESULTS_MOVIE = 20
 RESULTS_SEARCH = 10
+MAX_WORKERS = 4
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 32
+BEST_SELLERS_FINAL_AFTER = datetime.timedelta(days=14)
+BOOK_REVIEWS_NONE_TTL = datetime.timedelta(days=7)
+
+# Seconds a crawl worker waits before it tries to lease a unit again
+CRAWL_POLL_SECONDS = 5
 
 # Set type hints
 DateType = Union[datetime.date, datetime.datetime, None]
@@ -60,6 +90,7 @@ ArticleSearchOptions = TypedDict(
         "body": "list[str]",
         "headline": "list[str]",
         "fq": "str",
+        "fl": "list[str]",
     },
     total=False,
 )
@@ -77,6 +108,16 @@ MovieReviewsOptions = TypedDict(
 class NYTAPI:
     """
     New York Times API Class loads data from the NYT API.
+
+    An instance can be shared between threads. Set pool_maxsize to at least
+    the number of threads, so no thread has to open a new connection.
+
+    An instance can also be used in other processes. After a fork the child
+    opens its own connections, and pickling only keeps the configuration,
+    so it can be sent to spawned processes. A session you passed is not
+    pickled, the copy uses a new Session with the same user agent and
+    backoff. The copy also starts with new metrics and an empty tag index,
+    the metrics of this instance are not updated by it.
     """
 
     key: str
@@ -85,6 +126,13 @@ class NYTAPI:
     backoff: bool
     user_agent: str
     parse_dates: bool
+    intern_strings: bool
+    cache: Optional[ResponseCache]
+    tag_index: TagIndex
+    metrics: Metrics
+    quota: Quota
+    cassette: Optional[Cassette]
+    store: Optional[ArticleStore]
 
     # pylint: disable=too-many-arguments
 
@@ -96,6 +144,14 @@ class NYTAPI:
         backoff: bool = True,
         user_agent: Optional[str] = None,
         parse_dates: bool = False,
+        cache: Union[ResponseCache, str, None] = None,
+        metrics: Optional[Metrics] = None,
+        quota: Optional[Quota] = None,
+        cassette: Optional[Cassette] = None,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        intern_strings: bool = False,
+        store: Union[ArticleStore, str, None] = None,
     ):
         """Creates the New York Times API class.
 
@@ -104,20 +160,59 @@ class NYTAPI:
             Get your key at https://developer.nytimes.nl. Defaults to None.
             https (bool, optional): Optionally disable HTTPS, not advised.
             Defaults to True.
-            session (Session, optional): Use your own Session object. Defaults to None.
+            session (Session, optional): Use your own Session object, it is
+            not kept when the instance is pickled. Defaults to None.
             backoff (bool, optional): Optionally disable the automatic backoff,
             this is only advised if you implement your own. Defaults to True.
             user_agent (str, optional): Set your own user-agent. Defaults to None.
             parse_dates (bool, optional): Optionally parse all dates into datetime
             objects.
             It is advised to enable this. Defaults to False.
+            cache (Union[ResponseCache, str], optional): Cache, or location
+            of the cache database, where responses that never change are
+            stored (for example best sellers lists of past weeks).
+            Defaults to None.
+            metrics (Metrics, optional): Collect the metrics of all requests
+            in this object, for example to share it between multiple
+            instances. A pickled instance starts with new metrics. Defaults
+            to None, which creates a new Metrics object.
+            quota (Quota, optional): Quota of the API key, requests wait when
+            the per minute quota is used and fail when the daily quota or
+            budget is used. Defaults to None, which only counts requests.
+            cassette (Cassette, optional): Record all requests and responses
+            in a cassette, or replay the responses from a cassette without
+            using the network or quota. Defaults to None.
+            pool_connections (int, optional): Number of connection pools to
+            cache. Defaults to 10.
+            pool_maxsize (int, optional): Maximum number of connections kept
+            open in the pool, set this to at least the number of threads
+            sharing this instance. Defaults to 32.
+            intern_strings (bool, optional): Keep values that repeat a lot,
+            like section names and keywords, in memory only once. Advised
+            when you keep many articles in memory. Defaults to False.
+            store (Union[ArticleStore, str], optional): Store, or location
+            of the store database, where all loaded articles are stored so
+            they can be queried without using the API. Defaults to None.
         """
+        # Set before anything can raise, close is also called on deletion
+        # of an instance that failed to initialize
+        self._workers: Optional[tuple[ProcessPoolExecutor, int, int]] = None
+        self._workers_lock = threading.Lock()
         self.__set_key(key)
         self.__set_session(session)
         self.__set_parse_dates(parse_dates)
         self.__set_protocol(https)
+        self.__set_pool(pool_connections, pool_maxsize)
         self.__set_backoff(backoff)
         self.__set_user_agent(user_agent)
+        self.__set_cache(cache)
+        self.tag_index = TagIndex()
+        self._context = threading.local()
+        self.__set_metrics(metrics)
+        self.__set_quota(quota)
+        self.__set_cassette(cassette)
+        self.__set_intern_strings(intern_strings)
+        self.__set_store(store)
 
     def __set_key(self, key: Optional[str]):
         """Set key of the class
@@ -155,6 +250,8 @@ class NYTAPI:
         if not isinstance(session, Session):
             raise TypeError("Session needs to be a Session object")
 
+        # Remember the process that owns the connections of the session
+        self._pid = os.getpid()
         self.session = session
 
     def __set_parse_dates(self, parse_dates: bool):
@@ -174,15 +271,36 @@ class NYTAPI:
         else:
             self.protocol = "http://"
 
+    def __set_pool(self, pool_connections: int, pool_maxsize: int):
+        # Check the size of the connection pool
+        for name, value in [
+            ("pool_connections", pool_connections),
+            ("pool_maxsize", pool_maxsize),
+        ]:
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise TypeError(f"{name} needs to be int")
+            if value < 1:
+                raise ValueError(f"{name} needs to be at least 1")
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
     def __set_backoff(self, backoff: bool):
         # Set strategy to prevent HTTP 429 (Too Many Requests) errors
         if not isinstance(backoff, bool):
             raise TypeError("backoff needs to be bool")
 
+        self.backoff = backoff
+
+        # Keep the adapters of your own session if backoff is disabled
+        if not backoff and not self._local_session:
+            return
+
+        max_retries: Union[Retry, int] = 0
         if backoff:
             # Any to remove errors from type checker
             # FIXME maybe set this as a constant
-            backoff_strategy = Retry(
+            max_retries = BackoffRetry(
                 total=MAX_RETRIES,
                 backoff_factor=BACKOFF_FACTOR,
                 backoff_max=BACKOFF_MAX,
@@ -190,9 +308,13 @@ class NYTAPI:
                 backoff_jitter=BACKOFF_JITTER,
             )
 
-            adapter = HTTPAdapter(max_retries=backoff_strategy)
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=max_retries,
+        )
 
-            self.session.mount(self.protocol + BASE_URL, adapter)
+        self.session.mount(self.protocol + BASE_URL, adapter)
 
     def __set_user_agent(self, user_agent: Optional[str]):
         # Set header to show that this wrapper is used
@@ -202,35 +324,469 @@ class NYTAPI:
         if not isinstance(user_agent, str):
             raise TypeError("user_agent needs to be str")
 
+        self.user_agent = user_agent
         self.session.headers.update({"User-Agent": user_agent})
 
+    def __set_cache(self, cache: Union[ResponseCache, str, None]):
+        # Open the cache database if only the location is given
+        if isinstance(cache, str):
+            cache = ResponseCache(cache)
+
+        if not isinstance(cache, (ResponseCache, type(None))):
+            raise TypeError("cache needs to be ResponseCache, str or None")
+
+        self.cache = cache
+
+    def __set_metrics(self, metrics: Optional[Metrics]):
+        if metrics is None:
+            metrics = Metrics()
+
+        if not isinstance(metrics, Metrics):
+            raise TypeError("metrics needs to be Metrics or None")
+
+        self.metrics = metrics
+
+    def __set_quota(self, quota: Optional[Quota]):
+        if quota is None:
+            quota = Quota()
+
+        if not isinstance(quota, Quota):
+            raise TypeError("quota needs to be Quota or None")
+
+        quota.bind(self.key)
+        self.quota = quota
+
+    def __set_cassette(self, cassette: Optional[Cassette]):
+        if not isinstance(cassette, (Cassette, type(None))):
+            raise TypeError("cassette needs to be Cassette or None")
+
+        self.cassette = cassette
+
+    def __set_intern_strings(self, intern_strings: bool):
+        if not isinstance(intern_strings, bool):
+            raise TypeError("intern_strings needs to be bool")
+
+        self.intern_strings = intern_strings
+
+    def __set_store(self, store: Union[ArticleStore, str, None]):
+        # Open the store database if only the location is given
+        if isinstance(store, str):
+            store = ArticleStore(store)
+
+        if not isinstance(store, (ArticleStore, type(None))):
+            raise TypeError("store needs to be ArticleStore, str or None")
+
+        self.store = store
+
+    def __check_fork(self):
+        """Open new connection pools if this is a forked child process, the
+        connections of the inherited pools belong to the parent"""
+        if self._pid == os.getpid():
+            return
+
+        # Replace the pools of every adapter (also those of your own
+        # session), but never close the inherited pools, since that would
+        # close the connections of the parent
+        self._pid = os.getpid()
+        for adapter in self.session.adapters.values():
+            if isinstance(adapter, HTTPAdapter):
+                adapter.init_poolmanager(
+                    adapter._pool_connections,
+                    adapter._pool_maxsize,
+                    block=adapter._pool_block,
+                )
+                adapter.proxy_manager = {}
+
+        # A SQLite connection can not be used in multiple processes
+        if self.cache is not None and self.cache.path != ":memory:":
+            self.cache = ResponseCache(self.cache.path)
+
+        if self.store is not None and self.store.path != ":memory:":
+            self.store = ArticleStore(self.store.path)
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Only pickle the configuration. The session (also one you passed),
+        the metrics and the tag index are created again when unpickled."""
+        return {
+            "key": self.key,
+            "https": self.protocol == "https://",
+            "backoff": self.backoff,
+            "user_agent": self.user_agent,
+            "parse_dates": self.parse_dates,
+            "cache": self.cache,
+            "quota": self.quota,
+            "cassette": self.cassette,
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "intern_strings": self.intern_strings,
+            "store": self.store,
+        }
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__init__(**state)  # type:ignore
+
     def __enter__(self) -> NYTAPI:
         return self
 
+    @contextlib.contextmanager
+    def priority(self, priority: PriorityType) -> Iterator[None]:
+        """Make the requests of this thread with a priority. Requests that
+        wait for the quota are made in the order of their priority, so
+        interactive requests go before a bulk download with the same key.
+        Requests of bulk methods like archive_metadata_months get the
+        priority of the thread that calls them.
+
+        Example:
+            with nyt.priority("bulk"):
+                nyt.archive_metadata_months(dates)
+
+        Args:
+            priority (str): "interactive", "normal" or "bulk"
+
+        Raises:
+            ValueError: Priority is not one of the priorities
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Priority needs to be one of {list(PRIORITIES)}")
+
+        previous = self.__priority()
+        self._context.priority = priority
+        try:
+            yield
+        finally:
+            self._context.priority = previous
+
+    def __priority(self) -> PriorityType:
+        return getattr(self._context, "priority", "normal")
+
+    @contextlib.contextmanager
+    def __budget(
+        self, deadline: Optional[float], max_requests: Optional[int]
+    ) -> Iterator[None]:
+        """Bound the requests of this thread by a deadline and a maximum
+        number of requests, if one of them is set"""
+        previous = self.__current_budget()
+        if deadline is not None or max_requests is not None:
+            self._context.budget = RequestBudget(deadline, max_requests)
+
+        try:
+            yield
+        finally:
+            self._context.budget = previous
+
+    def __current_budget(self) -> Optional[RequestBudget]:
+        return getattr(self._context, "budget", None)
+
+    @contextlib.contextmanager
+    def __limits(self, limits: Quota) -> Iterator[None]:
+        """Count the requests of this thread in limits too, next to the
+        quota of the key"""
+        previous = self.__current_limits()
+        self._context.limits = limits
+        try:
+            yield
+        finally:
+            self._context.limits = previous
+
+    def __current_limits(self) -> Optional[Quota]:
+        return getattr(self._context, "limits", None)
+
+    def __quotas(self) -> list[Quota]:
+        limits = self.__current_limits()
+        return [self.quota] if limits is None else [self.quota, limits]
+
+    def __with_context(self, function: Callable[..., Any]) -> Callable[..., Any]:
+        """Run function with the priority, request budget and limits of this
+        thread, in another thread"""
+        priority = self.__priority()
+        budget = self.__current_budget()
+        limits = self.__current_limits()
+
+        def run(*args, **kwargs):
+            previous = self.__current_budget(), self.__current_limits()
+            self._context.budget, self._context.limits = budget, limits
+            try:
+                with self.priority(priority):
+                    return function(*args, **kwargs)
+            finally:
+                self._context.budget, self._context.limits = previous
+
+        return run
+
+    def __process_pool(self, processes: int) -> ProcessPoolExecutor:
+        """Get the pool of worker processes, it is started on first use and
+        reused until close, or until a call needs another number of
+        processes"""
+        with self._workers_lock:
+            if self._workers is not None:
+                workers, pool_processes, pid = self._workers
+                if pid != os.getpid():
+                    # The pool of the parent of a forked process is not used
+                    self._workers = None
+                elif pool_processes == processes:
+                    return workers
+                else:
+                    workers.shutdown(wait=False)
+
+            # Workers are spawned, forking while downloads run in threads is
+            # unsafe
+            context = multiprocessing.get_context("spawn")
+            workers = ProcessPoolExecutor(processes, mp_context=context)
+            self._workers = (workers, processes, os.getpid())
+            return workers
+
+    def __close_process_pool(self, wait: bool = True):
+        with self._workers_lock:
+            workers, self._workers = self._workers, None
+
+        if workers is not None and workers[2] == os.getpid():
+            workers[0].shutdown(wait=wait)
+
+    def __budget_result(
+        self,
+        future: Future,
+        budget: Optional[RequestBudget],
+        results: PartialResults,
+    ) -> Any:
+        """Get the result of a future before the deadline of the budget.
+        Returns None and marks the results partial if it was not loaded in
+        time, or the budget was exceeded."""
+        try:
+            return future.result(None if budget is None else budget.remaining())
+        except BudgetExceededError as error:
+            results.stop(error.reason)
+        except FutureTimeoutError:
+            results.stop("deadline")
+
+        return None
+
+    def __request(self, url: str, params: dict[str, Any]) -> Response:
+        """Make a request to the API and record its metrics"""
+        endpoint = metrics_endpoint(url, BASE_URL)
+
+        # Count the request in the budget of the call, if it has one
+        budget = self.__current_budget()
+        if budget is not None:
+            budget.take()
+
+        # Replayed responses do not use the network or quota, but do count
+        # towards the deadline
+        if self.cassette is not None and not self.cassette.recording:
+            cassette = self.cassette
+            start = time.perf_counter()
+            res = self.__before_deadline(
+                lambda: cassette.replay(url, params), budget
+            )
+            seconds = time.perf_counter() - start
+            self.metrics.record_request(
+                endpoint,
+                seconds,
+                status=res.status_code,
+                size=len(res.content),
+            )
+            self.__check_deadline(budget, seconds)
+            return res
+
+        # Wait until the quota (and the limits of a backfill) allow another
+        # request
+        priority = self.__priority()
+        quotas = self.__quotas()
+        waited = 0.0
+        try:
+            for quota in quotas:
+                waited += quota.acquire(
+                    priority, None if budget is None else budget.remaining()
+                )
+        except TimeoutError:
+            raise BudgetExceededError("deadline")
+
+        if waited > 0:
+            self.metrics.record_wait("quota", waited)
+
+        self.__check_fork()
+
+        start = time.perf_counter()
+        try:
+            res = self.__get(url, params, budget)
+        except Exception:
+            seconds = time.perf_counter() - start
+            self.metrics.record_request(endpoint, seconds)
+            self.metrics.record_priority(priority, waited, seconds)
+            raise
+
+        # The urllib3 response keeps track of the retries by the backoff
+        seconds = time.perf_counter() - start
+        self.metrics.record_priority(priority, waited, seconds)
+        retries = getattr(getattr(res.raw, "retries", None), "history", ())
+        for quota in quotas:
+            quota.add(len(retries))
+        self.metrics.record_request(
+            endpoint,
+            seconds,
+            status=res.status_code,
+            size=len(res.content),
+            retries=len(retries),
+        )
+
+        if self.cassette is not None:
+            self.cassette.record(url, params, res, seconds)
+
+        self.__check_deadline(budget, seconds)
+        return res
+
+    def __check_deadline(self, budget: Optional[RequestBudget], seconds: float):
+        """Record the seconds of a response in the budget, a response that
+        came after the deadline is not used"""
+        if budget is None:
+            return
+
+        budget.record(seconds)
+        if budget.remaining() == 0.0:
+            raise BudgetExceededError("deadline")
+
+    def __get(
+        self, url: str, params: dict[str, Any], budget: Optional[RequestBudget]
+    ) -> Response:
+        remaining = None if budget is None else budget.remaining()
+        if budget is None or remaining is None:
+            return self.__session_get(url, params, TIMEOUT)
+
+        # Retries that would sleep past the deadline are not made
+        deadline = budget.deadline
+        timeout = (min(TIMEOUT[0], remaining), min(TIMEOUT[1], remaining))
+
+        def get() -> Response:
+            BackoffRetry.set_deadline(deadline)
+            return self.__session_get(url, params, timeout)
+
+        return self.__before_deadline(get, budget)
+
+    def __before_deadline(
+        self, function: Callable[[], Response], budget: Optional[RequestBudget]
+    ) -> Response:
+        """Get a response, the wait for it is abandoned at the deadline of
+        the budget"""
+        remaining = None if budget is None else budget.remaining()
+        if remaining is None:
+            return function()
+
+        if remaining <= 0:
+            raise BudgetExceededError("deadline")
+
+        # Retries of the backoff can take longer than the deadline, so the
+        # response is loaded in a thread that is abandoned at the deadline
+        result: dict[str, Any] = {}
+
+        def get():
+            try:
+                result["response"] = function()
+            except Exception as error:
+                result["error"] = error
+
+        thread = threading.Thread(target=get, daemon=True)
+        thread.start()
+        thread.join(remaining)
+        if thread.is_alive():
+            raise BudgetExceededError("deadline")
+
+        if "error" in result:
+            raise result["error"]
+
+        return result["response"]
+
+    def __session_get(
+        self, url: str, params: dict[str, Any], timeout: tuple[float, float]
+    ) -> Response:
+        # The backoff sleeps before retries are throttling, like waiting for
+        # the quota
+        BackoffRetry.take_slept()
+        try:
+            return self.session.get(
+                f"{self.protocol}{url}",
+                params=params,
+                timeout=timeout,
+            )
+        finally:
+            slept = BackoffRetry.take_slept()
+            if slept > 0:
+                self.metrics.record_wait("backoff", slept)
+
     def __load_data(
         self,
         url: str,
         options: Optional[dict[str, Any]] = None,
         location: Optional[list[str]] = None,
+        cache: bool = False,
     ) -> Union[list[dict[str, Any]], dict[str, Any]]:
-        """This function loads the data for the wrapper for most API use cases"""
+        """This function loads the data for the wrapper for most API use cases,
+        responses that never change can be cached by setting cache"""
         # Set API key in query parameters
         params = {"api-key": self.key}
 
         # Add options to query parameters
         params.update(options or {})  # add empty list if None
 
+        # Load the data from the cache if it has been loaded before
+        cache_key = None
+        if cache and self.cache is not None:
+            cache_key = ResponseCache.key(url, params)
+            cached_res = self.cache.get(cache_key)
+            if cached_res is not None:
+                self.metrics.record_cache_hit(metrics_endpoint(url, BASE_URL))
+                return self.__intern_strings(get_from_location(cached_res, location))
+
         # Load the data from the API, raise error if there's an invalid status
         # code
-        res = self.session.get(
-            f"{self.protocol}{url}",
-            params=params,
-            timeout=TIMEOUT,
+        res = self.__request(url, params)
+        raise_for_status(res)
+
+        start = time.perf_counter()
+        parsed_res: dict[str, Any] = res.json()
+        self.metrics.record_decode(
+            metrics_endpoint(url, BASE_URL), time.perf_counter() - start
         )
 
+        if cache_key is not None:
+            self.cache.set(cache_key, parsed_res)  # type:ignore
+
+        return self.__intern_strings(get_from_location(parsed_res, location))
+
+    def __intern_strings(self, results: Any) -> Any:
+        """Keep values that repeat a lot in memory only once"""
+        if not self.intern_strings:
+            return results
+
+        start = time.perf_counter()
+        intern_strings(results)
+        self.metrics.record_parse("intern", time.perf_counter() - start)
+        return results
+
+    def __load_raw(self, url: str, options: Optional[dict[str, Any]] = None) -> bytes:
+        """Load the undecoded response, for example to decode it in another
+        process"""
+        params = {"api-key": self.key}
+        params.update(options or {})
+
+        res = self.__request(url, params)
         raise_for_status(res)
-        parsed_res: dict[str, Any] = res.json()
-        return get_from_location(parsed_res, location)
+        return res.content
+
+    def __load_many(
+        self, requests: list[dict[str, Any]], return_exceptions: bool = False
+    ) -> list[Any]:
+        """Load the data of multiple requests concurrently, every request is
+        a dict with the arguments of __load_data. Results are returned in
+        the same order as the requests. Set return_exceptions to get the
+        exception of a failed request as its result, instead of raising it."""
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(self.__with_context(self.__load_data), **request)
+                for request in requests
+            ]
+            if not return_exceptions:
+                return [future.result() for future in futures]
+
+            return [future.exception() or future.result() for future in futures]
 
     def __parse_dates(
         self,
@@ -240,18 +796,53 @@ class NYTAPI:
     ) -> list[dict[str, Any]]:
         """Parse dates to datetime"""
         # Don't parse if parse_dates is False
-        return (
-            parse_dates(articles, date_type, locations)
-            if self.parse_dates
-            else articles
-        )
+        if not self.parse_dates:
+            return articles
+
+        start = time.perf_counter()
+        parsed_articles = parse_dates(articles, date_type, locations)
+        self.metrics.record_parse("dates", time.perf_counter() - start)
+        return parsed_articles
 
-    def top_stories(self, section: str = "home") -> list[dict[str, Any]]:
+    def __store(
+        self,
+        articles: list[dict[str, Any]],
+        month: Optional[datetime.date] = None,
+    ):
+        """Add the articles to the store, if there is one. Set month if these
+        are all articles of that month."""
+        if self.store is None:
+            return
+
+        start = time.perf_counter()
+        self.store.add(articles)
+        if month is not None:
+            self.store.add_month(month)
+        self.metrics.record_parse("store", time.perf_counter() - start)
+
+    def __project(
+        self, articles: list[dict[str, Any]], fields: Optional[list[str]]
+    ) -> list[dict[str, Any]]:
+        """Only keep the fields of every article"""
+        if fields is None:
+            return articles
+
+        start = time.perf_counter()
+        projected_articles = fields_project(articles, fields)
+        self.metrics.record_parse("fields", time.perf_counter() - start)
+        return projected_articles
+
+    def top_stories(
+        self, section: str = "home", fields: Optional[list[str]] = None
+    ) -> list[dict[str, Any]]:
         """Load Top Stories
 
         Args:
             section (str, optional): The section to load the top stories from.
             Defaults to "home".
+            fields (list[str], optional): Only keep these fields of every
+            article, nested fields are separated by dots (for example
+            "multimedia.url"). Defaults to None, which keeps all fields.
 
         Raises:
             TypeError: Section can only be a string
@@ -264,6 +855,8 @@ class NYTAPI:
         if not isinstance(section, str):
             raise TypeError("Section can only be a str")
 
+        fields_check(fields)
+
         # Set the URL the data can be loaded from, and load the data
         url = f"{BASE_TOP_STORIES}{section}.json"
 
@@ -273,6 +866,9 @@ class NYTAPI:
         except RuntimeError:
             raise ValueError("Invalid section name")
 
+        result = self.__project(result, fields)
+        self.__store(result)
+
         # Parse dates from string to datetime.datetime
         # FIXME probably this should be a constant
         date_locations = ["updated_date", "created_date", "published_date"]
@@ -298,6 +894,7 @@ class NYTAPI:
         result: list[dict[str, Any]] = self.__load_data(url)  # type:ignore
 
         # Parse the dates in the results
+        self.__store(result)
         parsed_result = self.__parse_dates(
             self.__parse_dates(result, "date-only", ["published_date"]),
             "date-time",
@@ -332,6 +929,7 @@ class NYTAPI:
         result: list[dict[str, Any]] = self.__load_data(url)  # type:ignore
 
         # Parse the date_strings into datetime.datetime
+        self.__store(result)
         parsed_result = self.__parse_dates(
             self.__parse_dates(result, "date-only", ["published_date"]),
             "date-time",
@@ -340,6 +938,35 @@ class NYTAPI:
 
         return parsed_result
 
+    def most_popular_all(self) -> list[dict[str, Any]]:
+        """Get the most viewed, most emailed and most shared articles of all
+        periods, merged into one record per article
+
+        All lists are loaded concurrently. Every article has a "ranks" dict
+        with its rank on every list it is on, for example
+        {"viewed/1": 3, "emailed/7": 1, "shared/30/facebook": 12}.
+
+        Returns:
+            list[dict[str, Any]]: Most popular articles
+        """
+        urls = most_popular_get_urls(BASE_MOST_POPULAR)
+
+        # Load all the lists concurrently
+        results = self.__load_many([{"url": url} for url in urls.values()])
+        merged = most_popular_merge(
+            dict(zip(urls, cast(list[list[dict[str, Any]]], results)))
+        )
+        self.__store(merged)
+
+        # Parse the dates only once for every unique article
+        parsed_result = self.__parse_dates(
+            self.__parse_dates(merged, "date-only", ["published_date"]),
+            "date-time",
+            ["updated"],
+        )
+
+        return parsed_result
+
     def book_reviews(
         self,
         author: Optional[str] = None,
@@ -370,6 +997,93 @@ class NYTAPI:
         parsed_result = self.__parse_dates(result, "date-only", ["publication_dt"])
         return parsed_result
 
+    def book_reviews_many(
+        self,
+        isbns: Optional[list[Union[str, int]]] = None,
+        authors: Optional[list[str]] = None,
+        titles: Optional[list[str]] = None,
+    ) -> BatchResults:
+        """Load book reviews of many books concurrently
+
+        ISBN-10s are converted into ISBN-13s and every unique book is only
+        loaded once. A failed request does not fail the other lookups, its
+        inputs are left out of the results and their error is in errors.
+
+        Books without reviews are remembered for a week, and not loaded
+        again on a later call in that time, when the instance has a cache
+        (see the cache argument of NYTAPI). Without a cache they are loaded
+        on every call.
+
+        Args:
+            isbns (Optional[list[Union[str, int]]], optional): ISBNs of books.
+            Defaults to None.
+            authors (Optional[list[str]], optional): Names of authors.
+            Defaults to None.
+            titles (Optional[list[str]], optional): Titles of books.
+            Defaults to None.
+
+        Raises:
+            ValueError: An ISBN is not a valid ISBN-10 or ISBN-13 (the check
+            digit is checked), or no input is given
+
+        Returns:
+            BatchResults: Reviews by kind ("isbn", "author" or "title") and
+            normalized value (the ISBN-13, or the name or title with single
+            spaces), with the errors of the lookups that failed
+        """
+        inputs = book_reviews_many_options(isbns, authors, titles)
+
+        # Define every unique request only once
+        requests = {
+            ResponseCache.key(BASE_BOOK_REVIEWS, options): options
+            for options in inputs.values()
+        }
+
+        # Skip requests that are known to have no reviews, until that has
+        # expired, as reviews can be added later
+        reviews: dict[str, list[dict[str, Any]]] = {}
+        keys = []
+        now = time.time()
+        ttl = BOOK_REVIEWS_NONE_TTL.total_seconds()
+        for key in requests:
+            cached = None if self.cache is None else self.cache.get(key)
+            if cached is not None and now - cached.get("time", 0) < ttl:
+                self.metrics.record_cache_hit(
+                    metrics_endpoint(BASE_BOOK_REVIEWS, BASE_URL)
+                )
+                reviews[key] = []
+            else:
+                keys.append(key)
+
+        results = self.__load_many(
+            [{"url": BASE_BOOK_REVIEWS, "options": requests[key]} for key in keys],
+            return_exceptions=True,
+        )
+        errors: dict[str, Exception] = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                errors[key] = result
+                continue
+
+            reviews[key] = self.__parse_dates(
+                cast(list[dict[str, Any]], result), "date-only", ["publication_dt"]
+            )
+
+            # Remember that there are no reviews for this book
+            if len(result) == 0 and self.cache is not None:
+                self.cache.set(key, {"results": [], "time": now})
+
+        # Keep the lookups that succeeded, by input
+        batch = BatchResults()
+        for value, options in inputs.items():
+            key = ResponseCache.key(BASE_BOOK_REVIEWS, options)
+            if key in errors:
+                batch.errors[value] = errors[key]
+            else:
+                batch[value] = reviews[key]
+
+        return batch
+
     def best_sellers_lists(self) -> list[dict[str, Any]]:
         """Get all the best sellers lists (not the contents of these lists,
         but just all the lists).
@@ -426,11 +1140,126 @@ class NYTAPI:
 
         return result
 
+    def best_sellers_overview(
+        self, date: Optional[DateType] = None
+    ) -> dict[str, list[dict[str, Any]]]:
+        """Load the top books of all best sellers lists in one request
+
+        Args:
+            date (Union[datetime.date, datetime.datetime, None], optional):
+            The lists closest to this date. If left empty loads most recent.
+            Defaults to None.
+
+        Returns:
+            dict[str, list[dict[str, Any]]]: Books on every best sellers list,
+            by encoded list name (for example "hardcover-fiction")
+        """
+        _date = best_sellers_parse_date(date)
+
+        # The most recent lists are loaded if no date is given
+        options = {}
+        if _date != "current":
+            options["published_date"] = _date
+
+        result = cast(
+            list[dict[str, Any]],
+            self.__load_data(
+                BASE_BEST_SELLERS_OVERVIEW,
+                options=options,
+                location=["results", "lists"],
+            ),
+        )
+
+        return {
+            best_sellers_list["list_name_encoded"]: best_sellers_list["books"]
+            for best_sellers_list in result
+        }
+
+    def __best_sellers_history_request(
+        self, name: str, date: datetime.date
+    ) -> dict[str, Any]:
+        # Lists of past weeks never change, so they can be cached
+        final = date + BEST_SELLERS_FINAL_AFTER < datetime.date.today()
+        _date = best_sellers_parse_date(date)
+        return {
+            "url": f"{BASE_BEST_SELLERS_LIST}{_date}/{name}.json",
+            "location": ["results"],
+            "cache": final,
+        }
+
+    def best_sellers_history(
+        self,
+        name: str,
+        start: Union[datetime.date, datetime.datetime],
+        end: Optional[DateType] = None,
+    ) -> dict[str, list[tuple[Any, int]]]:
+        """Load the rank history of all books on a best sellers list
+
+        All lists between start and end are loaded concurrently. Lists of
+        past weeks are stored in the cache (if set), so they are only loaded
+        once.
+
+        Args:
+            name (str): Name of the list, for example "hardcover-fiction".
+            start (Union[datetime.date, datetime.datetime]): Start of the
+            history.
+            end (Union[datetime.date, datetime.datetime, None], optional):
+            End of the history. Defaults to today.
+
+        Raises:
+            ValueError: List does not exist, or start is after end
+
+        Returns:
+            dict[str, list[tuple[Any, int]]]: For every book (by ISBN-13, or
+            "title by author" if it has no ISBN) the published date and rank
+            of every list the book is on
+        """
+        best_sellers_check_history_input(name, start, end)
+        _end = end or datetime.date.today()
+        _start = datetime.date(start.year, start.month, start.day)
+
+        # Load the first list to find out when the next lists are published
+        requested = {_start}
+        try:
+            lists = [
+                cast(
+                    dict[str, Any],
+                    self.__load_data(
+                        **self.__best_sellers_history_request(name, _start)
+                    ),
+                )
+            ]
+        except RuntimeError:
+            raise ValueError("Best sellers list name is invalid")
+
+        # Load all following lists, concurrently if their dates are known
+        dates = best_sellers_next_dates(lists[-1], _end, requested)
+        while dates:
+            requested.update(dates)
+            lists += cast(
+                list[dict[str, Any]],
+                self.__load_many(
+                    [self.__best_sellers_history_request(name, d) for d in dates]
+                ),
+            )
+            dates = best_sellers_next_dates(lists[-1], _end, requested)
+
+        timeline = best_sellers_timeline(lists)
+
+        # Parse the published dates of the lists
+        if self.parse_dates:
+            return {
+                isbn: [(parse_date(date, "date-only"), rank) for date, rank in ranks]
+                for isbn, ranks in timeline.items()
+            }
+
+        return timeline  # type:ignore
+
     def __load_movie_reviews(
         self, max_results: int, params: dict[str, Any]
-    ) -> list[dict[str, Any]]:
+    ) -> PartialResults:
         # Set results list
-        results: list[dict[str, Any]] = []
+        results = PartialResults()
 
         requests_needed = math.ceil(max_results / RESULTS_MOVIE)
         for i in range(requests_needed):
@@ -438,15 +1267,20 @@ class NYTAPI:
             offset = i * RESULTS_MOVIE
             params["offset"] = str(offset)
 
-            # Load the data from the API and raise if there's an Error
-            res = cast(
-                dict[str, Any],
-                self.__load_data(
-                    url=BASE_MOVIE_REVIEWS,
-                    options=params,
-                    location=[],
-                ),
-            )
+            # Load the data from the API and raise if there's an Error, stop
+            # with the results so far if the budget is exceeded
+            try:
+                res = cast(
+                    dict[str, Any],
+                    self.__load_data(
+                        url=BASE_MOVIE_REVIEWS,
+                        options=params,
+                        location=[],
+                    ),
+                )
+            except BudgetExceededError as error:
+                results.stop(error.reason)
+                break
 
             results += res.get("results")  # type:ignore
 
@@ -461,7 +1295,9 @@ class NYTAPI:
         keyword: Optional[str] = None,
         options: Optional[MovieReviewsOptions] = None,
         dates: Optional[dict[Literal["begin", "end"], DateType]] = None,
-    ) -> list[dict[str, Any]]:
+        deadline: Optional[float] = None,
+        max_requests: Optional[int] = None,
+    ) -> PartialResults:
         """Load movie reviews
 
         Args:
@@ -474,9 +1310,14 @@ class NYTAPI:
             optional):
             Dates between the review was written or movie was first shown.
             Defaults to None.
+            deadline (float, optional): Seconds after which loading stops and
+            the reviews loaded so far are returned. Defaults to None.
+            max_requests (int, optional): Make at most this many requests.
+            Defaults to None.
 
         Returns:
-            list[dict[str, Any]]: Movie reviews
+            PartialResults: Movie reviews, partial is set if the deadline
+            passed or max_requests was reached before all were loaded
         """
         warnings.warn(
             "This function is deprecated and will be removed in the next version.",
@@ -493,7 +1334,8 @@ class NYTAPI:
         movie_reviews_parse_params(params, keyword, _options)
 
         max_results = _options.get("max_results", RESULTS_MOVIE)
-        results = self.__load_movie_reviews(max_results, params)
+        with self.__budget(deadline, max_requests):
+            results = self.__load_movie_reviews(max_results, params)
 
         # Parse and return the results
         # FIXME this part really seems unclear
@@ -505,7 +1347,7 @@ class NYTAPI:
             ["date_updated"],
         )
 
-        return parsed_results
+        return PartialResults(parsed_results, results.partial, results.reason)
 
     def article_metadata(self, url: str) -> list[dict[str, Any]]:
         """Load metadata of an article by url
@@ -587,6 +1429,7 @@ class NYTAPI:
             "published_date",
             "first_published_date",
         ]
+        self.__store(result)
         parsed_result = self.__parse_dates(result, "rfc3339", date_locations)
         return parsed_result
 
@@ -629,12 +1472,62 @@ class NYTAPI:
             1
         ]  # type:ignore
 
-    def archive_metadata(self, date: DateType) -> list[dict[str, Any]]:
+    def tag_autocomplete(
+        self,
+        query: str,
+        filter_options: Optional[str] = None,
+        max_results: Optional[int] = None,
+    ) -> list[str]:
+        """Load Times Tags for autocompletion
+
+        Responses are stored in a local index. If a shorter query returned
+        less than max_results tags, all tags of a longer query are in that
+        response, so the longer query is answered without a request. Without
+        max_results the API limits the tags itself, so then only the same
+        query is answered from the index.
+
+        Args:
+            query (str): Search query to find a tag
+            filter_options (Optional[str], optional): Filter options. Defaults
+            to None.
+            max_results (Optional[int], optional): Maximum number of results.
+            Defaults to None, which uses the maximum of the API.
+
+        Returns:
+            list[str]: List of tags
+        """
+        tag_query_check_types(query, max_results)
+
+        tags = self.tag_index.get(query, filter_options, max_results)
+        if tags is not None:
+            self.metrics.record_cache_hit(metrics_endpoint(BASE_TAGS, BASE_URL))
+            return tags
+
+        tags = self.tag_query(
+            query, filter_options=filter_options, max_results=max_results
+        )
+        self.tag_index.set(query, tags, filter_options, max_results)
+        return tags
+
+    def archive_metadata(
+        self,
+        date: DateType,
+        fields: Optional[list[str]] = None,
+        where: WhereType = None,
+    ) -> list[dict[str, Any]]:
         """Load all article metadata from the last month
 
         Args:
             date (Union[datetime.datetime, datetime.date]): The month of
             which you want to load all article metadata from
+            fields (list[str], optional): Only keep these fields of every
+            article, nested fields are separated by dots (for example
+            "headline.main"). Defaults to None, which keeps all fields.
+            where (Union[Callable, dict], optional): Only keep the articles
+            that match, checked while the response is decoded and before the
+            dates are parsed. Either a function that gets the article, or a
+            dict of (dotted) fields and the value, or list of values, they
+            need to have. Defaults to None, which keeps all articles.
 
         Raises:
             TypeError: Date is not a datetime or date object
@@ -646,35 +1539,249 @@ class NYTAPI:
         if not isinstance(date, (datetime.datetime, datetime.date)):
             raise TypeError("Date has to be datetime or date")
 
-        # Set URL, load and return data
-        url = f"{BASE_ARCHIVE_METADATA}{date.year}/{date.month}.json"
+        fields_check(fields)
+        archive_metadata_check_where(where)
 
-        # FIXME why not return immidiatly? what it is doing is also unclear
-        parsed_result = self.__parse_dates(
-            self.__load_data(  # type:ignore
-                url, location=["response", "docs"]
-            ),
-            "rfc3339",
-            ["pub_date"],
+        # Load and return data
+        return self.__archive_metadata_load(date, fields, where)
+
+    def archive_metadata_raw(self, date: DateType) -> bytes:
+        """Load the undecoded response of all article metadata of a month,
+        for example to decode it in another stage of a pipeline with
+        archive_metadata_iter_docs or archive_metadata_parse_raw
+
+        Args:
+            date (Union[datetime.datetime, datetime.date]): The month of
+            which you want to load all article metadata from
+
+        Raises:
+            TypeError: Date is not a datetime or date object
+
+        Returns:
+            bytes: The JSON response
+        """
+        # Raise Error if date is not defined
+        if not isinstance(date, (datetime.datetime, datetime.date)):
+            raise TypeError("Date has to be datetime or date")
+
+        return self.__load_raw(self.__archive_metadata_url(date))
+
+    def __archive_metadata_url(self, date: datetime.date) -> str:
+        return f"{BASE_ARCHIVE_METADATA}{date.year}/{date.month}.json"
+
+    def __archive_metadata_load(
+        self, date: datetime.date, fields: Optional[list[str]], where: WhereType
+    ) -> list[dict[str, Any]]:
+        url = self.__archive_metadata_url(date)
+        if where is None:
+            docs: list[dict[str, Any]] = self.__load_data(  # type:ignore
+                url, location=ARCHIVE_METADATA_LOCATION
+            )
+            docs = self.__project(docs, fields)
+
+            # Only complete articles make the month searchable in the store
+            self.__store(docs, date if fields is None else None)
+            return self.__parse_dates(docs, "rfc3339", ["pub_date"])
+
+        # Decode the documents one by one, only keeping those that match
+        content = self.__load_raw(url)
+        docs, seconds = archive_metadata_parse_raw(
+            content, self.parse_dates, fields, where, self.intern_strings
         )
-        return parsed_result
+        self.metrics.record_decode(metrics_endpoint(url, BASE_URL), seconds)
+        self.__store(docs)
+        return docs
+
+    def archive_metadata_months(
+        self,
+        dates: list[DateType],
+        processes: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+        where: WhereType = None,
+        deadline: Optional[float] = None,
+        max_requests: Optional[int] = None,
+    ) -> PartialResults:
+        """Load all article metadata of multiple months
+
+        The months are downloaded concurrently. Decoding the responses and
+        parsing the dates is CPU bound, set processes to do this in a pool
+        of worker processes, so it scales with the number of cores. Every
+        month is returned from the workers as one batch.
+
+        Args:
+            dates (list[Union[datetime.datetime, datetime.date]]): The months
+            of which you want to load all article metadata from
+            processes (int, optional): Number of worker processes that decode
+            the responses. The pool is started by the first call and reused
+            by later calls, until close. Defaults to None, which decodes them
+            in this process.
+            fields (list[str], optional): Only keep these fields of every
+            article, this is done by the workers if processes is set. Nested
+            fields are separated by dots (for example "headline.main").
+            Defaults to None, which keeps all fields.
+            where (Union[Callable, dict], optional): Only keep the articles
+            that match, see archive_metadata. If processes is set this is
+            checked by the workers, so a function needs to be picklable.
+            Defaults to None, which keeps all articles.
+            deadline (float, optional): Seconds after which downloading
+            and decoding stops, the months that are not loaded by then are
+            None. Defaults to None.
+            max_requests (int, optional): Make at most this many requests,
+            the months after that are None. Defaults to None.
+
+        Raises:
+            TypeError: Dates is not a list of datetime or date objects
+            ValueError: Processes is smaller than 1
+
+        Returns:
+            PartialResults: List of article metadata of every month, in the
+            same order as dates. partial is set if the deadline passed or
+            max_requests was reached before all months were loaded.
+        """
+        archive_metadata_check_dates(dates, processes)
+        fields_check(fields)
+        archive_metadata_check_where(where)
+        urls = [self.__archive_metadata_url(date) for date in dates]  # type:ignore
+
+        with self.__budget(deadline, max_requests):
+            budget = self.__current_budget()
+            load = self.__with_context(self.__archive_metadata_load)
+            load_raw = self.__with_context(self.__load_raw)
+
+        # Downloads that are still running at the deadline are not waited for
+        results = PartialResults()
+        downloads = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        try:
+            if processes is None:
+                futures = [
+                    downloads.submit(load, date, fields, where) for date in dates
+                ]
+                for future in futures:
+                    results.append(self.__budget_result(future, budget, results))
+
+                return results
+
+            workers = self.__process_pool(processes)
+            contents = [downloads.submit(load_raw, url) for url in urls]
+
+            # Hand every response to the workers as soon as it is loaded
+            batches = []
+            for content in contents:
+                raw = self.__budget_result(content, budget, results)
+                batches.append(
+                    None
+                    if raw is None
+                    else workers.submit(
+                        archive_metadata_parse_raw,
+                        raw,
+                        self.parse_dates,
+                        fields,
+                        where,
+                        self.intern_strings,
+                    )
+                )
+
+            # Decoding that is not done at the deadline is not waited for
+            for date, url, batch in zip(dates, urls, batches):
+                decoded = None
+                if batch is not None:
+                    decoded = self.__budget_result(batch, budget, results)
+                    batch.cancel()
+
+                if decoded is None:
+                    results.append(None)
+                    continue
+
+                docs, seconds = decoded
+                self.metrics.record_decode(metrics_endpoint(url, BASE_URL), seconds)
+                complete = fields is None and where is None
+                self.__store(docs, date if complete else None)  # type:ignore
+                results.append(docs)
+
+            return results
+        except BrokenProcessPool:
+            # A worker died, start a new pool on the next call
+            self.__close_process_pool(wait=False)
+            raise
+        finally:
+            downloads.shutdown(wait=not results.partial, cancel_futures=True)
+
+    def archive_metadata_url_index(
+        self,
+        dates: list[DateType],
+        index: UrlIndex,
+        processes: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+    ) -> int:
+        """Add all articles of multiple months to a URL index, so their URLs
+        can be resolved without using the API
+
+        The months are loaded a few at a time, so they do not all have to be
+        kept in memory. The index is saved after every batch of months.
+
+        Args:
+            dates (list[Union[datetime.datetime, datetime.date]]): The months
+            of which you want to index all articles
+            index (UrlIndex): Index the articles are added to
+            processes (int, optional): Number of worker processes that decode
+            the responses, see archive_metadata_months. Defaults to None.
+            fields (list[str], optional): Only keep these fields of every
+            article, web_url is always kept. Defaults to None, which keeps
+            all fields.
+
+        Raises:
+            TypeError: Dates is not a list of datetime or date objects, or
+            index is not a UrlIndex
+            ValueError: Processes is smaller than 1
+
+        Returns:
+            int: Number of articles added to the index, articles that were
+            already indexed unchanged are not counted
+        """
+        if not isinstance(index, UrlIndex):
+            raise TypeError("Index needs to be UrlIndex")
+
+        archive_metadata_check_dates(dates, processes)
+        fields_check(fields)
+
+        # Articles are looked up by URL, so it is always needed
+        if fields is not None and "web_url" not in fields:
+            fields = [*fields, "web_url"]
+
+        added = 0
+        for i in range(0, len(dates), MAX_WORKERS):
+            months = self.archive_metadata_months(
+                dates[i : i + MAX_WORKERS], processes, fields
+            )
+            for docs in months:
+                added += index.add(docs)
+            index.save()
+
+        return added
 
     # FIXME should this not be in a helper function?
     def __article_search_load_data(
         self,
         results: int,
         options: dict[str, Any],
-    ) -> list[dict[str, Any]]:
-        result = []
-        for i in range(math.ceil(results / RESULTS_SEARCH)):
+        offset: int = 0,
+    ) -> PartialResults:
+        result = PartialResults()
+        first_page = offset // RESULTS_SEARCH
+        for i in range(first_page, first_page + math.ceil(results / RESULTS_SEARCH)):
             # Set page
             options["page"] = str(i)
 
             location = ["response"]
-            # Load data and raise error if there's and error status
-            res: dict[str, Any] = self.__load_data(  # type:ignore
-                url=BASE_ARTICLE_SEARCH, options=options, location=location
-            )
+            # Load data and raise error if there's and error status, stop with
+            # the results so far if the budget is exceeded
+            try:
+                res: dict[str, Any] = self.__load_data(  # type:ignore
+                    url=BASE_ARTICLE_SEARCH, options=options, location=location
+                )
+            except BudgetExceededError as error:
+                result.stop(error.reason)
+                break
 
             # Parse results and append them to results list
             result += res.get("docs")  # type:ignore
@@ -685,6 +1792,63 @@ class NYTAPI:
 
         return result
 
+    def __article_search_options(
+        self,
+        query: Optional[str],
+        dates: dict[Literal["begin", "end"], DateType],
+        options: dict[str, Any],
+    ) -> dict[str, Any]:
+        # Resolve filter options into fq
+        _options = article_search_parse_options(options)
+
+        # Parse dates into options
+        # FIXME I really don't get this error
+        begin_date, end_date = article_search_parse_dates(dates)
+        _options["begin_date"] = begin_date
+        _options["end_date"] = end_date
+
+        # Set query if defined
+        if query is not None:
+            _options["q"] = query
+
+        return _options
+
+    def article_search_hits(
+        self,
+        query: Optional[str] = None,
+        dates: Optional[dict[Literal["begin", "end"], DateType]] = None,
+        options: Optional[ArticleSearchOptions] = None,
+    ) -> int:
+        """Get the number of articles that match a search, with one request
+
+        Args:
+            query (Optional[str], optional): Search query. Defaults to None.
+            dates (Optional[dict[Literal["begin", "end"], DateType]],
+            optional): Dictionary with "begin" and "end" of search range.
+            Defaults to None.
+            options (Optional[ArticleSearchOptions], optional): Options for the
+            search results. Defaults to None.
+
+        Returns:
+            int: Number of matching articles, article_search loads at most
+            2010 of them
+        """
+        dates = dates or {}
+        _options = cast(dict[str, Any], options or {})
+        article_search_check_input(query, dates, _options, RESULTS_SEARCH)
+
+        # Only request the id of the articles, the documents are not needed
+        _options = self.__article_search_options(
+            query, dates, {"fl": ["_id"], **_options}
+        )
+        res = cast(
+            dict[str, Any],
+            self.__load_data(
+                url=BASE_ARTICLE_SEARCH, options=_options, location=["response"]
+            ),
+        )
+        return res.get("meta", {}).get("hits", 0)
+
     # FIXME this appears to try to do to much
     def article_search(
         self,
@@ -692,7 +1856,11 @@ class NYTAPI:
         dates: Optional[dict[Literal["begin", "end"], DateType]] = None,
         options: Optional[ArticleSearchOptions] = None,
         results: int = 10,
-    ) -> list[dict[str, Any]]:
+        fields: Optional[list[str]] = None,
+        deadline: Optional[float] = None,
+        max_requests: Optional[int] = None,
+        offset: int = 0,
+    ) -> PartialResults:
         """Search New York Times articles
 
         Args:
@@ -704,9 +1872,21 @@ class NYTAPI:
             search results.
             Defaults to None.
             results (int, optional): Load at most this many articles. Defaults to 10.
+            fields (list[str], optional): Only keep these fields of every
+            article, nested fields are separated by dots (for example
+            "headline.main"). Unless the fl option is set, only the top
+            level keys of the fields are requested. Defaults to None, which
+            keeps all fields.
+            deadline (float, optional): Seconds after which loading stops and
+            the articles loaded so far are returned. Defaults to None.
+            max_requests (int, optional): Make at most this many requests.
+            Defaults to None.
+            offset (int, optional): Skip this many articles, needs to be a
+            multiple of 10, so a search can be loaded in parts. Defaults to 0.
 
         Returns:
-            list[dict[str, Any]]: Article metadata
+            PartialResults: Article metadata, partial is set if the deadline
+            passed or max_requests was reached before all were loaded
         """
         # Set if None
         dates = dates or {}
@@ -714,42 +1894,452 @@ class NYTAPI:
 
         # Check if input is valid
         article_search_check_input(query, dates, _options, results)
+        article_search_check_offset(offset, RESULTS_SEARCH)
+        fields_check(fields)
 
-        # Limit results loading to 2010
-        results = min(results, 2010)
-
-        # Resolve filter options into fq
-        _options = article_search_parse_options(_options)
-
-        # Parse dates into options
-        # FIXME I really don't get this error
-        begin_date, end_date = article_search_parse_dates(dates)
-        _options["begin_date"] = begin_date
-        _options["end_date"] = end_date
+        # Let the API only return the fields that are needed
+        if fields is not None and "fl" not in _options:
+            _options = {**_options, "fl": fields_top_level(fields)}
 
-        # Set query if defined
-        if query is not None:
-            _options["q"] = query
+        # Limit results loading to 2010
+        results = min(results, 2010 - offset)
+        _options = self.__article_search_options(query, dates, _options)
 
         # Set result list and add request as much data as needed
-        result = self.__article_search_load_data(results, _options)
+        with self.__budget(deadline, max_requests):
+            loaded = self.__article_search_load_data(results, _options, offset)
 
         # Parse and return results
+        result = self.__project(loaded, fields)
+        self.__store(result)
         parsed_result = self.__parse_dates(result, "rfc3339", ["pub_date"])
-        return parsed_result
+        return PartialResults(parsed_result, loaded.partial, loaded.reason)
+
+    def __article_search_spans(
+        self, begin: datetime.date, end: datetime.date
+    ) -> list[tuple[datetime.date, datetime.date, bool]]:
+        """Split the period in spans of months that are (or are not) in the
+        store, from old to new"""
+        spans: list[tuple[datetime.date, datetime.date, bool]] = []
+        month = begin.replace(day=1)
+        while month <= end:
+            next_month = (month + datetime.timedelta(days=31)).replace(day=1)
+            span_begin = max(begin, month)
+            span_end = min(end, next_month - datetime.timedelta(days=1))
+            stored = self.store.has_month(month)  # type:ignore
+
+            # Extend the previous span if it is the same
+            if spans and spans[-1][2] == stored:
+                spans[-1] = (spans[-1][0], span_end, stored)
+            else:
+                spans.append((span_begin, span_end, stored))
+
+            month = next_month
+
+        return spans
+
+    def article_search_local(
+        self,
+        query: Optional[str] = None,
+        dates: Optional[dict[Literal["begin", "end"], DateType]] = None,
+        options: Optional[ArticleSearchOptions] = None,
+        results: int = 10,
+        fields: Optional[list[str]] = None,
+        deadline: Optional[float] = None,
+        max_requests: Optional[int] = None,
+    ) -> PartialResults:
+        """Search New York Times articles in the store, the months that are
+        not in the store (loaded with archive_metadata) are searched with the
+        API. Takes the same arguments as article_search.
+
+        The words of the query need to be in the headline, abstract, lead
+        paragraph or keywords of the article. When the search is sorted by
+        relevance, the results of the store are returned first. Searches
+        without begin and end date, or with an fq option that contains more
+        than filters (like OR statements), are done with the API.
+
+        Args:
+            query (Optional[str], optional): Search query. Defaults to None.
+            dates (Optional[dict[Literal["begin", "end"], DateType]],
+            optional): Dictionary with "begin" and "end" of search range.
+            Defaults to None.
+            options (Optional[ArticleSearchOptions], optional): Options for the
+            search results.
+            Defaults to None.
+            results (int, optional): Load at most this many articles. Defaults to 10.
+            fields (list[str], optional): Only keep these fields of every
+            article. Defaults to None, which keeps all fields.
+            deadline (float, optional): Seconds after which loading from the
+            API stops and the articles loaded so far are returned. Defaults
+            to None.
+            max_requests (int, optional): Make at most this many requests.
+            Defaults to None.
+
+        Raises:
+            ValueError: There is no store
+
+        Returns:
+            PartialResults: Article metadata, partial is set if the deadline
+            passed or max_requests was reached before all were loaded
+        """
+        if self.store is None:
+            raise ValueError("Searching locally needs a store")
+
+        dates = dates or {}
+        _options = dict(cast(dict[str, Any], options or {}))
+        article_search_check_input(query, dates, _options, results)
+        fields_check(fields)
+
+        # Only filters can be searched in the store
+        filters = article_search_parse_fq(
+            article_search_parse_options(dict(_options)).get("fq", "")
+        )
+        begin, end = dates.get("begin"), dates.get("end")
+        if (
+            filters is None
+            or begin is None
+            or end is None
+            or not self.store.full_text
+            or not set(filters) <= set(STORE_SEARCH_FILTERS)
+        ):
+            return self.article_search(
+                query, dates, options, results, fields, deadline, max_requests
+            )
+
+        # Search newest first, unless sorted otherwise
+        sort = _options.get("sort", "relevance" if query else "newest")
+        spans = self.__article_search_spans(
+            datetime.date(begin.year, begin.month, begin.day),
+            datetime.date(end.year, end.month, end.day),
+        )
+        if sort == "newest":
+            spans.reverse()
+        elif sort == "relevance":
+            spans.sort(key=lambda span: not span[2])
+
+        # All searches with the API share the deadline and requests
+        result = PartialResults()
+        with self.__budget(deadline, max_requests):
+            for span_begin, span_end, stored in spans:
+                remaining = results - len(result)
+                if remaining <= 0:
+                    break
+
+                span_dates = {"begin": span_begin, "end": span_end}
+                if not stored:
+                    loaded = self.article_search(
+                        query,
+                        span_dates,  # type:ignore
+                        cast(ArticleSearchOptions, dict(_options)),
+                        remaining,
+                        fields,
+                    )
+                    result += loaded
+                    if loaded.partial:
+                        result.stop(loaded.reason)  # type:ignore
+                        break
+
+                    continue
+
+                docs = self.store.search(
+                    query, span_begin, span_end, filters, sort, remaining
+                )
+                self.metrics.record_cache_hit(
+                    metrics_endpoint(BASE_ARTICLE_SEARCH, BASE_URL)
+                )
+                docs = self.__project(docs, fields)
+                result += self.__parse_dates(docs, "rfc3339", ["pub_date"])
+
+        return result
+
+    def crawl(
+        self,
+        queue: CrawlBackend,
+        sink: Optional[Callable[[dict[str, Any], Any], Any]] = None,
+        worker: Optional[str] = None,
+        lease_seconds: float = LEASE_SECONDS,
+        max_units: Optional[int] = None,
+        wait: bool = False,
+    ) -> int:
+        """Work on the units of a crawl queue, until no unit is left
+
+        Every unit is leased, run by calling the NYTAPI method of its
+        endpoint with its parameters, and given to sink. A unit is completed
+        when sink returns, so a unit of a worker that crashed is run again.
+        Run this in several threads or processes on the machine of the
+        queue to crawl in parallel.
+
+        Args:
+            queue (CrawlBackend): Queue of the units, like a CrawlQueue
+            sink (Callable, optional): Called with the unit and the result of
+            its method, for example to store the result. Defaults to None.
+            worker (str, optional): Name of this worker. Defaults to None,
+            which uses the host name, process id and thread id.
+            lease_seconds (float, optional): Seconds this worker can work on
+            a unit before another worker may take it. Defaults to 300.
+            max_units (int, optional): Stop after this number of units.
+            Defaults to None, which works until no unit is left.
+            wait (bool, optional): Wait for units that are retried later, or
+            leased by other workers, instead of stopping when no unit can be
+            leased. Defaults to False.
+
+        Raises:
+            TypeError: Queue is not a CrawlBackend
+            QuotaExceededError: The daily quota or budget is used, the unit
+            is given back to the queue
+
+        Returns:
+            int: Number of units this worker completed
+        """
+        if not isinstance(queue, CrawlBackend):
+            raise TypeError("Queue needs to be CrawlBackend")
+
+        if sink is not None and not callable(sink):
+            raise TypeError("Sink needs to be callable")
+
+        if worker is None:
+            worker = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+        completed = 0
+        while max_units is None or completed < max_units:
+            units = queue.lease(worker, lease_seconds)
+            if not units:
+                status = queue.status()
+                if not wait or status["pending"] + status["leased"] == 0:
+                    break
+
+                time.sleep(CRAWL_POLL_SECONDS)
+                continue
+
+            unit = units[0]
+            method = getattr(self, unit["endpoint"], None)
+            if unit["endpoint"].startswith("_") or not callable(method):
+                queue.fail(unit, f"Unknown endpoint {unit['endpoint']}")
+                continue
+
+            try:
+                result = method(**unit["params"])
+                if sink is not None:
+                    sink(unit, result)
+            except QuotaExceededError:
+                queue.release(unit)
+                raise
+            except Exception as error:
+                queue.fail(unit, repr(error))
+                continue
+
+            if queue.complete(unit):
+                completed += 1
+
+        return completed
+
+    def backfill_plan(
+        self,
+        archive_months: Optional[list[DateType]] = None,
+        searches: Optional[list[dict[str, Any]]] = None,
+        best_sellers: Optional[list[dict[str, Any]]] = None,
+        probe: bool = False,
+        per_day: Optional[int] = None,
+        per_minute: Optional[int] = None,
+    ) -> BackfillPlan:
+        """Plan a backfill that can take more than one day of quota
+
+        Estimates the requests of every archive month (one), search (one per
+        page of results) and best sellers list history (one per week, and
+        one for the first list), and spreads them in order over days, so
+        every day fits in the quota. Searches are split in ranges of pages,
+        and histories in windows, that fit in a day.
+
+        Args:
+            archive_months (list[Union[datetime.datetime, datetime.date]],
+            optional): Months to load with archive_metadata. Defaults to None.
+            searches (list[dict[str, Any]], optional): Arguments of
+            article_search (query, dates, options and results) of every
+            search. Defaults to None.
+            best_sellers (list[dict[str, Any]], optional): Arguments of
+            best_sellers_history (name, start and end) of every best sellers
+            list. Defaults to None.
+            probe (bool, optional): Request the number of hits of every
+            search, so searches with less hits than results are estimated
+            correctly. This takes one request per search. Defaults to False.
+            per_day (int, optional): Requests per day. Defaults to None, which
+            uses the daily quota, or 500 if there is none.
+            per_minute (int, optional): Requests per minute. Defaults to None,
+            which uses the per minute quota, or 5 if there is none.
+
+        Raises:
+            TypeError: Months, searches or best sellers lists are invalid
+            ValueError: A step takes more requests than a day allows
+
+        Returns:
+            BackfillPlan: The steps of the backfill, with their day
+        """
+        archive_months = archive_months or []
+        searches = searches or []
+        best_sellers = best_sellers or []
+        backfill_check_input(archive_months, searches, best_sellers)
+
+        per_day = per_day or self.quota.per_day or NYT_PER_DAY
+        per_minute = per_minute or self.quota.per_minute or NYT_PER_MINUTE
+        for name, value in [("Per day", per_day), ("Per minute", per_minute)]:
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise TypeError(f"{name} needs to be int")
+
+        capacity = min(per_day, per_minute * MINUTES_PER_DAY)
+        steps: list[dict[str, Any]] = [
+            {"endpoint": "archive_metadata", "params": {"date": date}, "requests": 1}
+            for date in archive_months
+        ]
+
+        probe_requests = 0
+        for search in searches:
+            hits = None
+            if probe:
+                hits = self.article_search_hits(
+                    search.get("query"), search.get("dates"), search.get("options")
+                )
+                probe_requests += 1
+
+            windows = backfill_search_windows(
+                search.get("results", 10), RESULTS_SEARCH, capacity, hits
+            )
+            if len(windows) == 1:
+                steps.append(
+                    {
+                        "endpoint": "article_search",
+                        "params": search,
+                        "requests": windows[0][2],
+                    }
+                )
+                continue
+
+            # Every range of pages is loaded by its own step, so the pages
+            # of a day are kept when the quota is used the next day
+            steps += [
+                {
+                    "endpoint": "article_search",
+                    "params": {**search, "offset": offset, "results": results},
+                    "requests": requests,
+                }
+                for offset, results, requests in windows
+            ]
+
+        for best_seller in best_sellers:
+            _start = best_seller["start"]
+            _end = best_seller.get("end") or datetime.date.today()
+            windows = backfill_history_windows(
+                datetime.date(_start.year, _start.month, _start.day),
+                datetime.date(_end.year, _end.month, _end.day),
+                capacity,
+            )
+            steps += [
+                {
+                    "endpoint": "best_sellers_history",
+                    "params": {"name": best_seller["name"], "start": start, "end": end},
+                    "requests": requests,
+                }
+                for start, end, requests in windows
+            ]
+
+            # Without an end the history runs until the day it is loaded, the
+            # step stays the same so a plan can be made again the next day
+            if best_seller.get("end") is None:
+                steps[-1]["params"]["end"] = None
+
+        # The first day only has the requests that are left of today
+        first_day = capacity
+        remaining = self.quota.remaining()["day"]
+        if remaining is not None:
+            first_day = min(first_day, remaining)
+
+        days = backfill_schedule(
+            [step["requests"] for step in steps], capacity, first_day
+        )
+        for step, day in zip(steps, days):
+            step["day"] = day
+
+        return BackfillPlan(steps, per_day, per_minute, probe_requests)
+
+    def backfill(
+        self,
+        plan: BackfillPlan,
+        queue: CrawlBackend,
+        sink: Optional[Callable[[dict[str, Any], Any], Any]] = None,
+    ) -> dict[str, Any]:
+        """Run the next day of a backfill, until its steps are done or the
+        daily quota is used
+
+        The steps of the first day of the plan that is not done are added to
+        the queue (steps that were added before are skipped) and run in
+        order, see crawl. Requests wait for the per minute limit of the plan
+        and stop at its daily limit, also when the quota of the key has no
+        limits. The queue keeps the progress, so running the backfill again
+        with the same queue the next day continues with the next day of the
+        plan. The requests of the plan are counted in a file next to the
+        database of a CrawlQueue, so a second run on the same day does not
+        exceed the daily limit.
+
+        Args:
+            plan (BackfillPlan): Plan of the backfill
+            queue (CrawlBackend): Queue that keeps the progress, like a
+            CrawlQueue
+            sink (Callable, optional): Called with the step and the result of
+            its method, for example to store the result. Defaults to None.
+
+        Raises:
+            TypeError: Plan is not a BackfillPlan
+
+        Returns:
+            dict[str, Any]: Status of the queue, with the day of the plan that
+            was run, and complete set if all steps are done
+        """
+        if not isinstance(plan, BackfillPlan):
+            raise TypeError("Plan needs to be BackfillPlan")
+
+        # Limits of the plan, counted across runs if the queue is a file
+        path = None
+        if isinstance(queue, CrawlQueue) and queue.path != ":memory:":
+            path = f"{queue.path}.quota.json"
+        limits = Quota(plan.per_minute, plan.per_day, path=path)
+        limits.bind(self.key)
+
+        day = None
+        with self.__limits(limits):
+            for day in range(plan.days):
+                added = plan.enqueue(queue, day)
+                try:
+                    completed = self.crawl(queue, sink)
+                except QuotaExceededError:
+                    break
+
+                # Continue with the next day only if this day was done before
+                status = queue.status()
+                if added or completed or status["pending"] + status["leased"]:
+                    break
+
+        status = queue.status()
+        status["day"] = day
+        status["complete"] = (
+            day in [None, plan.days - 1]
+            and status["pending"] + status["leased"] == 0
+        )
+        return status
 
     # Allow the option to close the session
     def close(self) -> None:
-        """Close session"""
-        # Close session only if it exists
-        if hasattr(self, "session"):
+        """Close session, and stop the worker processes"""
+        # Close session only if it exists, and belongs to this process
+        if hasattr(self, "session") and self._pid == os.getpid():
             self.session.close()
+            self.__close_process_pool()
 
     # Close session before delete
     def __del__(self) -> None:
         """Close session on deletion"""
         if getattr(self, "_local_session", False):
             self.close()
+        elif getattr(self, "_workers", None) is not None:
+            self.__close_process_pool(wait=False)
 
     def __exit__(self, *args) -> None:
         """Close session on exit"""
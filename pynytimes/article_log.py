@@ -0,0 +1,233 @@
+"""Compressed append-only log of articles"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Iterable, Iterator, Optional
+
+# Import standard Python dependencies
+import json
+import os
+import struct
+import threading
+import zlib
+
+from .helpers import AppendHashIndex, hash_index_key
+from .helpers import serialize_date
+
+LOG_FILE = "articles.log"
+INDEX_FILE = "articles.idx"
+
+# Number of bytes of articles that are compressed together
+BLOCK_SIZE = 64 * 1024
+
+# Every block starts with its compressed length and number of articles
+_BLOCK_HEADER = struct.Struct("<II")
+
+
+def _article_id(article: dict[str, Any]) -> Optional[str]:
+    return article.get("uri") or article.get("_id")
+
+
+class ArticleLog:
+    """
+    Stores articles in an append-only file of compressed blocks of JSON
+    lines, with a sorted index on disk that maps the hash of their uri (or
+    _id) to the block they are in. The index is memory mapped, so a log of
+    any size is opened instantly, and getting an article only reads and
+    decompresses its block.
+
+    Example:
+        with ArticleLog("articles") as log:
+            for docs in nyt.archive_metadata_months(dates):
+                log.add(docs)
+
+            article = log.get("nyt://article/...")
+    """
+
+    def __init__(self, path: str, block_size: int = BLOCK_SIZE):
+        """Open (or create) the log
+
+        Args:
+            path (str): Directory of the log
+            block_size (int, optional): Number of bytes of articles that are
+            compressed together. Larger blocks compress better, but every
+            lookup has to decompress a whole block. Defaults to 64 KiB.
+        """
+        if not isinstance(path, str):
+            raise TypeError("Path needs to be str")
+
+        if not isinstance(block_size, int) or isinstance(block_size, bool):
+            raise TypeError("Block size needs to be int")
+
+        if block_size < 1:
+            raise ValueError("Block size needs to be at least 1")
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._log = open(os.path.join(path, LOG_FILE), "a+b")
+
+        # Articles that are not written in a block yet, by id
+        self._buffer: dict[str, bytes] = {}
+        self._buffer_size = 0
+
+        # Blocks of the articles by id, and the end of the last block that
+        # is in the index file
+        self._index = AppendHashIndex(os.path.join(path, INDEX_FILE))
+        self._end = self._index.tag
+
+        # Index the blocks that were written after the index was last saved
+        for offset, lines in self.__blocks(self._end):
+            for line in lines:
+                article_id = _article_id(json.loads(line))
+                self._index.add(hash_index_key(article_id), offset)  # type:ignore
+            self._end = self._log.tell()
+
+        # Drop a block that was not completely written
+        self._log.truncate(self._end)
+
+    def __enter__(self) -> ArticleLog:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __read_block(self, offset: int) -> Optional[list[bytes]]:
+        # Returns None if the block was not completely written
+        self._log.seek(offset)
+        header = self._log.read(_BLOCK_HEADER.size)
+        if len(header) < _BLOCK_HEADER.size:
+            return None
+
+        length, count = _BLOCK_HEADER.unpack(header)
+        data = self._log.read(length)
+        if len(data) < length:
+            return None
+
+        lines = zlib.decompress(data).splitlines()
+        return lines if len(lines) == count else None
+
+    def __blocks(self, offset: int = 0) -> Iterator[tuple[int, list[bytes]]]:
+        while True:
+            lines = self.__read_block(offset)
+            if lines is None:
+                return
+
+            yield offset, lines
+            offset = self._log.tell()
+
+    def __write_block(self):
+        if not self._buffer:
+            return
+
+        data = zlib.compress(b"\n".join(self._buffer.values()))
+        self._log.seek(0, os.SEEK_END)
+        offset = self._log.tell()
+        self._log.write(_BLOCK_HEADER.pack(len(data), len(self._buffer)))
+        self._log.write(data)
+        for article_id in self._buffer:
+            self._index.add(hash_index_key(article_id), offset)
+
+        self._end = self._log.tell()
+        self._buffer = {}
+        self._buffer_size = 0
+
+    def add(self, articles: Iterable[dict[str, Any]]) -> int:
+        """Add articles, articles without a uri (or _id) are skipped.
+        Articles are written once a block is full, or the log is saved.
+        Returns the number of articles added."""
+        added = 0
+        with self._lock:
+            for article in articles:
+                article_id = _article_id(article)
+                if not article_id:
+                    continue
+
+                line = json.dumps(
+                    article, separators=(",", ":"), default=serialize_date
+                ).encode("utf-8")
+
+                # A block contains one version of every article
+                if article_id in self._buffer:
+                    self.__write_block()
+
+                self._buffer[article_id] = line
+                self._buffer_size += len(line)
+                if self._buffer_size >= self.block_size:
+                    self.__write_block()
+
+                added += 1
+
+            self._log.flush()
+
+        return added
+
+    def save(self) -> None:
+        """Write the articles that are not written yet, and the index"""
+        with self._lock:
+            self.__write_block()
+            self._log.flush()
+            self._index.save(self._end)
+
+    def get(self, article_id: str) -> Optional[dict[str, Any]]:
+        """Get an article by uri (or _id), None if it is not in the log"""
+        return self.get_many([article_id]).get(article_id)
+
+    def get_many(self, article_ids: list[str]) -> dict[str, dict[str, Any]]:
+        """Get the articles of multiple uris (or _ids), by uri. Every block
+        is only decompressed once."""
+        found: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            blocks: dict[int, set[str]] = {}
+            for article_id in set(article_ids):
+                for offset in self._index.get(hash_index_key(article_id)):
+                    blocks.setdefault(offset, set()).add(article_id)
+
+            # Read the blocks in the order of the file, so a later version
+            # of an article replaces an earlier one. Hashes can collide, so
+            # the id of every article is checked.
+            for offset in sorted(blocks):
+                for line in self.__read_block(offset) or []:
+                    article = json.loads(line)
+                    if _article_id(article) in blocks[offset]:
+                        found[_article_id(article)] = article  # type:ignore
+
+            for article_id in article_ids:
+                if article_id in self._buffer:
+                    found[article_id] = json.loads(self._buffer[article_id])
+
+        return {
+            article_id: found[article_id]
+            for article_id in article_ids
+            if article_id in found
+        }
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        """Iterate over all written articles, in the order they were added.
+        Articles that were added again are returned every time."""
+        offset = 0
+        while True:
+            with self._lock:
+                if offset >= self._end:
+                    return
+
+                lines = self.__read_block(offset) or []
+                offset = self._log.tell()
+
+            for line in lines:
+                yield json.loads(line)
+
+    def __contains__(self, article_id: str) -> bool:
+        return self.get(article_id) is not None
+
+    def __len__(self) -> int:
+        # Every version of an article that was added again is counted
+        return len(self._index) + len(self._buffer)
+
+    def close(self) -> None:
+        """Write the articles that are not written yet and close the log"""
+        self.save()
+        with self._lock:
+            self._index.close()
+            self._log.close()
@@ -0,0 +1,94 @@
+"""Plans of backfills that take more than one day of quota"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+# Import standard Python dependencies
+import math
+
+from .crawl import CrawlBackend
+
+
+class BackfillPlan:
+    """
+    Ordered steps of a backfill, with the estimated requests of every step
+    and the day it is made on. Every step is a call of a NYTAPI method, so
+    the plan can be added to a CrawlQueue and run by NYTAPI.backfill, which
+    continues where it stopped when it is run again the next day.
+
+    Example:
+        plan = nyt.backfill_plan(archive_months=dates, searches=searches)
+        print(plan.summary())
+
+        queue = CrawlQueue("backfill.sqlite")
+        nyt.backfill(plan, queue, sink=store_result)
+    """
+
+    def __init__(
+        self,
+        steps: list[dict[str, Any]],
+        per_day: int,
+        per_minute: int,
+        probe_requests: int = 0,
+    ):
+        """Create a plan
+
+        Args:
+            steps (list[dict[str, Any]]): Steps in order, with their
+            endpoint, params, (estimated) requests and day
+            per_day (int): Requests that can be made per day
+            per_minute (int): Requests that can be made per minute
+            probe_requests (int, optional): Requests made to estimate the
+            requests of the steps. Defaults to 0.
+        """
+        self.steps = steps
+        self.per_day = per_day
+        self.per_minute = per_minute
+        self.probe_requests = probe_requests
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    @property
+    def requests(self) -> int:
+        """Estimated requests of all steps"""
+        return sum(step["requests"] for step in self.steps)
+
+    @property
+    def days(self) -> int:
+        """Number of days the backfill takes"""
+        return self.steps[-1]["day"] + 1 if self.steps else 0
+
+    def day(self, day: int) -> list[dict[str, Any]]:
+        """Get the steps of a day, the first day is 0"""
+        return [step for step in self.steps if step["day"] == day]
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Get the number of steps, the estimated requests and the minimum
+        minutes (because of the per minute quota) of every day"""
+        summary = []
+        for day in range(self.days):
+            requests = sum(step["requests"] for step in self.day(day))
+            summary.append(
+                {
+                    "day": day,
+                    "steps": len(self.day(day)),
+                    "requests": requests,
+                    "minutes": math.ceil(requests / self.per_minute),
+                }
+            )
+
+        return summary
+
+    def enqueue(self, queue: CrawlBackend, day: Optional[int] = None) -> int:
+        """Add the steps to a crawl queue, in order. Steps that were already
+        added are skipped. Returns the number of steps that were added.
+
+        Args:
+            queue (CrawlBackend): Queue to add the steps to
+            day (int, optional): Only add the steps of this day. Defaults to
+            None, which adds all steps.
+        """
+        steps = self.steps if day is None else self.day(day)
+        return queue.enqueue_many((step["endpoint"], step["params"]) for step in steps)
@@ -0,0 +1,31 @@
+"""Results of batches of lookups of which single lookups can fail"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+
+class BatchResults(dict):
+    """
+    Results of a batch of lookups, by input. The inputs of which the lookup
+    failed are not in the results, but in errors with their exception, so
+    one failing request does not throw away the lookups that succeeded.
+
+    Example:
+        reviews = nyt.book_reviews_many(isbns=isbns)
+        for (kind, isbn), error in reviews.errors.items():
+            print(f"Could not load {isbn}: {error!r}")
+    """
+
+    def __init__(
+        self,
+        results: Any = (),
+        errors: Optional[dict[Any, Exception]] = None,
+    ):
+        super().__init__(results)
+        self.errors: dict[Any, Exception] = errors or {}
+
+    @property
+    def partial(self) -> bool:
+        """Whether the lookup of an input failed"""
+        return len(self.errors) > 0
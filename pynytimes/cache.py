@@ -0,0 +1,98 @@
+"""Persistent cache for API responses that never change"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+# Import standard Python dependencies
+import json
+import sqlite3
+import threading
+
+
+class ResponseCache:
+    """
+    Stores API responses in a SQLite database, so responses that never
+    change (like best sellers lists of past weeks) are only loaded once,
+    also across runs.
+
+    Example:
+        nyt = NYTAPI("Your API key", cache=ResponseCache("nytimes.sqlite"))
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """Open (or create) the cache
+
+        Args:
+            path (str, optional): Location of the SQLite database. Defaults
+            to ":memory:", which does not persist across runs.
+        """
+        if not isinstance(path, str):
+            raise TypeError("Path needs to be str")
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict[str, Any]):
+        # Open a new connection, an in-memory database starts empty
+        self.__init__(state["path"])  # type:ignore
+
+    @staticmethod
+    def key(url: str, params: Optional[dict[str, Any]] = None) -> str:
+        """Create the key of a request, the API key is never part of it"""
+        _params = {
+            k: v for k, v in (params or {}).items() if k != "api-key" and v is not None
+        }
+        return url + "?" + json.dumps(_params, sort_keys=True, default=str)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached response, None if it is not cached"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Cache a response"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)",
+                (key, json.dumps(value, separators=(",", ":"))),
+            )
+            self._connection.commit()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,160 @@
+"""Record and replay API traffic for deterministic offline runs"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Literal, Union
+
+# Import standard Python dependencies
+import base64
+import collections
+import gzip
+import json
+import threading
+import time
+
+# Import other dependencies
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from .cache import ResponseCache
+
+# Headers that are stored with every response
+RECORDED_HEADERS = ["Content-Type"]
+
+
+class Cassette:
+    """
+    Stores every request (URL and parameters, without the API key) and its
+    response in a cassette file, one JSON object per line with the body gzip
+    compressed. In replay mode the responses are served from the cassette,
+    so no network or quota is used.
+
+    Example:
+        nyt = NYTAPI("Your API key", cassette=Cassette("run.jsonl", "record"))
+        nyt.top_stories()
+
+        nyt = NYTAPI("Any key", cassette=Cassette("run.jsonl", "replay"))
+        nyt.top_stories()  # Served from run.jsonl
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: Literal["record", "replay"] = "replay",
+        latency: Union[float, Literal["recorded"], None] = None,
+    ):
+        """Open a cassette
+
+        Args:
+            path (str): Location of the cassette file
+            mode (Literal["record", "replay"], optional): Record overwrites
+            the cassette with all requests made, replay serves the responses
+            from the cassette. Defaults to "replay".
+            latency (Union[float, Literal["recorded"], None], optional):
+            Simulated latency of replayed responses in seconds, or
+            "recorded" to use the latency of the recorded request. Defaults
+            to None, which responds immediately.
+        """
+        if not isinstance(path, str):
+            raise TypeError("Path needs to be str")
+
+        if mode not in ["record", "replay"]:
+            raise ValueError("Mode needs to be record or replay")
+
+        if latency != "recorded" and not isinstance(latency, (int, float, type(None))):
+            raise TypeError("Latency needs to be a number, recorded or None")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._responses: dict[str, collections.deque] = {}
+
+        if mode == "record":
+            # Start with an empty cassette
+            open(path, "w", encoding="utf-8").close()
+        else:
+            self.__load()
+
+    def __load(self):
+        with open(self.path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        for entry in entries:
+            key = ResponseCache.key(entry["url"], entry["params"])
+            self._responses.setdefault(key, collections.deque()).append(entry)
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path, "mode": self.mode, "latency": self.latency}
+
+    def __setstate__(self, state: dict[str, Any]):
+        # Continue the cassette of another process, recording appends to it
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._responses = {}
+        if self.mode == "replay":
+            self.__load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._responses.values())
+
+    def record(
+        self,
+        url: str,
+        params: dict[str, Any],
+        res: Response,
+        seconds: float,
+    ) -> None:
+        """Add a request and its response to the cassette"""
+        _params = {k: v for k, v in params.items() if k != "api-key"}
+        entry = {
+            "url": url,
+            "params": _params,
+            "status": res.status_code,
+            "headers": {
+                header: res.headers[header]
+                for header in RECORDED_HEADERS
+                if header in res.headers
+            },
+            "seconds": seconds,
+            "body": base64.b64encode(gzip.compress(res.content)).decode("ascii"),
+        }
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def replay(self, url: str, params: dict[str, Any]) -> Response:
+        """Get the recorded response of a request
+
+        Identical requests get their responses in the order they were
+        recorded, the last response is repeated when all are used.
+
+        Raises:
+            KeyError: The request is not in the cassette
+        """
+        key = ResponseCache.key(url, params)
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                raise KeyError(f"Request is not in the cassette: {key}")
+
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+
+        if self.latency == "recorded":
+            time.sleep(entry.get("seconds", 0))
+        elif self.latency:
+            time.sleep(self.latency)  # type:ignore
+
+        res = Response()
+        res.status_code = entry["status"]
+        res.headers = CaseInsensitiveDict(entry["headers"])
+        res._content = gzip.decompress(base64.b64decode(entry["body"]))
+        res.url = url
+        return res
+
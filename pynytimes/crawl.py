@@ -0,0 +1,388 @@
+"""Persistent queue of crawl work units"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+
+# Import standard Python dependencies
+import json
+import sqlite3
+import threading
+import time
+
+from .helpers import crawl_decode_params, crawl_encode_params, crawl_key
+
+# Seconds a worker can work on a unit before another worker may take it
+LEASE_SECONDS = 300
+
+# Attempts of a unit before it fails, and the delay before the first retry
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30
+
+# Seconds of completed units the throughput in the status is based on
+STATUS_WINDOW = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    endpoint TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status, available_at);
+CREATE INDEX IF NOT EXISTS units_finished ON units (finished);
+"""
+
+STATUSES = ["pending", "leased", "done", "failed"]
+
+
+def _unit(row: tuple) -> dict[str, Any]:
+    unit_id, endpoint, params, attempts, worker = row
+    return {
+        "id": unit_id,
+        "endpoint": endpoint,
+        "params": crawl_decode_params(json.loads(params)),
+        "attempts": attempts,
+        "worker": worker,
+    }
+
+
+class CrawlBackend:
+    """
+    Interface of the storage of a crawl queue. NYTAPI.crawl and
+    NYTAPI.backfill work with any backend, so workers on several machines
+    can share a queue that is stored in a service with atomic updates (like
+    a database server), by implementing these methods for it. CrawlQueue is
+    the SQLite implementation, for the workers of one machine.
+
+    A unit is a dict with its id, endpoint (the name of a NYTAPI method),
+    params, attempts and worker. Leasing needs to be atomic across all
+    workers, so every unit is only leased by one worker at a time.
+    """
+
+    def enqueue(self, endpoint: str, params: Optional[dict[str, Any]] = None) -> bool:
+        """Add a unit, the name of a NYTAPI method and its parameters. Returns
+        False if the unit was already added."""
+        return self.enqueue_many([(endpoint, params or {})]) == 1
+
+    def enqueue_many(self, units: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        """Add units of (endpoint, params) that were not added before, in
+        order. Returns the number of units that were added."""
+        raise NotImplementedError
+
+    def lease(
+        self, worker: str, seconds: float = LEASE_SECONDS, count: int = 1
+    ) -> list[dict[str, Any]]:
+        """Lease units that are pending, or of which the lease ended, for
+        seconds, in the order they were added. Returns an empty list if there
+        is nothing to do."""
+        raise NotImplementedError
+
+    def complete(self, unit: dict[str, Any]) -> bool:
+        """Record that a unit is done. Returns False if its lease ended."""
+        raise NotImplementedError
+
+    def fail(self, unit: dict[str, Any], error: str) -> bool:
+        """Record that an attempt of a unit failed, it is retried later
+        until it reached the maximum number of attempts. Returns False if
+        its lease ended."""
+        raise NotImplementedError
+
+    def release(self, unit: dict[str, Any]) -> bool:
+        """Give a leased unit back without counting the attempt. Returns
+        False if its lease ended."""
+        raise NotImplementedError
+
+    def status(self) -> dict[str, Any]:
+        """Get the number of units per status (pending, leased, done and
+        failed)"""
+        raise NotImplementedError
+
+
+class CrawlQueue(CrawlBackend):
+    """
+    Durable queue of work units, like archive months or article search
+    windows, stored in a SQLite database. Workers in several threads or
+    processes on one machine lease units, so every unit is only worked on by
+    one worker at a time. Do not put the database on network storage (like
+    NFS) to share it between machines, file locking is not reliable there,
+    so a unit could be leased by two workers at once, implement a
+    CrawlBackend for a shared service instead. A unit that is
+    not completed before its lease ends, because the worker crashed, is
+    leased again. Failed units are retried with a growing delay. Units are
+    deduplicated by endpoint and parameters, so enqueueing a harvest again
+    after a crash only adds the units that are missing.
+
+    Every unit is the name of a NYTAPI method and its parameters, see
+    NYTAPI.crawl for a worker that runs them.
+
+    Example:
+        queue = CrawlQueue("crawl.sqlite")
+        queue.enqueue_many(
+            ("archive_metadata", {"date": datetime.date(year, month, 1)})
+            for year in range(2000, 2021)
+            for month in range(1, 13)
+        )
+
+        nyt.crawl(queue, sink=lambda unit, result: log.add(result))
+        print(queue.status())
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_delay: float = RETRY_DELAY,
+    ):
+        """Open (or create) the queue
+
+        Args:
+            path (str, optional): Location of the SQLite database. Defaults
+            to ":memory:", which does not persist across runs.
+            max_attempts (int, optional): Attempts of a unit before it fails.
+            Defaults to 3.
+            retry_delay (float, optional): Seconds before a failed unit is
+            retried the first time, the delay doubles every attempt. Defaults
+            to 30.
+        """
+        if not isinstance(path, str):
+            raise TypeError("Path needs to be str")
+
+        if not isinstance(max_attempts, int) or isinstance(max_attempts, bool):
+            raise TypeError("Max attempts needs to be int")
+
+        if max_attempts < 1:
+            raise ValueError("Max attempts needs to be at least 1")
+
+        if not isinstance(retry_delay, (int, float)):
+            raise TypeError("Retry delay needs to be int or float")
+
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+
+        # Transactions are started explicitly, so leasing a unit is atomic
+        # across processes
+        self._connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._connection.executescript(SCHEMA)
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "max_attempts": self.max_attempts,
+            "retry_delay": self.retry_delay,
+        }
+
+    def __setstate__(self, state: dict[str, Any]):
+        # Open a new connection, an in-memory database starts empty
+        self.__init__(**state)  # type:ignore
+
+    def __execute(self, query: str, parameters: Iterable[Any] = ()) -> int:
+        # Returns the number of changed units, every statement commits itself
+        with self._lock:
+            cursor = self._connection.execute(query, tuple(parameters))
+            return cursor.rowcount
+
+    def enqueue_many(self, units: Iterable[tuple[str, dict[str, Any]]]) -> int:
+        """Add units of (endpoint, params), in one transaction. Returns the
+        number of units that were not added before."""
+        rows = []
+        for endpoint, params in units:
+            if not isinstance(endpoint, str):
+                raise TypeError("Endpoint needs to be str")
+
+            if not isinstance(params, dict):
+                raise TypeError("Params needs to be dict")
+
+            rows.append(
+                (
+                    crawl_key(endpoint, params),
+                    endpoint,
+                    json.dumps(crawl_encode_params(params)),
+                )
+            )
+
+        with self._lock:
+            before = self._connection.total_changes
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO units (key, endpoint, params) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+            return self._connection.total_changes - before
+
+    def lease(
+        self, worker: str, seconds: float = LEASE_SECONDS, count: int = 1
+    ) -> list[dict[str, Any]]:
+        """Lease units that are pending, or of which the lease ended, for
+        seconds. Returns the units, with their id, endpoint, params, number
+        of attempts and worker. An empty list if there is nothing to do."""
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+
+                # Units of which every attempt ended without completing fail
+                self._connection.execute(
+                    "UPDATE units SET status = 'failed', error = 'Lease ended', "
+                    "finished = ? WHERE status = 'leased' AND lease_until <= ? "
+                    "AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+
+                ids = [
+                    unit_id
+                    for (unit_id,) in self._connection.execute(
+                        "SELECT id FROM units WHERE (status = 'pending' AND "
+                        "available_at <= ?) OR (status = 'leased' AND "
+                        "lease_until <= ?) ORDER BY id LIMIT ?",
+                        (now, now, count),
+                    )
+                ]
+                self._connection.executemany(
+                    "UPDATE units SET status = 'leased', worker = ?, "
+                    "lease_until = ?, attempts = attempts + 1, "
+                    "started = COALESCE(started, ?) WHERE id = ?",
+                    [(worker, now + seconds, now, unit_id) for unit_id in ids],
+                )
+                rows = self._connection.execute(
+                    "SELECT id, endpoint, params, attempts, worker FROM units "
+                    f"WHERE id IN ({', '.join('?' * len(ids))}) ORDER BY id",
+                    ids,
+                ).fetchall()
+
+        return [_unit(row) for row in rows]
+
+    def complete(self, unit: dict[str, Any]) -> bool:
+        """Record that a unit is done. Returns False if the lease of the unit
+        ended and it was leased again, the result should then be ignored."""
+        return (
+            self.__execute(
+                "UPDATE units SET status = 'done', finished = ?, error = NULL "
+                "WHERE id = ? AND status = 'leased' AND worker = ? "
+                "AND attempts = ?",
+                (time.time(), unit["id"], unit["worker"], unit["attempts"]),
+            )
+            == 1
+        )
+
+    def fail(self, unit: dict[str, Any], error: str) -> bool:
+        """Record that an attempt of a unit failed. The unit is retried after
+        a delay, unless it reached the maximum number of attempts. Returns
+        False if the lease of the unit ended."""
+        now = time.time()
+        failed = unit["attempts"] >= self.max_attempts
+        delay = self.retry_delay * 2 ** (unit["attempts"] - 1)
+        return (
+            self.__execute(
+                "UPDATE units SET status = ?, error = ?, available_at = ?, "
+                "finished = ? WHERE id = ? AND status = 'leased' AND worker = ? "
+                "AND attempts = ?",
+                (
+                    "failed" if failed else "pending",
+                    error,
+                    now + delay,
+                    now if failed else None,
+                    unit["id"],
+                    unit["worker"],
+                    unit["attempts"],
+                ),
+            )
+            == 1
+        )
+
+    def release(self, unit: dict[str, Any]) -> bool:
+        """Give a leased unit back without counting the attempt, for example
+        when the daily quota is used. Returns False if the lease ended."""
+        return (
+            self.__execute(
+                "UPDATE units SET status = 'pending', attempts = attempts - 1 "
+                "WHERE id = ? AND status = 'leased' AND worker = ? "
+                "AND attempts = ?",
+                (unit["id"], unit["worker"], unit["attempts"]),
+            )
+            == 1
+        )
+
+    def retry_failed(self) -> int:
+        """Make all failed units pending again, with new attempts. Returns
+        the number of units."""
+        return self.__execute(
+            "UPDATE units SET status = 'pending', attempts = 0, available_at = 0, "
+            "finished = NULL WHERE status = 'failed'"
+        )
+
+    def failed(self) -> list[dict[str, Any]]:
+        """Get the failed units, with the error of their last attempt"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, endpoint, params, attempts, worker, error FROM units "
+                "WHERE status = 'failed' ORDER BY id"
+            ).fetchall()
+
+        return [{**_unit(row[:5]), "error": row[5]} for row in rows]
+
+    def status(self, window: float = STATUS_WINDOW) -> dict[str, Any]:
+        """Get the number of units per status, the number of workers that
+        hold a lease, the units completed per second in the last window
+        seconds, and the estimated seconds until all units are done (None
+        if nothing was completed in the window)"""
+        now = time.time()
+        with self._lock:
+            counts = dict(
+                self._connection.execute(
+                    "SELECT status, COUNT(*) FROM units GROUP BY status"
+                ).fetchall()
+            )
+            (workers,) = self._connection.execute(
+                "SELECT COUNT(DISTINCT worker) FROM units "
+                "WHERE status = 'leased' AND lease_until > ?",
+                (now,),
+            ).fetchone()
+            recent, first_started = self._connection.execute(
+                "SELECT COUNT(*), (SELECT MIN(started) FROM units) FROM units "
+                "WHERE status = 'done' AND finished >= ?",
+                (now - window,),
+            ).fetchone()
+
+        status: dict[str, Any] = {name: counts.get(name, 0) for name in STATUSES}
+        status["total"] = sum(counts.values())
+        status["workers"] = workers
+
+        # A crawl that started less than a window ago is measured since then
+        seconds = now - max(now - window, first_started or now)
+        rate = recent / seconds if recent and seconds > 0 else 0.0
+        status["units_per_second"] = rate
+        remaining = status["pending"] + status["leased"]
+        status["eta_seconds"] = remaining / rate if rate else None
+        return status
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM units"
+            ).fetchone()
+
+        return count
+
+    def clear(self) -> None:
+        """Remove all units"""
+        self.__execute("DELETE FROM units")
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
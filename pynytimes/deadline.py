@@ -0,0 +1,126 @@
+"""Deadlines and request budgets of calls that return partial results"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Iterable, Literal, Optional
+
+# Import standard Python dependencies
+import threading
+import time
+
+ReasonType = Literal["deadline", "max_requests"]
+
+
+class BudgetExceededError(Exception):
+    """The deadline of a call passed, or it made its maximum number of
+    requests"""
+
+    def __init__(self, reason: ReasonType):
+        super().__init__(f"Request budget exceeded: {reason}")
+        self.reason = reason
+
+
+class PartialResults(list):
+    """
+    List of results that can be incomplete. partial is set if the deadline
+    passed or the maximum number of requests was made before all results
+    were loaded, and reason tells which of the two.
+
+    Example:
+        articles = nyt.article_search("Election", results=500, deadline=2)
+        if articles.partial:
+            print(f"Only {len(articles)} articles, because of {articles.reason}")
+    """
+
+    def __init__(
+        self,
+        results: Iterable[Any] = (),
+        partial: bool = False,
+        reason: Optional[ReasonType] = None,
+    ):
+        super().__init__(results)
+        self.partial = partial
+        self.reason = reason
+
+    def stop(self, reason: ReasonType) -> None:
+        """Mark the results as partial"""
+        self.partial = True
+        self.reason = self.reason or reason
+
+
+class RequestBudget:
+    """
+    Deadline and maximum number of requests of a call, shared by all
+    threads that make its requests. A request is not started when the
+    average time of the responses so far does not fit before the deadline.
+    """
+
+    def __init__(self, deadline: Optional[float], max_requests: Optional[int]):
+        """Start the budget
+
+        Args:
+            deadline (float, optional): Seconds from now until the deadline,
+            None means no deadline
+            max_requests (int, optional): Requests that can be made, None means
+            no maximum
+        """
+        if deadline is not None:
+            if not isinstance(deadline, (int, float)) or isinstance(deadline, bool):
+                raise TypeError("Deadline needs to be int, float or None")
+
+            if deadline <= 0:
+                raise ValueError("Deadline needs to be more than 0 seconds")
+
+        if max_requests is not None:
+            if not isinstance(max_requests, int) or isinstance(max_requests, bool):
+                raise TypeError("Max requests needs to be int or None")
+
+            if max_requests < 1:
+                raise ValueError("Max requests needs to be at least 1")
+
+        self.deadline = None if deadline is None else time.monotonic() + deadline
+        self.max_requests = max_requests
+        self.requests = 0
+        self._responses = 0
+        self._response_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, None if there is no deadline"""
+        if self.deadline is None:
+            return None
+
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expected(self) -> float:
+        """Expected seconds of the next response, the average of the
+        responses so far"""
+        if self._responses == 0:
+            return 0.0
+
+        return self._response_seconds / self._responses
+
+    def record(self, seconds: float) -> None:
+        """Record the seconds a response took"""
+        with self._lock:
+            self._responses += 1
+            self._response_seconds += seconds
+
+    def take(self) -> None:
+        """Count a request
+
+        Raises:
+            BudgetExceededError: The deadline passed, or the response is not
+            expected before it, or the maximum number of requests is made
+        """
+        with self._lock:
+            remaining = self.remaining()
+            if remaining is not None and (
+                remaining == 0.0 or remaining < self.expected()
+            ):
+                raise BudgetExceededError("deadline")
+
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                raise BudgetExceededError("max_requests")
+
+            self.requests += 1
@@ -1,12 +1,29 @@
 from .article_metadata import article_metadata_set_url
 from .article_metadata import article_metadata_check_valid
+from .archive_metadata import archive_metadata_check_dates
+from .archive_metadata import archive_metadata_check_where, archive_metadata_iter_docs
+from .archive_metadata import archive_metadata_parse_raw, ARCHIVE_METADATA_LOCATION
+from .archive_metadata import WhereType
 from .article_search import article_search_check_input
+from .article_search import article_search_check_offset
 from .article_search import article_search_parse_dates
 from .article_search import article_search_parse_options
+from .article_search import article_search_parse_fq
 from .best_sellers import best_sellers_parse_date
+from .best_sellers import best_sellers_check_history_input
+from .best_sellers import best_sellers_next_dates, best_sellers_timeline
+from .backfill import backfill_check_input, backfill_history_windows
+from .backfill import backfill_schedule, backfill_search_requests, MINUTES_PER_DAY
+from .backfill import backfill_search_windows
 from .book_reviews import book_reviews_check_input
 from .book_reviews import book_reviews_extract_options
-from .dates import parse_dates
+from .book_reviews import book_reviews_normalize_isbn, book_reviews_many_options
+from .crawl import crawl_decode_params, crawl_encode_params, crawl_key
+from .dates import parse_date, parse_dates, serialize_date
+from .hash_index import AppendHashIndex, HashIndex, hash_index_key
+from .hash_index import hash_index_merge, hash_index_write
+from .fields import fields_check, fields_project, fields_top_level
+from .intern import intern_strings, INTERN_KEYS
 from .latest_articles import latest_articles_check_types
 from .load_data import raise_for_status, get_from_location
 from .most_shared import most_shared_check_method, most_shared_check_days
@@ -18,3 +35,6 @@ from .movie_reviews import (
 )
 from .movie_reviews import movie_reviews_parse_params
 from .tag_query import tag_query_check_types, tag_query_get_filter_options
+from .most_popular import most_popular_get_urls, most_popular_merge
+from .tag_index import TagIndex
+from .url_index import url_index_normalize
@@ -0,0 +1,123 @@
+"""Archive metadata helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Callable, Iterator, Optional, Union
+
+import datetime
+import json
+import re
+import time
+
+from .dates import parse_dates
+from .fields import fields_project
+from .intern import intern_strings
+from .load_data import get_from_location
+
+ARCHIVE_METADATA_LOCATION = ["response", "docs"]
+
+# Find the start of the documents, and the whitespace between them
+_DOCS_START = re.compile(r'"response"\s*:\s*\{.*?"docs"\s*:\s*\[', re.DOTALL)
+_WHITESPACE = re.compile(r"\s*")
+
+WhereType = Union[Callable[[dict[str, Any]], bool], dict[str, Any], None]
+
+
+def archive_metadata_check_dates(dates: list[Any], processes: Optional[int]):
+    """Check the months and number of processes of a bulk download"""
+    if not isinstance(dates, list):
+        raise TypeError("Dates needs to be a list")
+
+    for date in dates:
+        if not isinstance(date, (datetime.datetime, datetime.date)):
+            raise TypeError("Date has to be datetime or date")
+
+    if processes is not None:
+        if not isinstance(processes, int) or isinstance(processes, bool):
+            raise TypeError("Processes needs to be int or None")
+
+        if processes < 1:
+            raise ValueError("Processes needs to be at least 1")
+
+
+def archive_metadata_check_where(where: WhereType):
+    """Check the predicate that documents have to match"""
+    if where is not None and not callable(where) and not isinstance(where, dict):
+        raise TypeError("Where needs to be a function, dict or None")
+
+
+def _get_path(doc: dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+
+    return value
+
+
+def archive_metadata_where_function(
+    where: WhereType,
+) -> Optional[Callable[[dict[str, Any]], bool]]:
+    """Create the function that checks if a document matches, a dict
+    matches documents of which every (dotted) field equals the value, or is
+    one of the values if it is a list"""
+    if where is None or callable(where):
+        return where
+
+    conditions = [
+        (path, value if isinstance(value, (list, tuple, set)) else [value])
+        for path, value in where.items()
+    ]
+    return lambda doc: all(
+        _get_path(doc, path) in values for path, values in conditions
+    )
+
+
+def archive_metadata_iter_docs(content: bytes) -> Iterator[dict[str, Any]]:
+    """Decode the documents of an archive response one by one, so they do
+    not all have to be kept in memory"""
+    text = content.decode("utf-8")
+    match = _DOCS_START.search(text)
+    if match is None:
+        yield from get_from_location(json.loads(text), ARCHIVE_METADATA_LOCATION)
+        return
+
+    decoder = json.JSONDecoder()
+    position = _WHITESPACE.match(text, match.end()).end()  # type:ignore
+    while text[position] != "]":
+        doc, position = decoder.raw_decode(text, position)
+        yield doc
+
+        # Skip the comma between two documents
+        position = _WHITESPACE.match(text, position).end()  # type:ignore
+        if text[position] == ",":
+            position = _WHITESPACE.match(text, position + 1).end()  # type:ignore
+
+
+def archive_metadata_parse_raw(
+    content: bytes,
+    dates: bool,
+    fields: Optional[list[str]] = None,
+    where: WhereType = None,
+    intern: bool = False,
+) -> tuple[list[dict[str, Any]], float]:
+    """Decode the response of an archive month, filter its documents,
+    project their fields, intern their strings and parse their dates, this
+    can run in a worker process. Returns the documents and the time it
+    took."""
+    start = time.perf_counter()
+    matches = archive_metadata_where_function(where)
+    if matches is None:
+        docs = get_from_location(json.loads(content), ARCHIVE_METADATA_LOCATION)
+    else:
+        # Documents that do not match are never kept
+        docs = [doc for doc in archive_metadata_iter_docs(content) if matches(doc)]
+
+    docs = fields_project(docs, fields)
+    if intern:
+        intern_strings(docs)
+
+    if dates:
+        docs = parse_dates(docs, "rfc3339", ["pub_date"])  # type:ignore
+
+    return docs, time.perf_counter() - start
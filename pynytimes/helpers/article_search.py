@@ -5,6 +5,7 @@ from typing import Any, Final, Optional, Union
 
 # Import Python dependencies
 import datetime
+import re
 import warnings
 
 NoneType: Final = type(None)
@@ -12,6 +13,10 @@ NoneType: Final = type(None)
 LARGE_RESULTS_WARN = 100
 MAXIMUM_RESULTS = 2010
 
+# Filters in fq look like section_name:("Business" "Sports")
+FQ_FILTER = re.compile(r"^(\w+):\((.*)\)$")
+FQ_VALUE = re.compile(r'"([^"]*)"')
+
 # FIXME not all filters are implemented
 
 # Set query options that are currently supported
@@ -101,6 +106,18 @@ def article_search_check_input(
     _article_search_result_warnings(results)
 
 
+def article_search_check_offset(offset: int, page_size: int) -> None:
+    """Check the offset of article_search, it needs to start a page"""
+    if not isinstance(offset, int) or isinstance(offset, bool):
+        raise TypeError("Offset needs to be int")
+
+    if offset < 0 or offset % page_size != 0:
+        raise ValueError(f"Offset needs to be a positive multiple of {page_size}")
+
+    if offset >= MAXIMUM_RESULTS:
+        raise ValueError(f"Offset needs to be below {MAXIMUM_RESULTS}")
+
+
 def _convert_date_to_str(
     date: Union[datetime.datetime, datetime.date, None]
 ) -> Optional[str]:
@@ -171,5 +188,35 @@ def article_search_parse_options(options: dict[str, Any]) -> dict:
     # Set fq in options
     options["fq"] = fq
 
+    # Only return these fields, separated by commas
+    fl = options.get("fl")
+    if fl is not None:
+        if not isinstance(fl, list) or not all(isinstance(f, str) for f in fl):
+            raise TypeError("fl needs to be a list of str")
+
+        options["fl"] = ",".join(fl)
+
     # Return the options
     return options
+
+
+def article_search_parse_fq(fq: str) -> Optional[dict[str, list[str]]]:
+    """Get the values of every filter of an fq query, like the ones created
+    by article_search_parse_options. Returns None if fq uses other syntax,
+    like OR statements."""
+    filters: dict[str, list[str]] = {}
+    if fq.strip() == "":
+        return filters
+
+    for part in fq.split(" AND "):
+        match = FQ_FILTER.match(part.strip())
+        if match is None:
+            return None
+
+        name, values = match.groups()
+        if name in filters or FQ_VALUE.sub("", values).strip() != "":
+            return None
+
+        filters[name] = FQ_VALUE.findall(values)
+
+    return filters
@@ -0,0 +1,134 @@
+"""Backfill planner helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+import datetime
+import math
+
+from .best_sellers import best_sellers_check_history_input
+
+MINUTES_PER_DAY = 24 * 60
+
+# Best sellers lists are published every week (some every month)
+_LIST_INTERVAL = datetime.timedelta(days=7)
+
+# Keys of the searches and best sellers lists of a backfill
+BACKFILL_SEARCH_KEYS = ["query", "dates", "options", "results"]
+BACKFILL_BEST_SELLERS_KEYS = ["name", "start", "end"]
+
+
+def backfill_check_input(
+    archive_months: list[Any],
+    searches: list[dict[str, Any]],
+    best_sellers: list[dict[str, Any]],
+):
+    """Check the archive months, searches and best sellers lists to plan"""
+    for name, value in [
+        ("Archive months", archive_months),
+        ("Searches", searches),
+        ("Best sellers", best_sellers),
+    ]:
+        if not isinstance(value, list):
+            raise TypeError(f"{name} needs to be a list")
+
+    for date in archive_months:
+        if not isinstance(date, (datetime.datetime, datetime.date)):
+            raise TypeError("Date has to be datetime or date")
+
+    for search in searches:
+        if not isinstance(search, dict):
+            raise TypeError("Search needs to be a dict")
+
+        unknown = set(search) - set(BACKFILL_SEARCH_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown keys of search: {sorted(unknown)}")
+
+    for best_seller in best_sellers:
+        if not isinstance(best_seller, dict):
+            raise TypeError("Best sellers list needs to be a dict")
+
+        unknown = set(best_seller) - set(BACKFILL_BEST_SELLERS_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown keys of best sellers list: {sorted(unknown)}")
+
+        if "name" not in best_seller or "start" not in best_seller:
+            raise ValueError("Best sellers list needs a name and start")
+
+        best_sellers_check_history_input(
+            best_seller["name"], best_seller["start"], best_seller.get("end")
+        )
+
+
+def backfill_search_requests(
+    results: int, page_size: int, hits: Optional[int] = None
+) -> int:
+    """Estimate the requests article_search makes to load results articles.
+    Without the number of hits every page is assumed to be full."""
+    pages = math.ceil(min(results, 2010) / page_size)
+    if hits is None:
+        return max(pages, 1)
+
+    # Loading stops after the first page past the last hit
+    return max(min(pages, math.ceil(hits / page_size) + 1), 1)
+
+
+def backfill_search_windows(
+    results: int, page_size: int, requests: int, hits: Optional[int] = None
+) -> list[tuple[int, int, int]]:
+    """Split a search in ranges of pages that take at most requests
+    requests. Returns the offset, results and estimated requests of every
+    range."""
+    pages = backfill_search_requests(results, page_size, hits)
+    windows = []
+    for first_page in range(0, pages, requests):
+        window_pages = min(requests, pages - first_page)
+        offset = first_page * page_size
+        windows.append(
+            (offset, min(window_pages * page_size, results - offset), window_pages)
+        )
+
+    return windows
+
+
+def backfill_history_windows(
+    start: datetime.date, end: datetime.date, requests: int
+) -> list[tuple[datetime.date, datetime.date, int]]:
+    """Split the history of a best sellers list in windows that take at most
+    requests requests. Every window loads the list of its start, and every
+    list published after it, which is at most one every week. Returns the
+    start, end and estimated requests of every window."""
+    if requests < 1:
+        raise ValueError("A window needs at least 1 request")
+
+    windows = []
+    length = _LIST_INTERVAL * (requests - 1)
+    while start <= end:
+        window_end = min(end, start + length)
+        windows.append(
+            (start, window_end, 1 + math.ceil((window_end - start) / _LIST_INTERVAL))
+        )
+        start = window_end + datetime.timedelta(days=1)
+
+    return windows
+
+
+def backfill_schedule(requests: list[int], capacity: int, first_day: int) -> list[int]:
+    """Schedule steps in order over days, a step starts on the next day if
+    it does not fit in the requests that are left of a day. The first day
+    can have less requests left. Returns the day of every step."""
+    days = []
+    day, left = 0, first_day
+    for step in requests:
+        if step > capacity:
+            raise ValueError(
+                f"A step of {step} requests does not fit in a day of {capacity}"
+            )
+
+        while step > left:
+            day, left = day + 1, capacity
+
+        days.append(day)
+        left -= step
+
+    return days
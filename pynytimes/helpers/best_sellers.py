@@ -1,9 +1,11 @@
 # Import typings dependencies
 from __future__ import annotations
-from typing import Union
+from typing import Any, Union
 
 import datetime
 
+WEEK = datetime.timedelta(days=7)
+
 
 def best_sellers_parse_date(
     date: Union[datetime.date, datetime.datetime, None]
@@ -20,3 +22,80 @@ def best_sellers_parse_date(
     return datetime.datetime(date.year, date.month, date.day).strftime(
         "%Y-%m-%d"
     )
+
+
+def _to_date(date: Union[datetime.date, datetime.datetime]) -> datetime.date:
+    return datetime.date(date.year, date.month, date.day)
+
+
+def best_sellers_check_history_input(
+    name: str,
+    start: Union[datetime.date, datetime.datetime],
+    end: Union[datetime.date, datetime.datetime, None],
+):
+    if not isinstance(name, str):
+        raise TypeError("Name needs to be str")
+
+    date_types = (datetime.datetime, datetime.date)
+    if not isinstance(start, date_types):
+        raise TypeError("Start has to be a datetime or date object")
+
+    if not isinstance(end, (*date_types, type(None))):
+        raise TypeError("End has to be a datetime, date object or None")
+
+    if end is not None and _to_date(start) > _to_date(end):
+        raise ValueError("Start has to be before end")
+
+
+def best_sellers_next_dates(
+    best_sellers_list: dict[str, Any],
+    end: Union[datetime.date, datetime.datetime],
+    requested: set[datetime.date],
+) -> list[datetime.date]:
+    """Get the publication dates of the lists after this list, up to end
+
+    Weekly lists are published every 7 days, so all dates can be known from
+    one list. For other lists only the next published date is known."""
+    _end = _to_date(end)
+    published_date = datetime.date.fromisoformat(best_sellers_list["published_date"])
+
+    if best_sellers_list.get("updated") == "WEEKLY":
+        dates = []
+        date = published_date + WEEK
+        while date <= _end:
+            dates.append(date)
+            date += WEEK
+    else:
+        next_published_date = best_sellers_list.get("next_published_date")
+        if not next_published_date:
+            return []
+        dates = [datetime.date.fromisoformat(next_published_date)]
+
+    # Never request the same list twice
+    return [date for date in dates if date <= _end and date not in requested]
+
+
+def best_sellers_timeline(
+    best_sellers_lists: list[dict[str, Any]]
+) -> dict[str, list[tuple[str, int]]]:
+    """Create the rank history of every book (by ISBN-13) on the lists. Books
+    without an ISBN are kept by title and author, and skipped if they do not
+    have a title either, so unrelated books are never merged."""
+    # Every list only once, in order of publication
+    unique_lists = {
+        best_sellers_list["published_date"]: best_sellers_list
+        for best_sellers_list in best_sellers_lists
+    }
+
+    timeline: dict[str, list[tuple[str, int]]] = {}
+    for published_date in sorted(unique_lists):
+        for book in unique_lists[published_date]["books"]:
+            key = book.get("primary_isbn13") or book.get("primary_isbn10")
+            if not key and book.get("title"):
+                key = f"{book['title']} by {book.get('author') or 'unknown'}"
+            if not key:
+                continue
+
+            timeline.setdefault(key, []).append((published_date, book["rank"]))
+
+    return timeline
@@ -49,3 +49,79 @@ def book_reviews_extract_options(
             "You need to define one of the following: ISBN, author or title."
         )
     return filtered_options
+
+
+def _isbn13_check_digit(digits: str) -> str:
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def _isbn10_valid(isbn: str) -> bool:
+    # The check digit of ISBN-10 can be X, which is 10
+    digits = [10 if d == "X" else int(d) for d in isbn]
+    return sum((10 - i) * d for i, d in enumerate(digits)) % 11 == 0
+
+
+def book_reviews_normalize_isbn(isbn: Union[str, int]) -> str:
+    """Normalize an ISBN-10 or ISBN-13 into ISBN-13 without hyphens, the
+    check digit needs to be valid"""
+    if not isinstance(isbn, (str, int)):
+        raise TypeError("ISBN needs to be int or str")
+
+    _isbn = str(isbn).replace("-", "").replace(" ", "").upper()
+
+    if (
+        len(_isbn) == 13
+        and _isbn.isdigit()
+        and _isbn[12] == _isbn13_check_digit(_isbn[:12])
+    ):
+        return _isbn
+
+    # Convert ISBN-10 into ISBN-13
+    if (
+        len(_isbn) == 10
+        and _isbn[:9].isdigit()
+        and _isbn[9] in "0123456789X"
+        and _isbn10_valid(_isbn)
+    ):
+        digits = "978" + _isbn[:9]
+        return digits + _isbn13_check_digit(digits)
+
+    raise ValueError(f"ISBN {isbn} is not a valid ISBN-10 or ISBN-13")
+
+
+def book_reviews_many_options(
+    isbns: Optional[list[Union[str, int]]],
+    authors: Optional[list[str]],
+    titles: Optional[list[str]],
+) -> dict[tuple[str, str], dict[str, str]]:
+    """Get the request options of every input of book_reviews_many, by kind
+    of input and normalized value, so inputs of different types (like an
+    ISBN as int and as str) or kinds never share a key"""
+    inputs: dict[str, list] = {
+        "isbn": isbns or [],
+        "author": authors or [],
+        "title": titles or [],
+    }
+
+    options: dict[tuple[str, str], dict[str, str]] = {}
+    for option, values in inputs.items():
+        if not isinstance(values, list):
+            raise TypeError(f"{option.capitalize()}s needs to be a list")
+
+        for value in values:
+            if option == "isbn":
+                normalized = book_reviews_normalize_isbn(value)
+            else:
+                book_reviews_check_input(**{option: value})
+                normalized = " ".join(value.split())
+
+            options[(option, normalized)] = {option: normalized}
+
+    if len(options) == 0:
+        raise ValueError(
+            "You need to define at least one of the following: ISBNs, "
+            + "authors or titles."
+        )
+
+    return options
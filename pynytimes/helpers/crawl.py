@@ -0,0 +1,50 @@
+"""Crawl queue helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any
+
+import datetime
+import json
+
+# Dates in parameters are stored as {"$date": "2020-01-01"}
+_DATE_TAGS = {"$datetime": datetime.datetime, "$date": datetime.date}
+
+
+def crawl_encode_params(params: Any) -> Any:
+    """Make the parameters of a work unit JSON serializable, dates and
+    datetimes are tagged so they can be decoded again"""
+    if isinstance(params, datetime.datetime):
+        return {"$datetime": params.isoformat()}
+
+    if isinstance(params, datetime.date):
+        return {"$date": params.isoformat()}
+
+    if isinstance(params, dict):
+        return {key: crawl_encode_params(value) for key, value in params.items()}
+
+    if isinstance(params, (list, tuple)):
+        return [crawl_encode_params(value) for value in params]
+
+    return params
+
+
+def crawl_decode_params(params: Any) -> Any:
+    """Decode parameters encoded by crawl_encode_params"""
+    if isinstance(params, dict):
+        if len(params) == 1:
+            tag, value = next(iter(params.items()))
+            if tag in _DATE_TAGS:
+                return _DATE_TAGS[tag].fromisoformat(value)
+
+        return {key: crawl_decode_params(value) for key, value in params.items()}
+
+    if isinstance(params, list):
+        return [crawl_decode_params(value) for value in params]
+
+    return params
+
+
+def crawl_key(endpoint: str, params: dict[str, Any]) -> str:
+    """Create the key of a work unit, units with the same key are the same
+    work"""
+    return endpoint + "?" + json.dumps(crawl_encode_params(params), sort_keys=True)
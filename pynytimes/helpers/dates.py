@@ -51,9 +51,27 @@ def parse_dates(
     for article in articles:
         parsed_article: dict[str, Any] = article
         for location in locations:
+            # Skip dates that are not loaded, for example by a projection
+            if location not in parsed_article:
+                continue
+
             parsed_article[location] = parse_date(
                 parsed_article[location], date_type
             )
         parsed_articles.append(article)
 
     return parsed_articles
+
+
+def serialize_date(value: Any) -> str:
+    """Format a parsed date like the API does, to use as default of
+    json.dumps"""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        return value.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -0,0 +1,73 @@
+"""Field projection helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+
+def fields_check(fields: Optional[list[str]]):
+    """Check the fields of a projection"""
+    if fields is None:
+        return
+
+    if not isinstance(fields, list):
+        raise TypeError("Fields needs to be a list or None")
+
+    for field in fields:
+        if not isinstance(field, str) or field == "":
+            raise TypeError("Every field needs to be a non-empty str")
+
+
+def fields_top_level(fields: list[str]) -> list[str]:
+    """Get the top level keys of the fields, for example to use them in the
+    fl parameter of Article Search"""
+    return list(dict.fromkeys(field.split(".")[0] for field in fields))
+
+
+def _fields_tree(fields: list[str]) -> dict[str, Any]:
+    # Create a tree of the dotted paths, an empty dict means the whole value
+    # is kept
+    tree: dict[str, Any] = {}
+    for field in fields:
+        node = tree
+        keys = field.split(".")
+        for i, key in enumerate(keys):
+            if key in node and not node[key]:
+                break  # The whole value is already kept
+
+            if i == len(keys) - 1:
+                node[key] = {}
+            else:
+                node = node.setdefault(key, {})
+
+    return tree
+
+
+def _fields_project_value(value: Any, tree: dict[str, Any]) -> Any:
+    if not tree:
+        return value
+
+    # Project every item of a list, for example keywords.value
+    if isinstance(value, list):
+        return [_fields_project_value(item, tree) for item in value]
+
+    if isinstance(value, dict):
+        return {
+            key: _fields_project_value(value[key], subtree)
+            for key, subtree in tree.items()
+            if key in value
+        }
+
+    return value
+
+
+def fields_project(
+    articles: list[dict[str, Any]], fields: Optional[list[str]]
+) -> list[dict[str, Any]]:
+    """Only keep the fields of every article, fields are dotted paths like
+    headline.main. Missing fields are left out. Returns a new list, the
+    articles are not changed."""
+    if fields is None:
+        return articles
+
+    tree = _fields_tree(fields)
+    return [_fields_project_value(article, tree) for article in articles]
@@ -0,0 +1,200 @@
+"""Sorted hash index stored on disk, read with a memory map"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Iterator, Optional
+
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+HASH_INDEX_MAGIC = b"NYTHIDX1"
+
+# Magic, number of entries and a tag the owner of the index can set (like the
+# size of the data it indexes), followed by the sorted keys and their values
+_HEADER = struct.Struct("<8sQQ")
+
+
+def hash_index_key(text: str) -> int:
+    """Hash text into an unsigned 64 bit key"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _hash_index_bytes(numbers: list[int]) -> bytes:
+    # The index is always little endian
+    packed = array("Q", numbers)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def hash_index_write(path: str, keys: array, values: array, tag: int = 0) -> None:
+    """Write the keys and values (both arrays of unsigned 64 bit integers)
+    as an index sorted by key. Replaces the file at once."""
+    if len(keys) != len(values):
+        raise ValueError("Keys and values need to have the same length")
+
+    # Values of the same key keep the order they had
+    added: dict[int, list[int]] = {}
+    for key, value in zip(keys, values):
+        added.setdefault(key, []).append(value)
+
+    hash_index_merge(path, None, added, tag)
+
+
+def hash_index_merge(
+    path: str,
+    index: Optional[HashIndex],
+    added: dict[int, list[int]],
+    tag: int = 0,
+) -> None:
+    """Write the entries of index and the added values (by key) as a new
+    index at path. Only the added keys are sorted, the entries of index are
+    copied in one pass. Values of a key that is in index come before its
+    added values. Closes index, and replaces the file at once."""
+    added_keys = sorted(added)
+    count = sum(len(values) for values in added.values())
+
+    # Where every added key goes between the entries of index
+    positions = [0] * len(added_keys)
+    if index is not None:
+        count += len(index)
+        positions = [bisect.bisect_right(index._keys, key) for key in added_keys]
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(_HEADER.pack(HASH_INDEX_MAGIC, count, tag))
+        for column in ["_keys", "_values"]:
+            start = 0
+            for key, position in zip(added_keys, positions):
+                if index is not None:
+                    f.write(getattr(index, column)[start:position])
+                start = position
+
+                values = added[key]
+                f.write(
+                    _hash_index_bytes(
+                        [key] * len(values) if column == "_keys" else values
+                    )
+                )
+
+            if index is not None:
+                f.write(getattr(index, column)[start:])
+
+    # The memory map needs to be closed before its file can be replaced
+    if index is not None:
+        index.close()
+    os.replace(temporary_path, path)
+
+
+class HashIndex:
+    """
+    Read-only index of unsigned 64 bit keys to values. The file is memory
+    mapped, so opening it is instant and lookups only read the pages they
+    need.
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder == "big":
+            raise RuntimeError("Hash indexes are only supported on little endian")
+
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, self.tag = _HEADER.unpack_from(self._map)
+        if magic != HASH_INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a hash index")
+
+        start = _HEADER.size
+        middle = start + 8 * self._count
+        view = memoryview(self._map)
+        self._keys = view[start:middle].cast("Q")
+        self._values = view[middle : middle + 8 * self._count].cast("Q")
+        view.release()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: int) -> list[int]:
+        """Get all values of a key, in the order they were written"""
+        values = []
+        i = bisect.bisect_left(self._keys, key)
+        while i < self._count and self._keys[i] == key:
+            values.append(self._values[i])
+            i += 1
+
+        return values
+
+    def __contains__(self, key: int) -> bool:
+        i = bisect.bisect_left(self._keys, key)
+        return i < self._count and self._keys[i] == key
+
+    def arrays(self) -> tuple[array, array]:
+        """Copy all keys and values, for example to write a new index"""
+        return array("Q", self._keys), array("Q", self._values)
+
+    def items(self) -> Iterator[tuple[int, int]]:
+        return zip(self._keys, self._values)
+
+    def close(self) -> None:
+        # Views of the memory map need to be released before it is closed
+        for view in ["_keys", "_values"]:
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self._map.close()
+        self._file.close()
+
+
+class AppendHashIndex:
+    """
+    Hash index on disk that values can be added to. Added values are kept in
+    memory until the index is saved, which merges them into the index file.
+    The tag is set when saving, owners use it to remember how much of their
+    data is indexed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tag = 0
+        self._index: Optional[HashIndex] = None
+        if os.path.exists(path):
+            self._index = HashIndex(path)
+            self.tag = self._index.tag
+
+        # Values that are not in the index file yet
+        self._pending: dict[int, list[int]] = {}
+        self._pending_count = 0
+
+    def __len__(self) -> int:
+        indexed = 0 if self._index is None else len(self._index)
+        return indexed + self._pending_count
+
+    def add(self, key: int, value: int) -> None:
+        self._pending.setdefault(key, []).append(value)
+        self._pending_count += 1
+
+    def get(self, key: int) -> list[int]:
+        """Get all values of a key, in the order they were added"""
+        values = [] if self._index is None else self._index.get(key)
+        return values + self._pending.get(key, [])
+
+    def save(self, tag: int) -> None:
+        """Write the added values to the index file"""
+        if not self._pending:
+            return
+
+        hash_index_merge(self.path, self._index, self._pending, tag)
+        self._index = HashIndex(self.path)
+        self.tag = tag
+        self._pending = {}
+        self._pending_count = 0
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.close()
@@ -0,0 +1,63 @@
+"""String interning helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Final
+
+import sys
+
+# Keys of which the values repeat a lot, like sections and keyword types
+INTERN_KEYS: Final = frozenset(
+    [
+        "crop_name",
+        "des_facet",
+        "document_type",
+        "geo_facet",
+        "item_type",
+        "major",
+        "material_type_facet",
+        "name",
+        "news_desk",
+        "org_facet",
+        "per_facet",
+        "print_section",
+        "role",
+        "section",
+        "section_name",
+        "source",
+        "subsection",
+        "subsection_name",
+        "subtype",
+        "type",
+        "type_of_material",
+        "value",
+    ]
+)
+
+
+def intern_strings(value: Any, keys: frozenset[str] = INTERN_KEYS) -> Any:
+    """Intern the strings of these keys everywhere in a response, so every
+    repeated value is only kept in memory once. The response is changed in
+    place and returned."""
+    if isinstance(value, list):
+        for item in value:
+            if isinstance(item, (dict, list)):
+                intern_strings(item, keys)
+
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, str):
+                if key in keys:
+                    value[key] = sys.intern(item)
+
+            elif isinstance(item, list) and key in keys:
+                # Lists of strings, like facets
+                item[:] = [
+                    sys.intern(element) if isinstance(element, str) else element
+                    for element in item
+                ]
+                intern_strings(item, keys)
+
+            elif isinstance(item, (dict, list)):
+                intern_strings(item, keys)
+
+    return value
@@ -0,0 +1,41 @@
+"""Most popular helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any
+
+from .most_shared import most_shared_get_url
+
+MOST_POPULAR_DAYS = [1, 7, 30]
+MOST_POPULAR_SHARE_METHODS = ["email", "facebook"]
+
+
+def most_popular_get_urls(base_url: str) -> dict[str, str]:
+    """Get the URLs of all most viewed and most shared lists, by name"""
+    urls = []
+    for days in MOST_POPULAR_DAYS:
+        urls.append(f"{base_url}viewed/{days}.json")
+        for method in MOST_POPULAR_SHARE_METHODS:
+            urls.append(most_shared_get_url(base_url, method, days))  # type:ignore
+
+    # Name every list after its path, for example "shared/7/facebook"
+    return {url[len(base_url) : -len(".json")]: url for url in urls}
+
+
+def most_popular_merge(
+    results: dict[str, list[dict[str, Any]]]
+) -> list[dict[str, Any]]:
+    """Merge all lists into one record per article, with the rank of the
+    article in every list it is on"""
+    merged: dict[str, dict[str, Any]] = {}
+    for name, articles in results.items():
+        for rank, article in enumerate(articles, start=1):
+            # Keep the metadata of the first list the article is found on
+            record = merged.get(article["uri"])
+            if record is None:
+                record = article
+                record["ranks"] = {}
+                merged[article["uri"]] = record
+
+            record["ranks"][name] = rank
+
+    return list(merged.values())
@@ -0,0 +1,118 @@
+"""Local prefix index of Times Tags responses"""
+# Import typings dependencies
+from __future__ import annotations
+from typing import Optional
+
+import re
+import threading
+
+MAX_ENTRIES = 10000
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _tag_matches(tag: str, query: str) -> bool:
+    # A tag matches if one of its words starts with the query
+    normalized = _normalize(tag)
+    return normalized.startswith(query) or f" {query}" in normalized
+
+
+class TagIndex:
+    """
+    Caches Times Tags responses by query. Queries that extend a cached query
+    are answered locally if the cached response was complete, so contained
+    less results than the maximum. Responses without a maximum are never
+    complete, as the API then applies a maximum of its own.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # For every filter the responses by normalized query, with the
+        # maximum number of results that were requested and whether the
+        # response contains all matching tags
+        self._entries: dict[
+            Optional[str], dict[str, tuple[list[str], Optional[int], bool]]
+        ] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def get(
+        self,
+        query: str,
+        filter_options: Optional[str] = None,
+        max_results: Optional[int] = None,
+    ) -> Optional[list[str]]:
+        """Get the tags of a query from the index, None if the index
+        cannot answer the query"""
+        _query = _normalize(query)
+        with self._lock:
+            entries = self._entries.get(filter_options, {})
+
+            # Use the response of this query, or of the longest prefix of it
+            for i in range(len(_query), 0, -1):
+                entry = entries.get(_query[:i])
+                if entry is None:
+                    continue
+
+                tags, cached_max, complete = entry
+                if i == len(_query):
+                    # An incomplete response can only answer the same request,
+                    # or requests for less tags than it contains
+                    if (
+                        not complete
+                        and max_results != cached_max
+                        and (max_results is None or max_results > len(tags))
+                    ):
+                        return None
+                else:
+                    # Responses of a prefix only contain all matching tags if
+                    # the response was complete
+                    if not complete:
+                        return None
+
+                    tags = [tag for tag in tags if _tag_matches(tag, _query)]
+                    self.__set(entries, _query, tags, None, True)
+
+                return tags if max_results is None else tags[:max_results]
+
+        return None
+
+    def set(
+        self,
+        query: str,
+        tags: list[str],
+        filter_options: Optional[str] = None,
+        max_results: Optional[int] = None,
+    ) -> None:
+        """Add a response to the index"""
+        complete = max_results is not None and len(tags) < max_results
+        with self._lock:
+            entries = self._entries.setdefault(filter_options, {})
+            self.__set(entries, _normalize(query), tags, max_results, complete)
+
+    def __set(
+        self,
+        entries: dict[str, tuple[list[str], Optional[int], bool]],
+        query: str,
+        tags: list[str],
+        max_results: Optional[int],
+        complete: bool,
+    ):
+        # Remove the oldest response if the index is full, the caller holds
+        # the lock
+        if query not in entries and len(entries) >= self.max_entries:
+            del entries[next(iter(entries))]
+
+        entries[query] = (tags, max_results, complete)
+
+    def clear(self) -> None:
+        """Remove all responses from the index"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,31 @@
+"""URL index helper functions"""
+# Import typings dependencies
+from __future__ import annotations
+
+from urllib.parse import urlsplit
+
+# Hosts that serve the same articles as www.nytimes.com
+_HOST_PREFIXES = ["www.", "mobile.", "m."]
+
+
+def url_index_normalize(url: str) -> str:
+    """Normalize an article URL, so the different forms of a link to the
+    same article are equal. The scheme, query and fragment are dropped,
+    the host is stripped of www., mobile. and m., and AMP pages point to the
+    article itself."""
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url.lstrip('/')}"
+
+    parts = urlsplit(url.lower())
+    host = parts.hostname or ""
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+            break
+
+    path = parts.path.rstrip("/")
+    if path.endswith(".amp.html"):
+        path = f"{path[: -len('.amp.html')]}.html"
+
+    return f"{host}{path}"
@@ -0,0 +1,402 @@
+"""Request metrics and instrumentation hooks"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Callable, Optional
+
+# Import standard Python dependencies
+import bisect
+import logging
+import re
+import threading
+import time
+
+# Import other dependencies
+from urllib3.util.retry import Retry
+
+from .deadline import BudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_DATE_SEGMENT = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+Hook = Callable[[str, dict[str, Any]], None]
+
+
+def metrics_endpoint(url: str, base_url: str) -> str:
+    """Get the endpoint of a URL, with dates and numbers replaced so that
+    all requests to the same endpoint are grouped together"""
+    path = url[len(base_url) :] if url.startswith(base_url) else url
+    segments = []
+    for segment in path.split("/"):
+        name, dot, extension = segment.partition(".")
+        if _DATE_SEGMENT.match(name):
+            name = "{date}"
+        elif name.isdigit():
+            name = "{n}"
+        segments.append(name + dot + extension)
+
+    return "/".join(segments)
+
+
+def _label_value(value: Any) -> str:
+    # Backslashes, quotes and newlines need to be escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    """Format the labels of a Prometheus sample"""
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+class BackoffRetry(Retry):
+    """
+    Retry of urllib3 that measures the seconds it sleeps before a retry (the
+    backoff, or the Retry-After of the response), per thread. NYTAPI records
+    them as a throttling wait, next to the wait for the quota. A thread can
+    set a deadline, a retry that would sleep past it is not made.
+    """
+
+    _slept = threading.local()
+    _deadline = threading.local()
+
+    @classmethod
+    def set_deadline(cls, deadline: Optional[float]) -> None:
+        """Set the deadline (in time.monotonic seconds) of the retries of
+        this thread, None means no deadline"""
+        cls._deadline.monotonic = deadline
+
+    @classmethod
+    def take_slept(cls) -> float:
+        """Get the seconds this thread slept before retries, and start
+        counting from zero again"""
+        slept = getattr(cls._slept, "seconds", 0.0)
+        cls._slept.seconds = 0.0
+        return slept
+
+    def __sleep_seconds(self, response: Any) -> float:
+        if self.respect_retry_after_header and response:
+            retry_after = self.get_retry_after(response)
+            if retry_after:
+                return retry_after
+
+        return self.get_backoff_time()
+
+    def sleep(self, response: Any = None) -> None:
+        deadline = getattr(self._deadline, "monotonic", None)
+        if (
+            deadline is not None
+            and time.monotonic() + self.__sleep_seconds(response) >= deadline
+        ):
+            raise BudgetExceededError("deadline")
+
+        start = time.perf_counter()
+        try:
+            super().sleep(response)
+        finally:
+            slept = getattr(self._slept, "seconds", 0.0)
+            self._slept.seconds = slept + time.perf_counter() - start
+
+
+class _EndpointMetrics:
+    __slots__ = (
+        "requests",
+        "errors",
+        "statuses",
+        "buckets",
+        "latency_sum",
+        "bytes",
+        "retries",
+        "cache_hits",
+        "decode_seconds",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses: dict[int, int] = {}
+        # Last bucket counts requests slower than all LATENCY_BUCKETS
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.decode_seconds = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "latency_buckets": dict(
+                zip([*LATENCY_BUCKETS, float("inf")], self.buckets)
+            ),
+            "latency_sum": self.latency_sum,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "decode_seconds": self.decode_seconds,
+        }
+
+
+class _PriorityMetrics:
+    __slots__ = ("requests", "buckets", "latency_sum", "wait_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.wait_seconds = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "latency_buckets": dict(
+                zip([*LATENCY_BUCKETS, float("inf")], self.buckets)
+            ),
+            "latency_sum": self.latency_sum,
+            "wait_seconds": self.wait_seconds,
+        }
+
+
+class Metrics:
+    """
+    Collects metrics of all requests made by NYTAPI, per endpoint: number of
+    requests, latency histogram, response bytes, retries, cache hits and JSON
+    decode time. Also collects date parse time, throttling waits, and the
+    latency of requests per priority, including the wait for the quota.
+
+    Hooks are called for every event with the name of the event ("request",
+    "cache_hit", "parse", "wait" or "priority") and a dict with its data.
+    They are called in the thread that makes the request, an exception of a
+    hook is logged and does not fail the request.
+
+    Example:
+        nyt = NYTAPI("Your API key")
+        nyt.metrics.add_hook(lambda event, data: print(event, data))
+        print(nyt.metrics.to_prometheus())
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hooks: list[Hook] = []
+        self.reset()
+
+    def reset(self) -> None:
+        """Set all metrics to zero"""
+        with self._lock:
+            self._endpoints: dict[str, _EndpointMetrics] = {}
+            self._parse_seconds: dict[str, float] = {}
+            self._wait_seconds: dict[str, float] = {}
+            self._priorities: dict[str, _PriorityMetrics] = {}
+
+    def add_hook(self, hook: Hook) -> None:
+        """Call hook(event, data) for every event"""
+        if not callable(hook):
+            raise TypeError("Hook needs to be callable")
+
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Stop calling a hook"""
+        self._hooks.remove(hook)
+
+    def __emit(self, event: str, data: dict[str, Any]):
+        for hook in self._hooks:
+            try:
+                hook(event, data)
+            except Exception:
+                logger.exception("Metrics hook %r failed on %s event", hook, event)
+
+    def __endpoint(self, endpoint: str) -> _EndpointMetrics:
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = _EndpointMetrics()
+
+        return metrics
+
+    def record_request(
+        self,
+        endpoint: str,
+        seconds: float,
+        status: Optional[int] = None,
+        size: int = 0,
+        retries: int = 0,
+    ) -> None:
+        """Record a request, status is None if the request failed"""
+        with self._lock:
+            metrics = self.__endpoint(endpoint)
+            metrics.requests += 1
+            if status is None or status >= 400:
+                metrics.errors += 1
+            if status is not None:
+                metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            metrics.latency_sum += seconds
+            metrics.bytes += size
+            metrics.retries += retries
+
+        self.__emit(
+            "request",
+            {
+                "endpoint": endpoint,
+                "seconds": seconds,
+                "status": status,
+                "bytes": size,
+                "retries": retries,
+            },
+        )
+
+    def record_decode(self, endpoint: str, seconds: float) -> None:
+        """Record time spent decoding the JSON of a response"""
+        with self._lock:
+            self.__endpoint(endpoint).decode_seconds += seconds
+
+        self.__emit(
+            "parse", {"stage": "json", "endpoint": endpoint, "seconds": seconds}
+        )
+
+    def record_cache_hit(self, endpoint: str) -> None:
+        """Record a response that was loaded from a cache"""
+        with self._lock:
+            self.__endpoint(endpoint).cache_hits += 1
+
+        self.__emit("cache_hit", {"endpoint": endpoint})
+
+    def record_parse(self, stage: str, seconds: float) -> None:
+        """Record time spent parsing, for example parsing dates"""
+        with self._lock:
+            self._parse_seconds[stage] = self._parse_seconds.get(stage, 0.0) + seconds
+
+        self.__emit("parse", {"stage": stage, "seconds": seconds})
+
+    def record_wait(self, reason: str, seconds: float) -> None:
+        """Record time spent waiting before a request could be made"""
+        with self._lock:
+            self._wait_seconds[reason] = self._wait_seconds.get(reason, 0.0) + seconds
+
+        self.__emit("wait", {"reason": reason, "seconds": seconds})
+
+    def record_priority(self, priority: str, waited: float, seconds: float) -> None:
+        """Record the latency of a request of a priority, from the moment it
+        waited for the quota until the response"""
+        with self._lock:
+            metrics = self._priorities.get(priority)
+            if metrics is None:
+                metrics = self._priorities[priority] = _PriorityMetrics()
+
+            latency = waited + seconds
+            metrics.requests += 1
+            metrics.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            metrics.latency_sum += latency
+            metrics.wait_seconds += waited
+
+        self.__emit(
+            "priority", {"priority": priority, "waited": waited, "seconds": seconds}
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get a copy of all metrics"""
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: metrics.as_dict()
+                    for endpoint, metrics in self._endpoints.items()
+                },
+                "parse_seconds": dict(self._parse_seconds),
+                "wait_seconds": dict(self._wait_seconds),
+                "priorities": {
+                    priority: metrics.as_dict()
+                    for priority, metrics in self._priorities.items()
+                },
+            }
+
+    def to_prometheus(self, prefix: str = "pynytimes") -> str:
+        """Export all metrics in the Prometheus text format"""
+        snapshot = self.snapshot()
+        endpoints = snapshot["endpoints"]
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, description: str):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        metric("requests_total", "counter", "Number of requests.")
+        for endpoint, metrics in endpoints.items():
+            for status, count in metrics["statuses"].items():
+                labels = _labels(endpoint=endpoint, status=status)
+                lines.append(f"{prefix}_requests_total{{{labels}}} {count}")
+            failed = metrics["requests"] - sum(metrics["statuses"].values())
+            if failed:
+                labels = _labels(endpoint=endpoint, status="error")
+                lines.append(f"{prefix}_requests_total{{{labels}}} {failed}")
+
+        metric("request_duration_seconds", "histogram", "Latency of requests.")
+        for endpoint, metrics in endpoints.items():
+            cumulative = 0
+            for bound, count in metrics["latency_buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _labels(endpoint=endpoint, le=le)
+                lines.append(
+                    f"{prefix}_request_duration_seconds_bucket{{{labels}}} {cumulative}"
+                )
+            labels = _labels(endpoint=endpoint)
+            lines.append(
+                f"{prefix}_request_duration_seconds_sum{{{labels}}} "
+                + repr(metrics["latency_sum"])
+            )
+            lines.append(
+                f"{prefix}_request_duration_seconds_count{{{labels}}} {cumulative}"
+            )
+
+        counters = [
+            ("response_bytes_total", "bytes", "Size of responses in bytes."),
+            ("retries_total", "retries", "Number of retried requests."),
+            ("cache_hits_total", "cache_hits", "Responses loaded from a cache."),
+            ("decode_seconds_total", "decode_seconds", "Time spent decoding JSON."),
+        ]
+        for name, key, description in counters:
+            metric(name, "counter", description)
+            for endpoint, metrics in endpoints.items():
+                labels = _labels(endpoint=endpoint)
+                lines.append(f"{prefix}_{name}{{{labels}}} {metrics[key]!r}")
+
+        metric("parse_seconds_total", "counter", "Time spent parsing.")
+        for stage, seconds in snapshot["parse_seconds"].items():
+            labels = _labels(stage=stage)
+            lines.append(f"{prefix}_parse_seconds_total{{{labels}}} {seconds!r}")
+
+        metric("wait_seconds_total", "counter", "Time spent waiting to request.")
+        for reason, seconds in snapshot["wait_seconds"].items():
+            labels = _labels(reason=reason)
+            lines.append(f"{prefix}_wait_seconds_total{{{labels}}} {seconds!r}")
+
+        metric(
+            "priority_duration_seconds",
+            "histogram",
+            "Latency of requests per priority, including the wait for the quota.",
+        )
+        for priority, metrics in snapshot["priorities"].items():
+            cumulative = 0
+            for bound, count in metrics["latency_buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _labels(priority=priority, le=le)
+                lines.append(
+                    f"{prefix}_priority_duration_seconds_bucket{{{labels}}} "
+                    f"{cumulative}"
+                )
+            labels = _labels(priority=priority)
+            lines.append(
+                f"{prefix}_priority_duration_seconds_sum{{{labels}}} "
+                + repr(metrics["latency_sum"])
+            )
+            lines.append(
+                f"{prefix}_priority_duration_seconds_count{{{labels}}} {cumulative}"
+            )
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,431 @@
+"""Streaming pipelines of stages connected by bounded queues"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Callable, Iterable, Iterator, Literal, Optional
+
+# Import standard Python dependencies
+import queue
+import threading
+import time
+
+# Default number of items that can wait between two stages
+QUEUE_SIZE = 16
+
+# Seconds between checks if the pipeline was stopped by an error
+_POLL_SECONDS = 0.1
+
+StageKind = Literal["map", "filter", "flat_map", "batch", "sink"]
+
+
+class _Done:
+    """Marks the end of the items of a queue"""
+
+
+_DONE = _Done()
+
+
+class _Stopped(Exception):
+    """Another stage failed, so this stage stops"""
+
+
+class _Stage:
+    def __init__(
+        self,
+        name: str,
+        kind: StageKind,
+        function: Optional[Callable[[Any], Any]],
+        workers: int,
+        size: int = 0,
+    ):
+        self.name = name
+        self.kind = kind
+        self.function = function
+        self.workers = workers
+        self.size = size
+
+        self.lock = threading.Lock()
+        self.running = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_seconds = 0.0
+        self.input_wait_seconds = 0.0
+        self.output_wait_seconds = 0.0
+
+    def as_dict(self, seconds: float) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": self.busy_seconds,
+            "input_wait_seconds": self.input_wait_seconds,
+            "output_wait_seconds": self.output_wait_seconds,
+            "items_per_second": self.items_out / seconds if seconds else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    Streams items through stages that run at the same time, in threads.
+    Stages are connected by bounded queues, so a fast stage waits for a slow
+    stage after it instead of keeping all its results in memory, and fetching,
+    decoding and writing overlap. Metrics of every stage show where the time
+    is spent: a stage that waits long for input is fed by a slow stage, a
+    stage that waits long for output feeds a slow stage.
+
+    Stages with one worker keep the order of the items, stages with more
+    workers do not. Using more workers helps stages that wait for the network
+    or release the GIL, not stages that only use Python.
+
+    Example:
+        nyt = NYTAPI("Your API key")
+        pipeline = (
+            Pipeline(dates, queue_size=2)
+            .map(nyt.archive_metadata_raw, name="fetch", workers=4)
+            .flat_map(archive_metadata_iter_docs, name="decode")
+            .filter(lambda doc: doc["section_name"] == "Business")
+            .batch(1000)
+            .sink(log.add, name="write")
+        )
+        pipeline.run()
+        print(pipeline.metrics())
+    """
+
+    def __init__(self, source: Iterable[Any], queue_size: int = QUEUE_SIZE):
+        """Create a pipeline
+
+        Args:
+            source (Iterable): Items that go through the pipeline, read in a
+            thread of its own
+            queue_size (int, optional): Number of items that can wait between
+            two stages. Defaults to 16.
+        """
+        if not isinstance(queue_size, int) or isinstance(queue_size, bool):
+            raise TypeError("Queue size needs to be int")
+
+        if queue_size < 1:
+            raise ValueError("Queue size needs to be at least 1")
+
+        self.source = source
+        self.queue_size = queue_size
+        self._source_stage = _Stage("source", "map", None, 1)
+        self._stages: list[_Stage] = []
+        self._started = False
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._start_time = 0.0
+        self._end_time: Optional[float] = None
+
+    def __add(
+        self,
+        kind: StageKind,
+        function: Optional[Callable[[Any], Any]],
+        name: Optional[str],
+        workers: int,
+        size: int = 0,
+    ) -> Pipeline:
+        if self._started:
+            raise RuntimeError("Stages can not be added to a pipeline that runs")
+
+        if self._stages and self._stages[-1].kind == "sink":
+            raise ValueError("Stages can not be added after the sink")
+
+        if function is not None and not callable(function):
+            raise TypeError("Function needs to be callable")
+
+        if not isinstance(workers, int) or isinstance(workers, bool):
+            raise TypeError("Workers needs to be int")
+
+        if workers < 1:
+            raise ValueError("Workers needs to be at least 1")
+
+        if name is None:
+            name = f"{kind}_{len(self._stages)}"
+
+        names = [stage.name for stage in [self._source_stage, *self._stages]]
+        if name in names:
+            raise ValueError(f"There already is a stage named {name}")
+
+        self._stages.append(_Stage(name, kind, function, workers, size))
+        return self
+
+    def map(
+        self,
+        function: Callable[[Any], Any],
+        name: Optional[str] = None,
+        workers: int = 1,
+    ) -> Pipeline:
+        """Replace every item by function(item)"""
+        return self.__add("map", function, name, workers)
+
+    def filter(
+        self,
+        function: Callable[[Any], bool],
+        name: Optional[str] = None,
+        workers: int = 1,
+    ) -> Pipeline:
+        """Only keep the items for which function(item) is true"""
+        return self.__add("filter", function, name, workers)
+
+    def flat_map(
+        self,
+        function: Callable[[Any], Iterable[Any]],
+        name: Optional[str] = None,
+        workers: int = 1,
+    ) -> Pipeline:
+        """Replace every item by all items of function(item), for example
+        all documents of a response. The items are passed on while function
+        generates them."""
+        return self.__add("flat_map", function, name, workers)
+
+    def batch(self, size: int, name: Optional[str] = None) -> Pipeline:
+        """Group the items in lists of size items, the last list can be
+        smaller"""
+        if not isinstance(size, int) or isinstance(size, bool):
+            raise TypeError("Size needs to be int")
+
+        if size < 1:
+            raise ValueError("Size needs to be at least 1")
+
+        return self.__add("batch", None, name, 1, size)
+
+    def sink(
+        self,
+        function: Callable[[Any], Any],
+        name: Optional[str] = None,
+        workers: int = 1,
+    ) -> Pipeline:
+        """Call function(item) for every item, for example to write it. This
+        has to be the last stage."""
+        return self.__add("sink", function, name, workers)
+
+    def __get(self, stage: _Stage, items: queue.Queue) -> Any:
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped
+
+                try:
+                    return items.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    pass
+        finally:
+            with stage.lock:
+                stage.input_wait_seconds += time.perf_counter() - start
+
+    def __put(self, stage: _Stage, items: Optional[queue.Queue], item: Any):
+        if items is None:
+            return
+
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped
+
+                try:
+                    items.put(item, timeout=_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    pass
+        finally:
+            with stage.lock:
+                stage.output_wait_seconds += time.perf_counter() - start
+
+        if item is not _DONE:
+            with stage.lock:
+                stage.items_out += 1
+
+    def __fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def __run_source(self, output: queue.Queue):
+        stage = self._source_stage
+        try:
+            iterator = iter(self.source)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _DONE)
+                with stage.lock:
+                    stage.busy_seconds += time.perf_counter() - start
+
+                self.__put(stage, output, item)
+                if item is _DONE:
+                    return
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self.__fail(error)
+
+    def __run_stage(
+        self, stage: _Stage, items: queue.Queue, output: Optional[queue.Queue]
+    ):
+        batch: list[Any] = []
+        try:
+            while True:
+                item = self.__get(stage, items)
+                if item is _DONE:
+                    break
+
+                with stage.lock:
+                    stage.items_in += 1
+
+                start = time.perf_counter()
+                if stage.kind == "flat_map":
+                    # Time spent waiting for the next stage is not busy time
+                    iterator = iter(stage.function(item))  # type:ignore
+                    while True:
+                        result = next(iterator, _DONE)
+                        with stage.lock:
+                            stage.busy_seconds += time.perf_counter() - start
+
+                        if result is _DONE:
+                            break
+
+                        self.__put(stage, output, result)
+                        start = time.perf_counter()
+                    continue
+
+                if stage.kind == "batch":
+                    batch.append(item)
+                    results = [batch] if len(batch) >= stage.size else []
+                    if results:
+                        batch = []
+                elif stage.kind == "filter":
+                    results = [item] if stage.function(item) else []  # type:ignore
+                else:
+                    results = [stage.function(item)]  # type:ignore
+
+                with stage.lock:
+                    stage.busy_seconds += time.perf_counter() - start
+
+                if stage.kind == "sink":
+                    with stage.lock:
+                        stage.items_out += 1
+                    continue
+
+                for result in results:
+                    self.__put(stage, output, result)
+
+            # Let the other workers of this stage know the items are done
+            items.put(_DONE)
+            if batch:
+                self.__put(stage, output, batch)
+
+            with stage.lock:
+                stage.running -= 1
+                last = stage.running == 0
+
+            # The last worker tells the next stage
+            if last:
+                self.__put(stage, output, _DONE)
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self.__fail(error)
+
+    def __start(self) -> queue.Queue:
+        if self._started:
+            raise RuntimeError("A pipeline can only run once")
+
+        self._started = True
+        self._start_time = time.perf_counter()
+        queues = [
+            queue.Queue(self.queue_size) for _ in range(len(self._stages) + 1)
+        ]
+
+        self._threads = [
+            threading.Thread(
+                target=self.__run_source,
+                args=(queues[0],),
+                name="pipeline-source",
+                daemon=True,
+            )
+        ]
+        for i, stage in enumerate(self._stages):
+            output = None if stage.kind == "sink" else queues[i + 1]
+            self._threads.extend(
+                threading.Thread(
+                    target=self.__run_stage,
+                    args=(stage, queues[i], output),
+                    name=f"pipeline-{stage.name}",
+                    daemon=True,
+                )
+                for _ in range(stage.workers)
+            )
+
+        for thread in self._threads:
+            thread.start()
+
+        return queues[-1]
+
+    def __finish(self):
+        # Threads stop once all items are done, or a stage failed
+        for thread in self._threads:
+            thread.join()
+
+        self._end_time = time.perf_counter()
+        if self._error is not None:
+            raise self._error
+
+    def __iter__(self) -> Iterator[Any]:
+        """Run the pipeline and iterate over the items of the last stage"""
+        if self._stages and self._stages[-1].kind == "sink":
+            raise ValueError("A pipeline with a sink has no items to iterate")
+
+        output = self.__start()
+        try:
+            while True:
+                try:
+                    item = output.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Stop the stages if the items are not all iterated over
+            self._stop.set()
+            self.__finish()
+
+    def run(self) -> dict[str, dict[str, Any]]:
+        """Run the pipeline until all items went through it, items of the
+        last stage that is not a sink are dropped
+
+        Raises:
+            Exception: The first error raised by a stage, the pipeline stops
+            when a stage fails
+
+        Returns:
+            dict[str, dict[str, Any]]: Metrics of every stage, see metrics
+        """
+        if self._stages and self._stages[-1].kind == "sink":
+            self.__start()
+            self.__finish()
+        else:
+            for _ in self:
+                pass
+
+        return self.metrics()
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Get the metrics of every stage, by name: the number of items that
+        went in and out, the seconds spent working, waiting for input and
+        waiting for the next stage (backpressure), and the items that came out
+        per second since the pipeline started"""
+        if not self._started:
+            seconds = 0.0
+        else:
+            seconds = (self._end_time or time.perf_counter()) - self._start_time
+
+        return {
+            stage.name: stage.as_dict(seconds)
+            for stage in [self._source_stage, *self._stages]
+        }
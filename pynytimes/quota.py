@@ -0,0 +1,320 @@
+"""Quota accounting for API keys"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Final, Iterator, Literal, Optional
+
+# Import standard Python dependencies
+import contextlib
+import datetime
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+# File locks are only available on Unix, elsewhere counts stored in a file
+# are only shared between the threads of a process
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type:ignore
+
+# Quota of a New York Times developer key
+NYT_PER_MINUTE = 5
+NYT_PER_DAY = 500
+
+MINUTE = 60
+
+# Requests waiting for the quota are made in the order of their priority
+PriorityType = Literal["interactive", "normal", "bulk"]
+PRIORITIES: Final = {"interactive": 0, "normal": 1, "bulk": 2}
+
+
+class QuotaExceededError(Exception):
+    """The daily quota or the budget of requests is used"""
+
+
+def quota_key_id(key: str) -> str:
+    """Identify a key without storing the key itself"""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _remaining(limit: Optional[int], used: int) -> Optional[int]:
+    return None if limit is None else max(limit - used, 0)
+
+
+class Quota:
+    """
+    Counts the requests made with an API key per minute and per day.
+
+    When the per minute quota is used, requests wait until they can be made.
+    Waiting requests are made in the order of their priority, so interactive
+    requests go before bulk requests that were waiting longer. When the
+    daily quota or the budget is used, requests fail immediately with a
+    QuotaExceededError, instead of resulting in HTTP 429 errors.
+
+    When path is set, the per minute and daily counts are kept in that file
+    and every request reads and updates them while holding a file lock, so
+    all processes that use the same file (for example the workers of a
+    process pool) share one quota. Without a path every process counts on
+    its own. The budget is always counted per Quota object.
+
+    Example:
+        quota = Quota(NYT_PER_MINUTE, NYT_PER_DAY, path="quota.json")
+        nyt = NYTAPI("Your API key", quota=quota)
+        nyt.quota.set_budget(500)
+        print(nyt.quota.remaining())
+    """
+
+    def __init__(
+        self,
+        per_minute: Optional[int] = None,
+        per_day: Optional[int] = None,
+        path: Optional[str] = None,
+        wait: bool = True,
+    ):
+        """Create a quota
+
+        Args:
+            per_minute (int, optional): Requests allowed per minute. Defaults
+            to None, which means no limit.
+            per_day (int, optional): Requests allowed per day (UTC). Defaults
+            to None, which means no limit.
+            path (str, optional): Location of a JSON file where the counts
+            are stored, so they persist across restarts and are shared
+            between processes. Defaults to None.
+            wait (bool, optional): Wait when the per minute quota is used, if
+            False a QuotaExceededError is raised instead. Defaults to True.
+
+        Raises:
+            TypeError: A limit is not int or None, path is not str or None,
+            or wait is not bool
+            ValueError: A limit is smaller than 1
+        """
+        for name, value in [("per_minute", per_minute), ("per_day", per_day)]:
+            if value is None:
+                continue
+
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise TypeError(f"{name} needs to be int or None")
+
+            if value < 1:
+                raise ValueError(f"{name} needs to be at least 1")
+
+        if not isinstance(path, (str, type(None))):
+            raise TypeError("Path needs to be str or None")
+
+        if not isinstance(wait, bool):
+            raise TypeError("Wait needs to be bool")
+
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.path = path
+        self.wait = wait
+
+        self.key_id: Optional[str] = None
+        self.budget: Optional[int] = None
+        self.used = 0
+
+        self._lock = threading.Condition()
+        self._day = ""
+        self._day_count = 0
+        self._minute: list[float] = []
+
+        # Requests that wait, by priority and then in the order they came
+        self._waiting: list[tuple[int, int]] = []
+        self._tickets = itertools.count()
+
+    def bind(self, key: str) -> None:
+        """Bind the quota to an API key, and load its stored counts"""
+        key_id = quota_key_id(key)
+        if self.key_id is not None and self.key_id != key_id:
+            raise ValueError("Quota is already used for a different API key")
+
+        self.key_id = key_id
+        with self._lock, self.__shared():
+            pass
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        for name in ["_lock", "_waiting", "_tickets"]:
+            del state[name]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Condition()
+        self._waiting = []
+        self._tickets = itertools.count()
+
+    def set_budget(self, budget: Optional[int]) -> None:
+        """Allow at most budget requests from now on, None removes the
+        budget"""
+        if not isinstance(budget, (int, type(None))):
+            raise TypeError("Budget needs to be int or None")
+
+        with self._lock:
+            self.budget = budget
+            self.used = 0
+
+    def __update(self, now: float):
+        # Start counting again on a new day, and forget old requests
+        today = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+        day = today.date().isoformat()
+        if day != self._day:
+            self._day = day
+            self._day_count = 0
+
+        self._minute = [t for t in self._minute if t > now - MINUTE]
+
+    @contextlib.contextmanager
+    def __shared(self) -> Iterator[None]:
+        """Hold the lock of the file and load the counts of all processes
+        from it, __count saves them before the lock is released"""
+        if self.path is None or self.key_id is None:
+            yield
+            return
+
+        with open(f"{self.path}.lock", "a", encoding="utf-8") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            try:
+                state = self.__load().get(self.key_id, {})
+                self._day = state.get("day", "")
+                self._day_count = state.get("day_count", 0)
+                self._minute = state.get("minute", [])
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __load(self) -> dict[str, Any]:
+        if not os.path.exists(self.path):  # type:ignore
+            return {}
+
+        with open(self.path, encoding="utf-8") as f:  # type:ignore
+            return json.load(f)
+
+    def __save(self):
+        if self.path is None or self.key_id is None:
+            return
+
+        state = self.__load()
+        state[self.key_id] = {
+            "day": self._day,
+            "day_count": self._day_count,
+            "minute": self._minute,
+        }
+
+        # Replace the file at once, so it is never partially written
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temporary_path, self.path)
+
+    def remaining(self) -> dict[str, Optional[int]]:
+        """Get the number of requests that can still be made this minute,
+        today and within the budget. None means there is no limit."""
+        with self._lock, self.__shared():
+            self.__update(time.time())
+            return {
+                "minute": _remaining(self.per_minute, len(self._minute)),
+                "day": _remaining(self.per_day, self._day_count),
+                "budget": _remaining(self.budget, self.used),
+            }
+
+    def acquire(
+        self, priority: PriorityType = "normal", timeout: Optional[float] = None
+    ) -> float:
+        """Count a request, waits until the request can be made and all
+        waiting requests with a higher priority are made
+
+        Args:
+            priority (str, optional): "interactive", "normal" or "bulk".
+            Defaults to "normal".
+            timeout (float, optional): Wait at most this many seconds.
+            Defaults to None, which waits as long as needed.
+
+        Raises:
+            QuotaExceededError: The daily quota or the budget is used, or the
+            per minute quota is used and wait is False
+            TimeoutError: The request could not be made within timeout
+
+        Returns:
+            float: Seconds waited
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Priority needs to be one of {list(PRIORITIES)}")
+
+        start = time.perf_counter()
+        waited = False
+        with self._lock:
+            ticket = (PRIORITIES[priority], next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    with self.__shared():
+                        now = time.time()
+                        self.__update(now)
+                        full, allowed = self.__check(ticket)
+                        if allowed:
+                            self.__count(now, 1)
+                            return time.perf_counter() - start if waited else 0.0
+
+                    left = None
+                    if timeout is not None:
+                        left = timeout - (time.perf_counter() - start)
+                        if left <= 0:
+                            raise TimeoutError("Quota did not allow a request in time")
+
+                    # Requests of other processes are not notified, but are
+                    # seen when the oldest request of the minute expires
+                    delay = self._minute[0] + MINUTE - now if full else None
+                    if self._waiting[0] != ticket or delay is None:
+                        self._lock.wait(left)
+                    else:
+                        self._lock.wait(delay if left is None else min(delay, left))
+
+                    waited = True
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._lock.notify_all()
+
+    def __check(self, ticket: tuple[int, int]) -> tuple[bool, bool]:
+        """Check if the request of ticket can be made now. Returns if the
+        per minute quota is used, and if the request can be made."""
+        if self.budget is not None and self.used >= self.budget:
+            raise QuotaExceededError(f"Budget of {self.budget} requests is used")
+
+        if self.per_day is not None and self._day_count >= self.per_day:
+            raise QuotaExceededError(f"Daily quota of {self.per_day} requests is used")
+
+        full = self.per_minute is not None and len(self._minute) >= self.per_minute
+        if full and not self.wait:
+            raise QuotaExceededError(
+                f"Quota of {self.per_minute} requests per minute is used"
+            )
+
+        # Only the first waiting request can take a free request
+        return full, self._waiting[0] == ticket and not full
+
+    def add(self, requests: int) -> None:
+        """Count requests that were made without acquire, like retries"""
+        if requests <= 0:
+            return
+
+        with self._lock, self.__shared():
+            now = time.time()
+            self.__update(now)
+            self.__count(now, requests)
+
+    def __count(self, now: float, requests: int):
+        self._minute += [now] * requests
+        self._day_count += requests
+        self.used += requests
+        self.__save()
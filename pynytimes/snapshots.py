@@ -0,0 +1,260 @@
+"""Compact recording of ranked list snapshots (top stories, most popular)"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Optional
+
+# Import standard Python dependencies
+import bisect
+import datetime
+import gzip
+import json
+from array import array
+
+# Version of the file format written by SnapshotRecorder.save
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class _Series:
+    """All snapshots of a single list, stored as flat arrays"""
+
+    def __init__(self):
+        # Time of every snapshot as POSIX timestamp
+        self.times = array("d")
+        # Offset of the first entry of every snapshot in ids, the last
+        # element is always the total number of entries
+        self.offsets = array("Q", [0])
+        # Interned article ids, the rank is the position in the snapshot
+        self.ids = array("I")
+
+    def append(self, timestamp: float, ids: list[int]):
+        self.times.append(timestamp)
+        self.ids.extend(ids)
+        self.offsets.append(len(self.ids))
+
+    def snapshot(self, i: int) -> array:
+        return self.ids[self.offsets[i] : self.offsets[i + 1]]
+
+    def index_at(self, timestamp: float) -> int:
+        """Index of the last snapshot taken at or before timestamp"""
+        return bisect.bisect_right(self.times, timestamp) - 1
+
+
+def _to_timestamp(timestamp: Optional[datetime.datetime]) -> float:
+    if timestamp is None:
+        return datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+    if not isinstance(timestamp, datetime.datetime):
+        raise TypeError("Timestamp needs to be datetime or None")
+
+    return timestamp.timestamp()
+
+
+def _from_timestamp(timestamp: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+class SnapshotRecorder:
+    """
+    Records snapshots of ranked article lists, like the results of
+    top_stories, most_viewed and most_shared.
+
+    Every article uri is interned to an integer id, the metadata of an
+    article is only stored the first time it is seen and every snapshot is
+    stored as a compact array of ids where the position is the rank.
+
+    Example:
+        recorder = SnapshotRecorder()
+        recorder.record("most_viewed/1", nyt.most_viewed())
+        recorder.record("top_stories/home", nyt.top_stories())
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._uris: list[str] = []
+        self._metadata: list[dict[str, Any]] = []
+        self._series: dict[str, _Series] = {}
+
+    def __intern(self, article: dict[str, Any]) -> int:
+        uri = article.get("uri")
+        if not isinstance(uri, str):
+            raise ValueError("Every article needs to have a uri")
+
+        article_id = self._ids.get(uri)
+        if article_id is None:
+            article_id = len(self._uris)
+            self._ids[uri] = article_id
+            self._uris.append(uri)
+            self._metadata.append(article)
+
+        return article_id
+
+    def __get_series(self, name: str) -> _Series:
+        try:
+            return self._series[name]
+        except KeyError:
+            raise ValueError(f"No snapshots recorded for {name}")
+
+    @property
+    def lists(self) -> list[str]:
+        """Names of all recorded lists"""
+        return list(self._series)
+
+    def __len__(self) -> int:
+        """Number of unique articles seen"""
+        return len(self._uris)
+
+    def record(
+        self,
+        name: str,
+        articles: list[dict[str, Any]],
+        timestamp: Optional[datetime.datetime] = None,
+    ) -> None:
+        """Record a snapshot of a ranked list
+
+        Args:
+            name (str): Name of the list, for example "most_viewed/1".
+            articles (list[dict[str, Any]]): Articles in order of rank, as
+            returned by top_stories, most_viewed or most_shared.
+            timestamp (datetime.datetime, optional): Time of the snapshot.
+            Snapshots of a list need to be recorded in chronological order.
+            Defaults to now.
+
+        Raises:
+            TypeError: Name is not a str or timestamp is not a datetime
+            ValueError: An article has no uri or the snapshot is older than
+            the previous snapshot of this list
+        """
+        if not isinstance(name, str):
+            raise TypeError("Name needs to be str")
+
+        _timestamp = _to_timestamp(timestamp)
+        series = self._series.setdefault(name, _Series())
+        if len(series.times) and _timestamp < series.times[-1]:
+            raise ValueError("Snapshots need to be recorded in chronological order")
+
+        series.append(_timestamp, [self.__intern(article) for article in articles])
+
+    def metadata(self, uri: str) -> dict[str, Any]:
+        """Get the metadata of an article as it was first recorded
+
+        Raises:
+            KeyError: The article has never been recorded
+        """
+        return self._metadata[self._ids[uri]]
+
+    def times(self, name: str) -> list[datetime.datetime]:
+        """Get the times of all snapshots of a list"""
+        return [_from_timestamp(t) for t in self.__get_series(name).times]
+
+    def snapshot(
+        self,
+        name: str,
+        timestamp: Optional[datetime.datetime] = None,
+    ) -> list[str]:
+        """Get the uris of a list in order of rank, as they were at the
+        given time. Defaults to the latest snapshot."""
+        series = self.__get_series(name)
+        if timestamp is None:
+            i = len(series.times) - 1
+        else:
+            i = series.index_at(_to_timestamp(timestamp))
+
+        if i < 0:
+            return []
+
+        return [self._uris[article_id] for article_id in series.snapshot(i)]
+
+    def rank_history(
+        self, uri: str, name: str
+    ) -> list[tuple[datetime.datetime, Optional[int]]]:
+        """Get the rank of an article in every snapshot of a list
+
+        Returns:
+            list[tuple[datetime.datetime, Optional[int]]]: Time of every
+            snapshot with the (1-based) rank, or None if the article was not
+            on the list at that time
+        """
+        series = self.__get_series(name)
+        article_id = self._ids.get(uri)
+
+        history: list[tuple[datetime.datetime, Optional[int]]] = []
+        for i, timestamp in enumerate(series.times):
+            rank = None
+            if article_id is not None:
+                try:
+                    rank = series.snapshot(i).index(article_id) + 1
+                except ValueError:
+                    pass
+
+            history.append((_from_timestamp(timestamp), rank))
+
+        return history
+
+    def changes(
+        self,
+        name: str,
+        start: datetime.datetime,
+        end: datetime.datetime,
+    ) -> dict[str, list[str]]:
+        """Compare the snapshots of a list at two times
+
+        Returns:
+            dict[str, list[str]]: The uris that "entered" the list between
+            start and end, in order of their rank at end, and the uris that
+            "exited", in order of their rank at start
+        """
+        series = self.__get_series(name)
+        start_i = series.index_at(_to_timestamp(start))
+        end_i = series.index_at(_to_timestamp(end))
+
+        before = series.snapshot(start_i) if start_i >= 0 else array("I")
+        after = series.snapshot(end_i) if end_i >= 0 else array("I")
+        before_set, after_set = set(before), set(after)
+
+        return {
+            "entered": [self._uris[i] for i in after if i not in before_set],
+            "exited": [self._uris[i] for i in before if i not in after_set],
+        }
+
+    def save(self, path: str) -> None:
+        """Save all snapshots to a gzip compressed file
+
+        Dates in the metadata are saved as str."""
+        data = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "uris": self._uris,
+            "metadata": self._metadata,
+            "series": {
+                name: {
+                    "times": series.times.tolist(),
+                    "offsets": series.offsets.tolist(),
+                    "ids": series.ids.tolist(),
+                }
+                for name, series in self._series.items()
+            },
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, default=str, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> SnapshotRecorder:
+        """Load snapshots saved with save"""
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError("Unsupported snapshot file version")
+
+        recorder = cls()
+        recorder._uris = data["uris"]
+        recorder._metadata = data["metadata"]
+        recorder._ids = {uri: i for i, uri in enumerate(recorder._uris)}
+        for name, values in data["series"].items():
+            series = _Series()
+            series.times = array("d", values["times"])
+            series.offsets = array("Q", values["offsets"])
+            series.ids = array("I", values["ids"])
+            recorder._series[name] = series
+
+        return recorder
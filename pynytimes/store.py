@@ -0,0 +1,508 @@
+"""Local store of articles loaded from the API"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Iterable, Literal, Optional, Union
+
+# Import standard Python dependencies
+import datetime
+import json
+import re
+import sqlite3
+import threading
+
+from .helpers import serialize_date
+
+DateType = Union[datetime.date, datetime.datetime, None]
+
+# Facets of the keywords of Top Stories, Most Popular and Times Newswire,
+# and the name of those keywords in Article Search
+KEYWORD_FACETS = {
+    "des_facet": "subject",
+    "org_facet": "organizations",
+    "per_facet": "persons",
+    "geo_facet": "glocations",
+}
+
+# Fields of Top Stories, Most Popular and Times Newswire, and the field of
+# Article Search they are stored as
+ARTICLE_FIELDS = {
+    "uri": "uri",
+    "url": "web_url",
+    "abstract": "abstract",
+    "published_date": "pub_date",
+    "section": "section_name",
+    "subsection": "subsection_name",
+    "source": "source",
+}
+
+# Formats of the publication dates of the different APIs
+DATE_FORMATS = ["%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%d"]
+
+# Filters that can be searched, and the column (or JSON path) they filter on
+SEARCH_COLUMNS = {
+    "section_name": "articles.section_name COLLATE NOCASE",
+    "news_desk": "json_extract(articles.data, '$.news_desk')",
+    "type_of_material": "json_extract(articles.data, '$.type_of_material')",
+    "source": "json_extract(articles.data, '$.source')",
+}
+# Filters on keywords, and the name of the keywords they match (None
+# matches all keywords)
+SEARCH_KEYWORDS = {"keyword": None, "subject": "subject", "glocation": "glocations"}
+SEARCH_TEXT = ["headline", "body"]
+SEARCH_FILTERS = [*SEARCH_COLUMNS, *SEARCH_KEYWORDS, *SEARCH_TEXT]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    uri TEXT NOT NULL UNIQUE,
+    pub_date TEXT,
+    section_name TEXT,
+    web_url TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_pub_date ON articles (pub_date);
+CREATE INDEX IF NOT EXISTS articles_section_name
+    ON articles (section_name COLLATE NOCASE, pub_date);
+CREATE TABLE IF NOT EXISTS keywords (
+    uri TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (value, name, uri)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS keywords_uri ON keywords (uri);
+CREATE TABLE IF NOT EXISTS months (month TEXT PRIMARY KEY);
+"""
+
+# Full text index of the headline, abstract, lead paragraph and keywords
+FULL_TEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts
+    USING fts5(headline, body, keywords);
+"""
+
+
+def store_normalize_date(value: Any) -> Optional[str]:
+    """Convert a publication date into a sortable UTC string"""
+    if value is None or value == "":
+        return None
+
+    date = value
+    if isinstance(value, str):
+        for date_format in DATE_FORMATS:
+            try:
+                date = datetime.datetime.strptime(value, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            date = datetime.datetime.fromisoformat(value)
+
+    if not isinstance(date, datetime.datetime):
+        date = datetime.datetime(date.year, date.month, date.day)
+
+    if date.tzinfo is not None:
+        date = date.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    return date.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def store_normalize_article(article: dict[str, Any]) -> dict[str, Any]:
+    """Convert an article of Top Stories, Most Popular or Times Newswire into
+    the fields of Article Search, so all stored articles can be queried the
+    same way. Articles of Article Search and Archive are kept as they are,
+    fields that have no Article Search equivalent (like multimedia) are left
+    out."""
+    if not any(field in article for field in ["title", "url", "published_date"]):
+        return article
+
+    normalized = {
+        name: article[field]
+        for field, name in ARTICLE_FIELDS.items()
+        if field in article
+    }
+    if "uri" in article:
+        normalized["_id"] = article["uri"]
+
+    if "title" in article:
+        normalized["headline"] = {"main": article["title"]}
+        if article.get("kicker"):
+            normalized["headline"]["kicker"] = article["kicker"]
+
+    if "byline" in article:
+        normalized["byline"] = {"original": article["byline"]}
+
+    keywords = [
+        {"name": name, "value": value}
+        for facet, name in KEYWORD_FACETS.items()
+        if isinstance(article.get(facet), list)
+        for value in article[facet]
+        if isinstance(value, str)
+    ]
+    if keywords:
+        normalized["keywords"] = keywords
+
+    return normalized
+
+
+def store_keywords(article: dict[str, Any]) -> list[tuple[str, str]]:
+    """Get the name and value of the keywords of an article"""
+    keywords = [
+        (keyword.get("name") or "", keyword["value"])
+        for keyword in article.get("keywords") or []
+        if isinstance(keyword, dict) and keyword.get("value")
+    ]
+    return list(dict.fromkeys(keywords))
+
+
+def store_full_text(article: dict[str, Any]) -> tuple[str, str, str]:
+    """Get the headline, body (abstract and lead paragraph) and keywords
+    that are indexed for full text search"""
+    headline = article.get("headline")
+    if isinstance(headline, dict):
+        headline = headline.get("main")
+
+    body = [
+        article.get(field) for field in ["abstract", "snippet", "lead_paragraph"]
+    ]
+    return (
+        headline or "",
+        "\n".join(dict.fromkeys(text for text in body if isinstance(text, str))),
+        "\n".join(dict.fromkeys(value for _, value in store_keywords(article))),
+    )
+
+
+def _match_phrases(values: list[str], column: Optional[str] = None) -> str:
+    # Quote every value, so it is searched as a phrase
+    prefix = f"{column} : " if column else ""
+    phrases = ['{}"{}"'.format(prefix, value.replace('"', '""')) for value in values]
+    return "(" + " OR ".join(phrases) + ")"
+
+
+def store_match_query(
+    query: Optional[str], filters: dict[str, list[str]]
+) -> Optional[str]:
+    """Create the full text query of the words of query (which all need to
+    be in the article) and the headline and body filters"""
+    parts = []
+    if query:
+        parts += [_match_phrases([word]) for word in re.findall(r"\w+", query)]
+
+    for column in SEARCH_TEXT:
+        if filters.get(column):
+            parts.append(_match_phrases(filters[column], column))
+
+    return " AND ".join(parts) or None
+
+
+class ArticleStore:
+    """
+    Stores articles in a SQLite database, by uri. Articles that are loaded
+    again replace the stored version. Stored articles can be queried by
+    publication date, section and keyword, and searched by full text
+    (headline, abstract, lead paragraph and keywords) without using the API.
+    All articles are stored with the fields of Article Search, sections are
+    compared case insensitively (Top Stories uses "world", other APIs
+    "World").
+
+    Example:
+        nyt = NYTAPI("Your API key", store=ArticleStore("articles.sqlite"))
+        nyt.archive_metadata(datetime.date(2020, 1, 1))
+
+        articles = nyt.store.query(section="Business", keyword="Elections")
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """Open (or create) the store
+
+        Args:
+            path (str, optional): Location of the SQLite database. Defaults
+            to ":memory:", which does not persist across runs.
+        """
+        if not isinstance(path, str):
+            raise TypeError("Path needs to be str")
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+        # Full text search needs SQLite with FTS5, which almost every build has
+        try:
+            self._connection.executescript(FULL_TEXT_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+
+        self._connection.commit()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict[str, Any]):
+        # Open a new connection, an in-memory database starts empty
+        self.__init__(state["path"])  # type:ignore
+
+    def add(self, articles: Iterable[dict[str, Any]]) -> int:
+        """Add or replace articles, articles without a uri (or _id) are
+        skipped. Articles of other APIs than Article Search and Archive are
+        stored with the fields of Article Search. Returns the number of
+        articles stored."""
+        stored = 0
+        with self._lock:
+            with self._connection:
+                for article in articles:
+                    article = store_normalize_article(article)
+                    uri = article.get("uri") or article.get("_id")
+                    if not uri:
+                        continue
+
+                    self.__add(uri, article)
+                    stored += 1
+
+        return stored
+
+    def __add(self, uri: str, article: dict[str, Any]):
+        # Keep the id of a replaced article, the full text index uses it
+        self._connection.execute(
+            "INSERT INTO articles (uri, pub_date, section_name, web_url, data) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (uri) DO UPDATE SET "
+            "pub_date = excluded.pub_date, section_name = excluded.section_name, "
+            "web_url = excluded.web_url, data = excluded.data",
+            (
+                uri,
+                store_normalize_date(article.get("pub_date")),
+                article.get("section_name"),
+                article.get("web_url"),
+                json.dumps(article, separators=(",", ":"), default=serialize_date),
+            ),
+        )
+        self._connection.execute("DELETE FROM keywords WHERE uri = ?", (uri,))
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO keywords (uri, name, value) VALUES (?, ?, ?)",
+            [(uri, name, value) for name, value in store_keywords(article)],
+        )
+
+        if self.full_text:
+            (article_id,) = self._connection.execute(
+                "SELECT id FROM articles WHERE uri = ?", (uri,)
+            ).fetchone()
+            self._connection.execute(
+                "DELETE FROM articles_fts WHERE rowid = ?", (article_id,)
+            )
+            self._connection.execute(
+                "INSERT INTO articles_fts (rowid, headline, body, keywords) "
+                "VALUES (?, ?, ?, ?)",
+                (article_id, *store_full_text(article)),
+            )
+
+    def add_month(self, date: datetime.date) -> None:
+        """Remember that all articles of the month of date are stored"""
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO months (month) VALUES (?)",
+                    (f"{date.year:04}-{date.month:02}",),
+                )
+
+    def has_month(self, date: datetime.date) -> bool:
+        """Check if all articles of the month of date are stored"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM months WHERE month = ?",
+                (f"{date.year:04}-{date.month:02}",),
+            ).fetchone()
+
+        return row is not None
+
+    def get(self, uri: str) -> Optional[dict[str, Any]]:
+        """Get a stored article by uri, None if it is not stored"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM articles WHERE uri = ?", (uri,)
+            ).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+    def get_many(self, uris: list[str]) -> dict[str, dict[str, Any]]:
+        """Get the stored articles of multiple uris, by uri"""
+        articles = {}
+        with self._lock:
+            for uri in uris:
+                row = self._connection.execute(
+                    "SELECT data FROM articles WHERE uri = ?", (uri,)
+                ).fetchone()
+                if row is not None:
+                    articles[uri] = json.loads(row[0])
+
+        return articles
+
+    def query(
+        self,
+        begin: DateType = None,
+        end: DateType = None,
+        section: Optional[str] = None,
+        keyword: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Get stored articles, ordered by publication date
+
+        Args:
+            begin (Union[datetime.date, datetime.datetime], optional):
+            Published on or after. Defaults to None.
+            end (Union[datetime.date, datetime.datetime], optional):
+            Published before, a date includes the whole day. Defaults to None.
+            section (str, optional): Name of the section. Defaults to None.
+            keyword (str, optional): Value of one of the keywords. Defaults
+            to None.
+            limit (int, optional): Return at most this many articles.
+            Defaults to None.
+
+        Returns:
+            list[dict[str, Any]]: The stored articles
+        """
+        filters = {}
+        if section is not None:
+            filters["section_name"] = [section]
+        if keyword is not None:
+            filters["keyword"] = [keyword]
+
+        return self.search(
+            begin=begin, end=end, filters=filters, sort="oldest", limit=limit
+        )
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        begin: DateType = None,
+        end: DateType = None,
+        filters: Optional[dict[str, list[str]]] = None,
+        sort: Literal["oldest", "newest", "relevance"] = "newest",
+        limit: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Search stored articles
+
+        Args:
+            query (str, optional): Words that all need to be in the headline,
+            abstract, lead paragraph or keywords. Defaults to None.
+            begin (Union[datetime.date, datetime.datetime], optional):
+            Published on or after. Defaults to None.
+            end (Union[datetime.date, datetime.datetime], optional):
+            Published before, a date includes the whole day. Defaults to None.
+            filters (dict[str, list[str]], optional): Values of which the
+            article needs to have one, by filter (for example section_name,
+            news_desk, type_of_material, source, subject, headline or body).
+            Defaults to None.
+            sort (Literal["oldest", "newest", "relevance"], optional): Order
+            of the articles, relevance only applies to full text searches.
+            Defaults to "newest".
+            limit (int, optional): Return at most this many articles.
+            Defaults to None.
+
+        Raises:
+            ValueError: A filter is not supported, or full text search is not
+            supported by the SQLite library
+
+        Returns:
+            list[dict[str, Any]]: The stored articles
+        """
+        for name, value in [("begin", begin), ("end", end)]:
+            if not isinstance(value, (datetime.date, datetime.datetime, type(None))):
+                raise TypeError(f"{name} needs to be datetime, date or None")
+
+        if not isinstance(limit, (int, type(None))):
+            raise TypeError("Limit needs to be int or None")
+
+        filters = filters or {}
+        for name in filters:
+            if name not in SEARCH_FILTERS:
+                raise ValueError(f"Filter {name} is not supported")
+
+        # A date as end includes the whole day
+        if isinstance(end, datetime.date) and not isinstance(end, datetime.datetime):
+            end = end + datetime.timedelta(days=1)
+
+        conditions = []
+        params: list[Any] = []
+
+        match = store_match_query(query, filters)
+        if match is not None:
+            if not self.full_text:
+                raise ValueError("Full text search is not supported by SQLite")
+
+            conditions.append("articles_fts MATCH ?")
+            params.append(match)
+
+        if begin is not None:
+            conditions.append("articles.pub_date >= ?")
+            params.append(store_normalize_date(begin))
+        if end is not None:
+            conditions.append("articles.pub_date < ?")
+            params.append(store_normalize_date(end))
+
+        for name, column in SEARCH_COLUMNS.items():
+            if filters.get(name):
+                placeholders = ", ".join("?" * len(filters[name]))
+                conditions.append(f"{column} IN ({placeholders})")
+                params += filters[name]
+
+        for name, keyword_name in SEARCH_KEYWORDS.items():
+            if filters.get(name):
+                placeholders = ", ".join("?" * len(filters[name]))
+                subquery = f"SELECT uri FROM keywords WHERE value IN ({placeholders})"
+                params += filters[name]
+                if keyword_name is not None:
+                    subquery += " AND name = ?"
+                    params.append(keyword_name)
+
+                conditions.append(f"articles.uri IN ({subquery})")
+
+        sql = "SELECT articles.data FROM articles"
+        if match is not None:
+            sql += " JOIN articles_fts ON articles_fts.rowid = articles.id"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        if sort == "relevance" and match is not None:
+            sql += " ORDER BY bm25(articles_fts)"
+        elif sort == "oldest":
+            sql += " ORDER BY articles.pub_date"
+        else:
+            sql += " ORDER BY articles.pub_date DESC"
+
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+
+        return [json.loads(row[0]) for row in rows]
+
+    def __contains__(self, uri: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM articles WHERE uri = ?", (uri,)
+            ).fetchone()
+
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM articles"
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove all stored articles"""
+        with self._lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM articles")
+                self._connection.execute("DELETE FROM keywords")
+                self._connection.execute("DELETE FROM months")
+                if self.full_text:
+                    self._connection.execute("DELETE FROM articles_fts")
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,165 @@
+"""Local index of articles by URL"""
+
+# Import typings dependencies
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+
+# Import standard Python dependencies
+import json
+import os
+import threading
+
+from .helpers import AppendHashIndex, hash_index_key
+from .helpers import serialize_date, url_index_normalize
+
+DOCS_FILE = "docs.jsonl"
+INDEX_FILE = "urls.idx"
+
+
+class UrlIndex:
+    """
+    Resolves article URLs to their metadata without using the API. Articles
+    are appended to a JSON lines file, and a sorted index on disk maps the
+    hash of their normalized web_url to where they are in that file, so it
+    is opened instantly and only the articles that are looked up are read.
+    URLs are normalized first, so links to the AMP or mobile page, or with a
+    query (like tracking parameters), resolve to the same article.
+
+    Example:
+        index = UrlIndex("urls")
+        nyt.archive_metadata_url_index(dates, index)
+
+        articles = index.get_many(urls)
+    """
+
+    def __init__(self, path: str):
+        """Open (or create) the index
+
+        Args:
+            path (str): Directory of the index
+        """
+        if not isinstance(path, str):
+            raise TypeError("Path needs to be str")
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._docs = open(os.path.join(path, DOCS_FILE), "a+b")
+
+        # Offsets of the articles by URL, and the end of the last article
+        # that is in the index file
+        self._index = AppendHashIndex(os.path.join(path, INDEX_FILE))
+        self._end = self._index.tag
+
+        # Index the articles that were added after the index was last saved
+        self._docs.seek(self._end)
+        for line in self._docs:
+            # Drop an article that was not completely written
+            if not line.endswith(b"\n"):
+                self._docs.truncate(self._end)
+                break
+
+            url = json.loads(line).get("web_url")
+            if url:
+                self._index.add(hash_index_key(url_index_normalize(url)), self._end)
+            self._end += len(line)
+
+    def __enter__(self) -> UrlIndex:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, articles: Iterable[dict[str, Any]]) -> int:
+        """Add articles, articles without a web_url are skipped, and so are
+        articles that are already in the index unchanged (like when a month
+        is indexed again). Returns the number of articles added."""
+        added = 0
+        with self._lock:
+            for article in articles:
+                url = article.get("web_url")
+                if not url:
+                    continue
+
+                line = json.dumps(
+                    article, separators=(",", ":"), default=serialize_date
+                ).encode("utf-8")
+                key = hash_index_key(url_index_normalize(url))
+                if self.__latest(key, url) == line:
+                    continue
+
+                offset = self._docs.seek(0, os.SEEK_END)
+                self._docs.write(line + b"\n")
+                self._index.add(key, offset)
+                self._end = self._docs.tell()
+                added += 1
+
+            self._docs.flush()
+
+        return added
+
+    def save(self) -> None:
+        """Write the added articles to the index file"""
+        with self._lock:
+            self._index.save(self._end)
+
+    def __read(self, offset: int) -> dict[str, Any]:
+        self._docs.seek(offset)
+        return json.loads(self._docs.readline())
+
+    def __latest(self, key: int, url: str) -> Optional[bytes]:
+        # Line of the last version of the article of a URL, the URL of every
+        # article is checked as hashes can collide
+        normal = url_index_normalize(url)
+        for offset in sorted(self._index.get(key), reverse=True):
+            self._docs.seek(offset)
+            line = self._docs.readline().rstrip(b"\n")
+            if url_index_normalize(json.loads(line).get("web_url", "")) == normal:
+                return line
+
+        return None
+
+    def get(self, url: str) -> Optional[dict[str, Any]]:
+        """Get the article of a URL, None if it is not in the index"""
+        return self.get_many([url]).get(url)
+
+    def get_many(self, urls: list[str]) -> dict[str, dict[str, Any]]:
+        """Get the articles of multiple URLs, by URL. URLs that are not in
+        the index are left out."""
+        normalized = {url: url_index_normalize(url) for url in urls}
+
+        with self._lock:
+            reads = [
+                (offset, url)
+                for url in set(normalized.values())
+                for offset in self._index.get(hash_index_key(url))
+            ]
+
+            # Read the articles in the order of the file, so a later version
+            # of an article replaces an earlier one. Hashes can collide, so
+            # the URL of every article is checked.
+            found: dict[str, dict[str, Any]] = {}
+            for offset, url in sorted(reads):
+                article = self.__read(offset)
+                if url_index_normalize(article.get("web_url", "")) == url:
+                    found[url] = article
+
+        return {
+            url: found[normal]
+            for url, normal in normalized.items()
+            if normal in found
+        }
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url) is not None
+
+    def __len__(self) -> int:
+        # Every changed version of an article that was added again is counted
+        return len(self._index)
+
+    def close(self) -> None:
+        """Save the index and close its files"""
+        self.save()
+        with self._lock:
+            self._index.close()
+            self._docs.close()
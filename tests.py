@@ -1,15 +1,77 @@
 # type: ignore
 import datetime
+import json
+import multiprocessing
+import pickle
+import tempfile
 import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from requests.models import Response
+from urllib3.util.retry import RequestHistory
 
 import os
+import threading
 import time
 import random
-from pynytimes import NYTAPI
+from pynytimes import NYTAPI, Cassette, CrawlQueue, Metrics, Quota, QuotaExceededError
+from pynytimes import ArticleLog, ArticleStore, Pipeline, SnapshotRecorder, UrlIndex
+from pynytimes import BatchResults, CrawlBackend, PartialResults, ResponseCache
+from pynytimes.deadline import BudgetExceededError, RequestBudget
+from pynytimes.metrics import BackoffRetry
+from pynytimes.helpers import TagIndex, archive_metadata_parse_raw, fields_project
+from pynytimes.helpers import intern_strings, url_index_normalize
+from pynytimes.helpers import backfill_schedule, backfill_search_requests
+from pynytimes.helpers import backfill_history_windows, backfill_search_windows
+from pynytimes.helpers import best_sellers_timeline, book_reviews_normalize_isbn
+from pynytimes.helpers import HashIndex, hash_index_merge
+from pynytimes.helpers import most_popular_get_urls, most_popular_merge
 
 API_KEY = os.environ["NewYorkTimesAPIKey"]
 
 
+def write_cassette(entries):
+    """Record (url, params, body) entries in a new cassette, for tests that
+    replay responses without the network. Returns the path of the cassette."""
+    path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl")
+    cassette = Cassette(path, mode="record")
+    for url, params, body in entries:
+        res = Response()
+        res.status_code = 200
+        res.headers["Content-Type"] = "application/json"
+        res._content = json.dumps(body).encode()
+        cassette.record(url, params, res, 0.1)
+
+    return path
+
+
+def acquire_quota(path, requests):
+    """Acquire requests of a quota stored at path, in another process.
+    Returns the number of requests that were allowed."""
+    quota = Quota(per_day=5, path=path)
+    quota.bind("key")
+    allowed = 0
+    for _ in range(requests):
+        try:
+            quota.acquire()
+            allowed += 1
+        except QuotaExceededError:
+            pass
+
+    return allowed
+
+
+def top_stories(nyt):
+    """Load the top stories with a pickled NYTAPI, in another process"""
+    return nyt.top_stories()
+
+
+def slow_where(article):
+    """Keep every article, slowly, to decode past a deadline in a worker"""
+    time.sleep(1)
+    return True
+
+
 class TestNewYorkTimes(unittest.TestCase):
     def setUp(self):
         self.nyt = NYTAPI(API_KEY, parse_dates=True)
@@ -84,6 +146,19 @@ class TestNewYorkTimes(unittest.TestCase):
         with self.assertRaises(TypeError):
             self.nyt.most_shared(days="2")
 
+    def test_most_popular_all(self):
+        most_popular = self.nyt.most_popular_all()
+        self.assertIsInstance(most_popular, list)
+        self.assertGreater(len(most_popular), 0)
+
+        uris = set()
+        for most in most_popular:
+            self.assertIsInstance(most, dict)
+            self.assertIsInstance(most["published_date"], datetime.date)
+            self.assertGreater(len(most["ranks"]), 0)
+            self.assertNotIn(most["uri"], uris)
+            uris.add(most["uri"])
+
     def test_book_reviews(self):
         author = "Barack Obama"
         book_reviews = self.nyt.book_reviews(author=author)
@@ -104,6 +179,29 @@ class TestNewYorkTimes(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.nyt.book_reviews(isbn=213789)
 
+    def test_book_reviews_many(self):
+        isbn = "0-385-54415-4"
+        author = "Barack Obama"
+        book_reviews = self.nyt.book_reviews_many(isbns=[isbn], authors=[author])
+        self.assertIsInstance(book_reviews, dict)
+        self.assertEqual(
+            set(book_reviews), {("isbn", "9780385544153"), ("author", author)}
+        )
+
+        for book_review in book_reviews[("author", author)]:
+            self.assertIsInstance(book_review, dict)
+            self.assertEqual(book_review["book_author"], author)
+
+    def test_book_reviews_many_invalid(self):
+        with self.assertRaises(ValueError):
+            self.nyt.book_reviews_many()
+
+        with self.assertRaises(ValueError):
+            self.nyt.book_reviews_many(isbns=["123"])
+
+        with self.assertRaises(TypeError):
+            self.nyt.book_reviews_many(authors="Barack Obama")
+
     def test_best_sellers_lists(self):
         best_sellers_lists = self.nyt.best_sellers_lists()
         self.assertIsInstance(best_sellers_lists, list)
@@ -116,6 +214,43 @@ class TestNewYorkTimes(unittest.TestCase):
         self.assertIsInstance(best_seller_list, list)
         self.assertEqual(best_seller_list[0]["primary_isbn13"], "9780385544153")
 
+    def test_best_sellers_overview(self):
+        overview = self.nyt.best_sellers_overview(date=datetime.datetime(2019, 1, 1))
+        self.assertIsInstance(overview, dict)
+        self.assertGreater(len(overview), 0)
+        self.assertIn("hardcover-fiction", overview)
+
+        for books in overview.values():
+            self.assertIsInstance(books, list)
+
+        with self.assertRaises(TypeError):
+            self.nyt.best_sellers_overview(date="123")
+
+    def test_best_sellers_history(self):
+        history = self.nyt.best_sellers_history(
+            "hardcover-fiction",
+            start=datetime.date(2019, 1, 1),
+            end=datetime.date(2019, 2, 1),
+        )
+        self.assertIsInstance(history, dict)
+        self.assertIn("9780385544153", history)
+
+        for ranks in history.values():
+            for published_date, rank in ranks:
+                self.assertIsInstance(published_date, datetime.date)
+                self.assertIsInstance(rank, int)
+
+    def test_best_sellers_history_invalid(self):
+        with self.assertRaises(TypeError):
+            self.nyt.best_sellers_history("hardcover-fiction", start="123")
+
+        with self.assertRaises(ValueError):
+            self.nyt.best_sellers_history(
+                "hardcover-fiction",
+                start=datetime.date(2019, 2, 1),
+                end=datetime.date(2019, 1, 1),
+            )
+
     def test_best_seller_list_invalid(self):
         with self.assertRaises(ValueError):
             self.nyt.best_sellers_list(name="not a name")
@@ -195,6 +330,28 @@ class TestNewYorkTimes(unittest.TestCase):
         with self.assertRaises(TypeError):
             self.nyt.archive_metadata(123)
 
+    def test_archive_metadata_months(self):
+        today = datetime.date.today()
+        months = self.nyt.archive_metadata_months(
+            [today, today.replace(day=1) - datetime.timedelta(days=1)], processes=2
+        )
+        self.assertEqual(len(months), 2)
+
+        for archive_metadata in months:
+            self.assertIsInstance(archive_metadata, list)
+            self.assertGreater(len(archive_metadata), 0)
+            self.assertIsInstance(archive_metadata[0]["pub_date"], datetime.datetime)
+
+    def test_archive_metadata_months_invalid(self):
+        with self.assertRaises(TypeError):
+            self.nyt.archive_metadata_months(datetime.date.today())
+
+        with self.assertRaises(TypeError):
+            self.nyt.archive_metadata_months(["string"])
+
+        with self.assertRaises(ValueError):
+            self.nyt.archive_metadata_months([datetime.date.today()], processes=0)
+
     def test_article_search(self):
         search = self.nyt.article_search("Joe Biden", results=80)
         self.assertIsInstance(search, list)
@@ -210,6 +367,16 @@ class TestNewYorkTimes(unittest.TestCase):
             self.assertIsInstance(article, dict)
             self.assertIn(headline_query, str(article["headline"]))
 
+    def test_article_search_fields(self):
+        search = self.nyt.article_search(
+            "Joe Biden", fields=["_id", "pub_date", "headline.main"]
+        )
+        self.assertGreater(len(search), 0)
+
+        for article in search:
+            self.assertLessEqual(set(article), {"_id", "pub_date", "headline"})
+            self.assertEqual(set(article["headline"]), {"main"})
+
     def test_article_search_invalid(self):
         with self.assertRaises(TypeError):
             self.nyt.article_search(123)
@@ -248,6 +415,13 @@ class TestNewYorkTimes(unittest.TestCase):
         with self.assertRaises(TypeError):
             self.nyt.tag_query("Obama", max_results="2")
 
+    def test_tag_autocomplete(self):
+        tags = self.nyt.tag_autocomplete("Oba", max_results=20)
+        self.assertIsInstance(tags, list)
+
+        for tag in self.nyt.tag_autocomplete("Obama", max_results=20):
+            self.assertIn(tag, tags)
+
     # FIXME This needs test needs to be written for a different function as this function is not working
     # def test_parse_dates_disabled(self):
     #     local_nyt = NYTAPI(API_KEY)
@@ -258,6 +432,1502 @@ class TestNewYorkTimes(unittest.TestCase):
     #     self.assertEqual(data[0]["created_date"], "2021-02-10T11:04:08-05:00")
 
 
+class TestSnapshotRecorder(unittest.TestCase):
+    def setUp(self):
+        self.recorder = SnapshotRecorder()
+        self.start = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+        self.end = self.start + datetime.timedelta(minutes=5)
+        self.recorder.record(
+            "most_viewed/1", [{"uri": "a"}, {"uri": "b"}, {"uri": "c"}], self.start
+        )
+        self.recorder.record(
+            "most_viewed/1", [{"uri": "b"}, {"uri": "d"}, {"uri": "a"}], self.end
+        )
+
+    def test_rank_history(self):
+        history = self.recorder.rank_history("a", "most_viewed/1")
+        self.assertEqual(history, [(self.start, 1), (self.end, 3)])
+        self.assertEqual(len(self.recorder), 4)
+
+    def test_changes(self):
+        changes = self.recorder.changes("most_viewed/1", self.start, self.end)
+        self.assertEqual(changes, {"entered": ["d"], "exited": ["c"]})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.recorder.record("most_viewed/1", [{"uri": "a"}], self.start)
+
+        with self.assertRaises(ValueError):
+            self.recorder.record("most_viewed/1", [{"title": "no uri"}])
+
+        with self.assertRaises(ValueError):
+            self.recorder.rank_history("a", "top_stories/home")
+
+
+class TestBookReviewsMany(unittest.TestCase):
+    def test_errors(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/books/v3/reviews.json",
+                    {"isbn": "9780062963673"},
+                    {"results": [{"book_title": "Replayed"}]},
+                )
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+
+        # The second book is not in the cassette, so its request fails
+        reviews = nyt.book_reviews_many(isbns=["9780062963673", "0-385-54415-4"])
+        self.assertIsInstance(reviews, BatchResults)
+        self.assertEqual(
+            reviews, {("isbn", "9780062963673"): [{"book_title": "Replayed"}]}
+        )
+        self.assertTrue(reviews.partial)
+        self.assertIsInstance(reviews.errors[("isbn", "9780385544153")], KeyError)
+
+    def test_keys(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/books/v3/reviews.json",
+                    {"isbn": "9780062963673"},
+                    {"results": [{"book_title": "Replayed"}]},
+                ),
+                (
+                    "api.nytimes.com/svc/books/v3/reviews.json",
+                    {"title": "9780062963673"},
+                    {"results": []},
+                ),
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+
+        # An ISBN as int and str is the same book, a title is another kind
+        reviews = nyt.book_reviews_many(
+            isbns=[9780062963673, "9780062963673"], titles=["9780062963673"]
+        )
+        self.assertEqual(
+            reviews,
+            {
+                ("isbn", "9780062963673"): [{"book_title": "Replayed"}],
+                ("title", "9780062963673"): [],
+            },
+        )
+
+    def test_no_reviews_expire(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/books/v3/reviews.json",
+                    {"author": "Nobody"},
+                    {"results": [{"book_title": "Reviewed later"}]},
+                )
+            ]
+        )
+        cache = ResponseCache()
+        nyt = NYTAPI("key", cache=cache, cassette=Cassette(path))
+        key = ResponseCache.key(
+            "api.nytimes.com/svc/books/v3/reviews.json", {"author": "Nobody"}
+        )
+
+        # A book that recently had no reviews is not loaded again
+        cache.set(key, {"results": [], "time": time.time()})
+        reviews = nyt.book_reviews_many(authors=["Nobody"])
+        self.assertEqual(reviews, {("author", "Nobody"): []})
+
+        # After a week it is loaded again
+        cache.set(key, {"results": [], "time": time.time() - 8 * 24 * 3600})
+        reviews = nyt.book_reviews_many(authors=["Nobody"])
+        self.assertEqual(
+            reviews, {("author", "Nobody"): [{"book_title": "Reviewed later"}]}
+        )
+
+    def test_isbn(self):
+        self.assertEqual(book_reviews_normalize_isbn("0-385-54415-4"), "9780385544153")
+        self.assertEqual(book_reviews_normalize_isbn("080442957X"), "9780804429573")
+
+        for isbn in ["0-385-54415-X", "9780385544154", "123"]:
+            with self.assertRaises(ValueError):
+                book_reviews_normalize_isbn(isbn)
+
+
+class TestMostPopular(unittest.TestCase):
+    def setUp(self):
+        self.a = {"uri": "nyt://article/a", "published_date": "2020-01-01"}
+        self.b = {"uri": "nyt://article/b", "published_date": "2020-01-02"}
+
+    def test_merge(self):
+        merged = most_popular_merge(
+            {"viewed/1": [self.a, self.b], "emailed/7": [self.b]}
+        )
+        self.assertEqual(
+            [article["uri"] for article in merged],
+            ["nyt://article/a", "nyt://article/b"],
+        )
+        self.assertEqual(merged[0]["ranks"], {"viewed/1": 1})
+        self.assertEqual(merged[1]["ranks"], {"viewed/1": 2, "emailed/7": 1})
+
+    def test_all(self):
+        # Every list is loaded, the lists that are not filled are empty
+        lists = {"viewed/1": [self.a, self.b], "shared/7/facebook": [self.b]}
+        path = write_cassette(
+            [
+                (url, {}, {"results": lists.get(name, [])})
+                for name, url in most_popular_get_urls(
+                    "api.nytimes.com/svc/mostpopular/v2/"
+                ).items()
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path), parse_dates=True)
+
+        articles = nyt.most_popular_all()
+        self.assertEqual(len(articles), 2)
+        self.assertEqual(articles[0]["ranks"], {"viewed/1": 1})
+        self.assertEqual(
+            articles[1]["ranks"], {"viewed/1": 2, "shared/7/facebook": 1}
+        )
+        self.assertEqual(articles[1]["published_date"], datetime.date(2020, 1, 2))
+
+
+class TestBestSellers(unittest.TestCase):
+    def test_timeline(self):
+        lists = [
+            {
+                "published_date": "2020-01-12",
+                "books": [
+                    {"rank": 1, "primary_isbn13": "9780062963673"},
+                    {"rank": 2, "primary_isbn13": "", "title": "A", "author": "X"},
+                    {"rank": 3, "primary_isbn13": None, "title": "B", "author": "Y"},
+                    {"rank": 4, "primary_isbn13": None, "primary_isbn10": None},
+                ],
+            },
+            {
+                "published_date": "2020-01-05",
+                "books": [
+                    {"rank": 2, "primary_isbn13": "9780062963673"},
+                    {"rank": 1, "primary_isbn10": "0385544154"},
+                    {"rank": 3, "title": "A", "author": "X"},
+                ],
+            },
+        ]
+
+        # Books without an ISBN are not merged into one
+        self.assertEqual(
+            best_sellers_timeline(lists),
+            {
+                "9780062963673": [("2020-01-05", 2), ("2020-01-12", 1)],
+                "0385544154": [("2020-01-05", 1)],
+                "A by X": [("2020-01-05", 3), ("2020-01-12", 2)],
+                "B by Y": [("2020-01-12", 3)],
+            },
+        )
+
+
+    def best_sellers_list(self, date, updated, books, next_date=""):
+        return (
+            f"api.nytimes.com/svc/books/v3/lists/{date}/hardcover-fiction.json",
+            {},
+            {
+                "results": {
+                    "published_date": date,
+                    "next_published_date": next_date,
+                    "updated": updated,
+                    "books": books,
+                }
+            },
+        )
+
+    def test_history_weekly(self):
+        book = {"rank": 1, "primary_isbn13": "9780062963673"}
+        path = write_cassette(
+            [
+                self.best_sellers_list("2020-01-05", "WEEKLY", [book]),
+                self.best_sellers_list("2020-01-12", "WEEKLY", [book]),
+                self.best_sellers_list("2020-01-19", "WEEKLY", []),
+            ]
+        )
+        cache = ResponseCache()
+        nyt = NYTAPI("key", cache=cache, cassette=Cassette(path))
+
+        # All weeks after the first list are known from its date
+        history = nyt.best_sellers_history(
+            "hardcover-fiction", datetime.date(2020, 1, 5), datetime.date(2020, 1, 25)
+        )
+        timeline = {"9780062963673": [("2020-01-05", 1), ("2020-01-12", 1)]}
+        self.assertEqual(history, timeline)
+        self.assertEqual(len(cache), 3)
+
+        # Lists of past weeks are loaded from the cache, not the cassette
+        path = write_cassette([self.best_sellers_list("2020-02-02", "WEEKLY", [])])
+        nyt = NYTAPI("key", cache=cache, cassette=Cassette(path))
+        history = nyt.best_sellers_history(
+            "hardcover-fiction", datetime.date(2020, 1, 5), datetime.date(2020, 1, 25)
+        )
+        self.assertEqual(history, timeline)
+
+    def test_history_monthly(self):
+        book = {"rank": 2, "primary_isbn13": "9780062963673"}
+        path = write_cassette(
+            [
+                self.best_sellers_list("2020-01-05", "MONTHLY", [book], "2020-02-02"),
+                self.best_sellers_list("2020-02-02", "MONTHLY", [book], "2020-03-01"),
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+
+        # Every next list is found from the previous one, up to the end
+        history = nyt.best_sellers_history(
+            "hardcover-fiction", datetime.date(2020, 1, 5), datetime.date(2020, 2, 15)
+        )
+        self.assertEqual(
+            history, {"9780062963673": [("2020-01-05", 2), ("2020-02-02", 2)]}
+        )
+
+    def test_overview(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/books/v3/lists/overview.json",
+                    {"published_date": "2020-01-05"},
+                    {
+                        "results": {
+                            "lists": [
+                                {
+                                    "list_name_encoded": "hardcover-fiction",
+                                    "books": [{"rank": 1, "title": "A"}],
+                                },
+                                {
+                                    "list_name_encoded": "hardcover-nonfiction",
+                                    "books": [
+                                        {"rank": 1, "title": "B"},
+                                        {"rank": 2, "title": "C"},
+                                    ],
+                                },
+                            ]
+                        }
+                    },
+                )
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+
+        # The books are grouped by list
+        overview = nyt.best_sellers_overview(datetime.date(2020, 1, 5))
+        self.assertEqual(
+            overview,
+            {
+                "hardcover-fiction": [{"rank": 1, "title": "A"}],
+                "hardcover-nonfiction": [
+                    {"rank": 1, "title": "B"},
+                    {"rank": 2, "title": "C"},
+                ],
+            },
+        )
+
+
+class TestTagIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TagIndex()
+        tags = ["Obama, Barack (Per)", "Obamacare (Des)", "Oboe (Des)"]
+        self.index.set("ob", tags, max_results=10)
+
+    def test_prefix(self):
+        self.assertEqual(
+            self.index.get("obama", max_results=10),
+            ["Obama, Barack (Per)", "Obamacare (Des)"],
+        )
+        self.assertEqual(self.index.get("barack"), None)
+        self.assertEqual(self.index.get("ob", max_results=1), ["Obama, Barack (Per)"])
+
+    def test_incomplete(self):
+        self.index.set("x", ["Xerox (Org)"], max_results=1)
+        self.assertEqual(self.index.get("x", max_results=1), ["Xerox (Org)"])
+        self.assertEqual(self.index.get("x", max_results=2), None)
+        self.assertEqual(self.index.get("xe", max_results=1), None)
+
+    def test_no_maximum(self):
+        # Without a maximum the API limits the tags, so only the same
+        # query (or one for less tags) is answered
+        self.index.set("y", ["Yale (Org)", "Yemen (Geo)"])
+        self.assertEqual(self.index.get("y"), ["Yale (Org)", "Yemen (Geo)"])
+        self.assertEqual(self.index.get("y", max_results=1), ["Yale (Org)"])
+        self.assertEqual(self.index.get("y", max_results=3), None)
+        self.assertEqual(self.index.get("ya"), None)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.events = []
+        self.metrics.add_hook(lambda event, data: self.events.append(event))
+
+    def test_record_request(self):
+        self.metrics.record_request("topstories/v2/home.json", 0.2, 200, 1000)
+        self.metrics.record_request("topstories/v2/home.json", 20, None)
+        self.metrics.record_cache_hit("topstories/v2/home.json")
+
+        endpoint = self.metrics.snapshot()["endpoints"]["topstories/v2/home.json"]
+        self.assertEqual(endpoint["requests"], 2)
+        self.assertEqual(endpoint["errors"], 1)
+        self.assertEqual(endpoint["bytes"], 1000)
+        self.assertEqual(endpoint["cache_hits"], 1)
+        self.assertEqual(self.events, ["request", "request", "cache_hit"])
+
+    def test_record_priority(self):
+        self.metrics.record_priority("interactive", 0.0, 0.2)
+        self.metrics.record_priority("bulk", 30.0, 0.2)
+
+        priorities = self.metrics.snapshot()["priorities"]
+        self.assertEqual(priorities["interactive"]["latency_buckets"][0.25], 1)
+        self.assertEqual(priorities["bulk"]["latency_buckets"][30.0], 0)
+        self.assertEqual(priorities["bulk"]["wait_seconds"], 30.0)
+        self.assertIn(
+            'pynytimes_priority_duration_seconds_count{priority="bulk"} 1',
+            self.metrics.to_prometheus(),
+        )
+
+    def test_prometheus(self):
+        self.metrics.record_request("topstories/v2/home.json", 0.2, 200, 1000)
+        self.metrics.record_wait("quota", 1.5)
+
+        prometheus = self.metrics.to_prometheus()
+        self.assertIn(
+            'pynytimes_requests_total{endpoint="topstories/v2/home.json",'
+            + 'status="200"} 1',
+            prometheus,
+        )
+        self.assertIn('pynytimes_wait_seconds_total{reason="quota"} 1.5', prometheus)
+
+    def test_prometheus_escape(self):
+        self.metrics.record_parse('a"b\\c\nd', 1.0)
+        self.assertIn(
+            'pynytimes_parse_seconds_total{stage="a\\"b\\\\c\\nd"} 1.0',
+            self.metrics.to_prometheus(),
+        )
+
+    def test_hook_error(self):
+        def hook(event, data):
+            raise RuntimeError("Hook failed")
+
+        self.metrics.add_hook(hook)
+        with self.assertLogs("pynytimes.metrics", "ERROR"):
+            self.metrics.record_cache_hit("topstories/v2/home.json")
+
+        self.assertEqual(self.events, ["cache_hit"])
+
+    def test_backoff(self):
+        history = (RequestHistory("GET", "/", None, 429, None),) * 2
+        retry = BackoffRetry(backoff_factor=0.02, backoff_jitter=0, history=history)
+        BackoffRetry.take_slept()
+        retry.sleep()
+        self.assertGreaterEqual(BackoffRetry.take_slept(), 0.04)
+        self.assertEqual(BackoffRetry.take_slept(), 0.0)
+
+    def test_requests(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/topstories/v2/home.json",
+                    {},
+                    {"results": [{"title": "Replayed"}]},
+                )
+            ]
+        )
+        nyt = NYTAPI("key", metrics=self.metrics, cassette=Cassette(path))
+        nyt.top_stories()
+
+        metrics = self.metrics.snapshot()
+        self.assertEqual(metrics["endpoints"]["topstories/v2/home.json"]["requests"], 1)
+        self.assertIn("pynytimes_requests_total", self.metrics.to_prometheus())
+
+
+class TestQuota(unittest.TestCase):
+    def setUp(self):
+        self.quota = Quota(per_minute=2, per_day=3, wait=False)
+        self.quota.bind("key")
+
+    def test_remaining(self):
+        self.assertEqual(
+            self.quota.remaining(), {"minute": 2, "day": 3, "budget": None}
+        )
+        self.quota.acquire()
+        self.assertEqual(self.quota.remaining()["minute"], 1)
+
+    def test_exceeded(self):
+        self.quota.acquire()
+        self.quota.acquire()
+        with self.assertRaises(QuotaExceededError):
+            self.quota.acquire()
+
+    def test_budget(self):
+        self.quota.set_budget(1)
+        self.quota.acquire()
+        with self.assertRaises(QuotaExceededError):
+            self.quota.acquire()
+
+    def test_priority(self):
+        quota = Quota(per_minute=3)
+        now = time.time()
+        quota._minute = [now - 59.7, now - 59.5, now - 59.3]
+
+        order = []
+
+        def acquire(priority):
+            quota.acquire(priority)
+            order.append(priority)
+
+        threads = [
+            threading.Thread(target=acquire, args=(priority,))
+            for priority in ["bulk", "bulk", "interactive"]
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+        # The interactive request came last, but takes the first free request
+        self.assertEqual(order, ["interactive", "bulk", "bulk"])
+
+        with self.assertRaises(ValueError):
+            quota.acquire("urgent")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.quota.bind("other key")
+
+        with self.assertRaises(TypeError):
+            Quota(per_minute="5")
+
+        with self.assertRaises(TypeError):
+            Quota(per_day=True)
+
+        for limit in [0, -5]:
+            with self.assertRaises(ValueError):
+                Quota(per_minute=limit)
+
+        with self.assertRaises(TypeError):
+            Quota(wait="no")
+
+    def test_processes(self):
+        path = os.path.join(tempfile.mkdtemp(), "quota.json")
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(3) as pool:
+            allowed = pool.starmap(acquire_quota, [(path, 4)] * 3)
+
+        # The processes share the daily quota through the file
+        self.assertEqual(sum(allowed), 5)
+        quota = Quota(per_day=5, path=path)
+        quota.bind("key")
+        self.assertEqual(quota.remaining()["day"], 0)
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/topstories/v2/home.json",
+                    {},
+                    {"results": [{"title": "Replayed"}]},
+                )
+            ]
+        )
+
+    def test_replay(self):
+        nyt = NYTAPI("key", cassette=Cassette(self.path))
+        self.assertEqual(nyt.top_stories(), [{"title": "Replayed"}])
+        self.assertEqual(nyt.quota.used, 0)
+
+        with self.assertRaises(KeyError):
+            nyt.top_stories("world")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Cassette(self.path, mode="rewind")
+
+        with self.assertRaises(TypeError):
+            NYTAPI("key", cassette=self.path)
+
+
+class TestThreads(unittest.TestCase):
+    def test_threads(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/news/v3/content/section-list.json",
+                    {},
+                    {"results": [{"section": "world"}]},
+                )
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path), pool_maxsize=4)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            sections = list(executor.map(lambda _: nyt.section_list(), range(8)))
+
+        self.assertEqual(sections, [[{"section": "world"}]] * 8)
+        metrics = nyt.metrics.snapshot()["endpoints"]
+        self.assertEqual(metrics["news/v3/content/section-list.json"]["requests"], 8)
+
+    def test_invalid_pool_size(self):
+        with self.assertRaises(TypeError):
+            NYTAPI("key", pool_maxsize="32")
+
+        with self.assertRaises(ValueError):
+            NYTAPI("key", pool_maxsize=0)
+
+
+class TestPickle(unittest.TestCase):
+    def setUp(self):
+        self.path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/topstories/v2/home.json",
+                    {},
+                    {"results": [{"title": "Replayed"}]},
+                )
+            ]
+        )
+
+    def test_pickle(self):
+        metrics = Metrics()
+        nyt = NYTAPI(
+            "key",
+            user_agent="test",
+            pool_maxsize=8,
+            metrics=metrics,
+            quota=Quota(per_minute=5),
+            cassette=Cassette(self.path),
+        )
+        nyt.top_stories()
+        unpickled = pickle.loads(pickle.dumps(nyt))
+
+        self.assertEqual(unpickled.user_agent, "test")
+        self.assertEqual(unpickled.pool_maxsize, 8)
+        self.assertEqual(unpickled.quota.per_minute, 5)
+        self.assertEqual(unpickled.top_stories(), [{"title": "Replayed"}])
+
+        # The session and metrics are not pickled, the copy has its own
+        self.assertIsNot(unpickled.session, nyt.session)
+        self.assertIsNot(unpickled.metrics, metrics)
+        endpoints = unpickled.metrics.snapshot()["endpoints"]
+        self.assertEqual(endpoints["topstories/v2/home.json"]["requests"], 1)
+
+    def test_process_pool(self):
+        nyt = NYTAPI("key", cassette=Cassette(self.path))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(2, mp_context=context) as executor:
+            results = list(executor.map(top_stories, [nyt] * 2))
+
+        self.assertEqual(results, [[{"title": "Replayed"}]] * 2)
+
+
+class TestArchiveMetadataMonths(unittest.TestCase):
+    def test_process_pool(self):
+        path = write_cassette(
+            (
+                f"api.nytimes.com/svc/archive/v1/2020/{month}.json",
+                {},
+                {"response": {"docs": [{"_id": f"{month}-{i}"} for i in range(3)]}},
+            )
+            for month in [1, 2]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+        dates = [datetime.date(2020, 1, 1), datetime.date(2020, 2, 1)]
+
+        # The workers are started once and reused by the next call
+        months = nyt.archive_metadata_months(dates, processes=1)
+        workers = nyt._workers
+        self.assertEqual([len(docs) for docs in months], [3, 3])
+        self.assertEqual(nyt.archive_metadata_months(dates, processes=1), months)
+        self.assertIs(nyt._workers, workers)
+
+        nyt.close()
+        self.assertIsNone(nyt._workers)
+
+    def test_process_pool_deadline(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/archive/v1/2020/1.json",
+                    {},
+                    {"response": {"docs": [{"_id": "1-0"}]}},
+                )
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+
+        # Decoding in the workers is not waited for after the deadline
+        start = time.monotonic()
+        months = nyt.archive_metadata_months(
+            [datetime.date(2020, 1, 1)], processes=1, where=slow_where, deadline=0.5
+        )
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(months, [None])
+        self.assertEqual(months.reason, "deadline")
+        nyt.close()
+
+
+class TestFields(unittest.TestCase):
+    def test_project(self):
+        articles = [
+            {
+                "_id": "1",
+                "headline": {"main": "Main", "kicker": "Kicker"},
+                "keywords": [{"name": "subject", "value": "Elections"}],
+                "multimedia": [],
+            }
+        ]
+        projected = fields_project(
+            articles, ["_id", "headline.main", "keywords.value", "byline"]
+        )
+        self.assertEqual(
+            projected,
+            [
+                {
+                    "_id": "1",
+                    "headline": {"main": "Main"},
+                    "keywords": [{"value": "Elections"}],
+                }
+            ],
+        )
+        self.assertIsNot(projected, articles)
+        self.assertIn("multimedia", articles[0])
+        self.assertIn("kicker", articles[0]["headline"])
+
+    def test_invalid(self):
+        nyt = NYTAPI("key")
+        with self.assertRaises(TypeError):
+            nyt.archive_metadata(datetime.date.today(), fields="headline")
+
+        with self.assertRaises(TypeError):
+            nyt.article_search(options={"fl": "headline"})
+
+
+class TestArchiveMetadataWhere(unittest.TestCase):
+    def setUp(self):
+        docs = [
+            {"section_name": "Business", "type_of_material": "News"},
+            {"section_name": "Business", "type_of_material": "Op-Ed"},
+            {"section_name": "Sports", "type_of_material": "News"},
+        ]
+        response = {"copyright": "", "response": {"docs": docs, "meta": {}}}
+        self.content = json.dumps(response, indent=1).encode()
+
+    def test_dict(self):
+        docs, _ = archive_metadata_parse_raw(
+            self.content, False, where={"section_name": "Business"}
+        )
+        self.assertEqual(len(docs), 2)
+
+        docs, _ = archive_metadata_parse_raw(
+            self.content,
+            False,
+            where={"section_name": "Business", "type_of_material": ["News"]},
+        )
+        self.assertEqual(
+            docs, [{"section_name": "Business", "type_of_material": "News"}]
+        )
+
+    def test_function(self):
+        docs, _ = archive_metadata_parse_raw(
+            self.content, False, where=lambda doc: doc["section_name"] == "Sports"
+        )
+        self.assertEqual(len(docs), 1)
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            NYTAPI("key").archive_metadata(datetime.date.today(), where="Business")
+
+
+class TestInternStrings(unittest.TestCase):
+    def test_intern_strings(self):
+        articles = json.loads(
+            json.dumps(
+                [
+                    {"section_name": "Business", "des_facet": ["Economy"]},
+                    {"section_name": "Business", "des_facet": ["Economy"]},
+                ]
+            )
+        )
+        self.assertIsNot(articles[0]["section_name"], articles[1]["section_name"])
+
+        intern_strings(articles)
+        self.assertIs(articles[0]["section_name"], articles[1]["section_name"])
+        self.assertIs(articles[0]["des_facet"][0], articles[1]["des_facet"][0])
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            NYTAPI("key", intern_strings="yes")
+
+
+class TestArticleStore(unittest.TestCase):
+    def setUp(self):
+        self.store = ArticleStore()
+        self.store.add(
+            [
+                {
+                    "uri": "nyt://article/1",
+                    "pub_date": "2020-01-01T23:00:00-0500",
+                    "section_name": "Business",
+                    "keywords": [{"name": "subject", "value": "Economy"}],
+                },
+                {
+                    "uri": "nyt://article/2",
+                    "published_date": "2020-01-01T10:00:00-05:00",
+                    "section": "world",
+                    "des_facet": ["Economy", "Elections"],
+                },
+                {"headline": {"main": "Without uri"}},
+            ]
+        )
+
+    def test_get(self):
+        self.assertEqual(len(self.store), 2)
+        self.assertIn("nyt://article/1", self.store)
+        self.assertIsNone(self.store.get("nyt://article/3"))
+
+    def test_normalize(self):
+        # Articles of other APIs are stored with the fields of Article Search
+        self.store.add(
+            [
+                {
+                    "uri": "nyt://article/3",
+                    "url": "https://www.nytimes.com/3.html",
+                    "title": "Markets Rally",
+                    "published_date": "2020-01-02",
+                    "section": "Business",
+                    "org_facet": ["Federal Reserve"],
+                    "multimedia": [],
+                }
+            ]
+        )
+        self.assertEqual(
+            self.store.get("nyt://article/3"),
+            {
+                "uri": "nyt://article/3",
+                "web_url": "https://www.nytimes.com/3.html",
+                "pub_date": "2020-01-02",
+                "section_name": "Business",
+                "_id": "nyt://article/3",
+                "headline": {"main": "Markets Rally"},
+                "keywords": [{"name": "organizations", "value": "Federal Reserve"}],
+            },
+        )
+        self.assertEqual(self.store.get("nyt://article/2")["section_name"], "world")
+
+        # Sections are compared case insensitively
+        world = self.store.query(section="World")
+        self.assertEqual([article["uri"] for article in world], ["nyt://article/2"])
+        self.assertEqual(len(self.store.query(section="business")), 2)
+
+    def test_query(self):
+        economy = self.store.query(keyword="Economy")
+        self.assertEqual(
+            [article["uri"] for article in economy],
+            ["nyt://article/2", "nyt://article/1"],
+        )
+
+        # Dates are compared in UTC
+        january_first = self.store.query(
+            begin=datetime.date(2020, 1, 1), end=datetime.date(2020, 1, 1)
+        )
+        self.assertEqual(len(january_first), 1)
+        self.assertEqual(len(self.store.query(section="Business")), 1)
+
+    def test_search(self):
+        self.store.add(
+            [
+                {
+                    "uri": "nyt://article/3",
+                    "pub_date": "2020-01-03T10:00:00+0000",
+                    "section_name": "Business",
+                    "news_desk": "Business",
+                    "headline": {"main": "Markets Rally After Election"},
+                    "abstract": "Stocks rose on Wednesday.",
+                }
+            ]
+        )
+        search = self.store.search("election stocks")
+        self.assertEqual([article["uri"] for article in search], ["nyt://article/3"])
+
+        self.assertEqual(len(self.store.search("economy")), 2)
+        self.assertEqual(
+            len(self.store.search(filters={"news_desk": ["Business", "Foreign"]})), 1
+        )
+        self.assertEqual(len(self.store.search(filters={"headline": ["rally"]})), 1)
+
+        # Subject and glocation filters only match keywords with their name
+        self.store.add(
+            [
+                {
+                    "uri": "nyt://article/4",
+                    "keywords": [{"name": "glocations", "value": "Paris"}],
+                },
+                {
+                    "uri": "nyt://article/5",
+                    "keywords": [{"name": "subject", "value": "Paris"}],
+                },
+            ]
+        )
+        for name, uris in [
+            ("subject", ["nyt://article/5"]),
+            ("glocation", ["nyt://article/4"]),
+            ("keyword", ["nyt://article/4", "nyt://article/5"]),
+        ]:
+            search = self.store.search(filters={name: ["Paris"]}, sort="oldest")
+            self.assertEqual(sorted(article["uri"] for article in search), uris)
+
+        with self.assertRaises(ValueError):
+            self.store.search(filters={"unknown": ["value"]})
+
+    def test_article_search_local(self):
+        nyt = NYTAPI("key", store=self.store)
+        self.store.add_month(datetime.date(2020, 1, 1))
+
+        search = nyt.article_search_local(
+            "Economy",
+            dates={
+                "begin": datetime.date(2020, 1, 1),
+                "end": datetime.date(2020, 1, 31),
+            },
+            options={"section_name": ["Business"]},
+        )
+        self.assertEqual([article["uri"] for article in search], ["nyt://article/1"])
+        self.assertFalse(search.partial)
+        self.assertEqual(nyt.quota.used, 0)
+
+    def test_replace(self):
+        self.store.add([{"uri": "nyt://article/1", "section_name": "Sports"}])
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.query(section="Business"), [])
+        self.assertEqual(len(self.store.query(keyword="Economy")), 1)
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            self.store.query(begin="2020-01-01")
+
+        with self.assertRaises(TypeError):
+            NYTAPI("key", store=1)
+
+
+class TestUrlIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.index = UrlIndex(self.path)
+        self.index.add(
+            [
+                {"_id": "1", "web_url": "https://www.nytimes.com/2020/01/01/us/a.html"},
+                {"_id": "2", "web_url": "https://www.nytimes.com/2020/01/02/us/b.html"},
+                {"_id": "3"},
+            ]
+        )
+
+    def tearDown(self):
+        self.index.close()
+
+    def test_normalize(self):
+        url = "nytimes.com/2020/01/01/us/a.html"
+        self.assertEqual(
+            url_index_normalize("https://www.nytimes.com/2020/01/01/us/a.html"), url
+        )
+        self.assertEqual(
+            url_index_normalize("http://mobile.NYTimes.com/2020/01/01/us/a.amp.html"),
+            url,
+        )
+        self.assertEqual(
+            url_index_normalize("www.nytimes.com/2020/01/01/us/a.html/?smid=tw#x"), url
+        )
+
+    def test_get(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(
+            self.index.get("https://m.nytimes.com/2020/01/01/us/a.html?smid=tw")["_id"],
+            "1",
+        )
+        missing = "https://www.nytimes.com/2020/01/03/us/c.html"
+        self.assertIsNone(self.index.get(missing))
+
+        urls = ["nytimes.com/2020/01/02/us/b.html", "https://example.com"]
+        self.assertEqual(list(self.index.get_many(urls)), urls[:1])
+
+    def test_add_again(self):
+        # Indexing the same month again does not add its articles twice
+        month = [
+            {"_id": "1", "web_url": "https://www.nytimes.com/2020/01/01/us/a.html"},
+            {"_id": "2", "web_url": "https://www.nytimes.com/2020/01/02/us/b.html"},
+        ]
+        size = os.path.getsize(os.path.join(self.path, "docs.jsonl"))
+        self.assertEqual(self.index.add(month), 0)
+        self.assertEqual(len(self.index), 2)
+
+        self.index.close()
+        self.index = UrlIndex(self.path)
+        self.assertEqual(self.index.add(month), 0)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(
+            os.path.getsize(os.path.join(self.path, "docs.jsonl")), size
+        )
+
+        # A changed article is added
+        month[0]["headline"] = {"main": "A"}
+        self.assertEqual(self.index.add(month), 1)
+        self.assertEqual(len(self.index), 3)
+
+    def test_reopen(self):
+        self.index.close()
+        self.index = UrlIndex(self.path)
+        self.assertEqual(len(self.index), 2)
+
+        # A later version of an article replaces the earlier one
+        url = "https://www.nytimes.com/2020/01/01/us/a.html"
+        self.index.add([{"_id": "1b", "web_url": url}])
+        self.assertEqual(self.index.get(url)["_id"], "1b")
+
+        # Articles that were added but not saved are indexed again
+        with open(os.path.join(self.path, "docs.jsonl"), "ab") as f:
+            f.write(b'{"_id": "4", "web_url": "https://www.nytimes.com/d.html"}\n')
+            f.write(b'{"_id": "5", "web_u')
+
+        self.index.close()
+        self.index = UrlIndex(self.path)
+        self.assertEqual(self.index.get(url)["_id"], "1b")
+        self.assertEqual(self.index.get("https://nytimes.com/d.html")["_id"], "4")
+
+    def test_merge(self):
+        path = os.path.join(self.path, "merge.idx")
+        hash_index_merge(path, None, {5: [1], 1: [2, 3], 9: [4]}, tag=7)
+
+        # Added values of a key come after the values that are in the index
+        hash_index_merge(path, HashIndex(path), {0: [5], 5: [6], 7: [7]}, tag=8)
+        index = HashIndex(path)
+        self.assertEqual(
+            list(index.items()),
+            [(0, 5), (1, 2), (1, 3), (5, 1), (5, 6), (7, 7), (9, 4)],
+        )
+        self.assertEqual(index.tag, 8)
+        index.close()
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            UrlIndex(1)  # type:ignore
+
+
+class TestArticleLog(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.log = ArticleLog(self.path, block_size=100)
+        self.log.add(
+            [
+                {"uri": f"nyt://article/{i}", "headline": {"main": "A" * 40}}
+                for i in range(10)
+            ]
+            + [{"_id": "nyt://article/10"}, {"headline": {"main": "Without uri"}}]
+        )
+
+    def tearDown(self):
+        self.log.close()
+
+    def test_get(self):
+        self.assertEqual(len(self.log), 11)
+        self.assertIn("nyt://article/3", self.log)
+        self.assertEqual(self.log.get("nyt://article/10"), {"_id": "nyt://article/10"})
+        self.assertIsNone(self.log.get("nyt://article/11"))
+
+        uris = ["nyt://article/9", "nyt://article/11", "nyt://article/0"]
+        self.assertEqual(list(self.log.get_many(uris)), ["nyt://article/9", uris[2]])
+
+    def test_reopen(self):
+        self.log.close()
+        self.log = ArticleLog(self.path)
+        self.assertEqual(len(self.log), 11)
+        self.assertEqual(len(list(self.log)), 11)
+
+        # A later version of an article replaces the earlier one
+        self.log.add([{"uri": "nyt://article/1", "section_name": "World"}])
+        self.assertEqual(self.log.get("nyt://article/1")["section_name"], "World")
+        self.log.close()
+
+        # A block that was not completely written is dropped
+        with open(os.path.join(self.path, "articles.log"), "ab") as f:
+            f.write(b"\x10\x00\x00\x00\x01\x00\x00\x00x")
+
+        self.log = ArticleLog(self.path)
+        self.assertEqual(len(self.log), 12)
+        self.assertEqual(self.log.get("nyt://article/1")["section_name"], "World")
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            ArticleLog(1)  # type:ignore
+
+        with self.assertRaises(ValueError):
+            ArticleLog(self.path, block_size=0)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages(self):
+        pipeline = (
+            Pipeline(range(10))
+            .flat_map(lambda i: [i, i], name="double")
+            .map(lambda i: i * 2, workers=1)
+            .filter(lambda i: i % 3)
+            .batch(4)
+        )
+        self.assertEqual(
+            list(pipeline), [[2, 2, 4, 4], [8, 8, 10, 10], [14, 14, 16, 16]]
+        )
+
+        metrics = pipeline.metrics()
+        self.assertEqual(metrics["source"]["items_out"], 10)
+        self.assertEqual(metrics["double"]["items_out"], 20)
+        self.assertEqual(metrics["batch_3"]["items_in"], 12)
+
+    def test_sink(self):
+        results = []
+        metrics = Pipeline(range(100)).map(str, workers=4).sink(results.append).run()
+        self.assertEqual(sorted(results, key=int), [str(i) for i in range(100)])
+        self.assertEqual(metrics["sink_1"]["items_out"], 100)
+
+    def test_backpressure(self):
+        produced = []
+        done = threading.Event()
+
+        def source():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        pipeline = Pipeline(source(), queue_size=2).map(lambda i: i)
+        pipeline.sink(lambda i: done.wait())
+        thread = threading.Thread(target=pipeline.run)
+        thread.start()
+        time.sleep(0.5)
+
+        # Only the items in the queues and stages are produced
+        self.assertLess(len(produced), 10)
+        done.set()
+        thread.join()
+        self.assertEqual(len(produced), 1000)
+
+    def test_error(self):
+        def fail(i):
+            raise KeyError(i)
+
+        with self.assertRaises(KeyError):
+            Pipeline(range(1000), queue_size=1).map(fail).run()
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Pipeline([], queue_size=0)
+
+        with self.assertRaises(TypeError):
+            Pipeline([]).map(1)  # type:ignore
+
+        with self.assertRaises(ValueError):
+            Pipeline([]).map(str, name="source")
+
+        with self.assertRaises(ValueError):
+            Pipeline([]).sink(print).map(str)
+
+
+class TestCrawlQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = CrawlQueue(retry_delay=0)
+        self.queue.enqueue_many(
+            ("archive_metadata", {"date": datetime.date(2020, month, 1)})
+            for month in range(1, 4)
+        )
+
+    def test_enqueue(self):
+        self.assertEqual(len(self.queue), 3)
+        self.assertFalse(
+            self.queue.enqueue("archive_metadata", {"date": datetime.date(2020, 1, 1)})
+        )
+        self.assertTrue(self.queue.enqueue("top_stories"))
+        self.assertEqual(len(self.queue), 4)
+
+    def test_lease(self):
+        first = self.queue.lease("a")
+        self.assertEqual(first[0]["params"], {"date": datetime.date(2020, 1, 1)})
+        self.assertEqual(len(self.queue.lease("b", count=5)), 2)
+        self.assertEqual(self.queue.lease("c"), [])
+
+        self.assertTrue(self.queue.complete(first[0]))
+        status = self.queue.status()
+        self.assertEqual(status["done"], 1)
+        self.assertEqual((status["leased"], status["workers"]), (2, 1))
+        self.assertIsNotNone(status["eta_seconds"])
+
+    def test_expired_lease(self):
+        unit = self.queue.lease("a", seconds=0)[0]
+        again = self.queue.lease("b")[0]
+        self.assertEqual((again["id"], again["attempts"]), (unit["id"], 2))
+
+        # The first worker lost the unit
+        self.assertFalse(self.queue.complete(unit))
+        self.assertTrue(self.queue.complete(again))
+
+    def test_retry(self):
+        queue = CrawlQueue(max_attempts=2, retry_delay=0)
+        queue.enqueue("top_stories", {"section": "world"})
+
+        self.assertTrue(queue.fail(queue.lease("a")[0], "KeyError"))
+        self.assertEqual(queue.status()["pending"], 1)
+        self.assertTrue(queue.fail(queue.lease("a")[0], "KeyError"))
+        self.assertEqual(queue.failed()[0]["error"], "KeyError")
+        self.assertEqual(queue.lease("a"), [])
+
+        self.assertEqual(queue.retry_failed(), 1)
+        self.assertEqual(queue.lease("a")[0]["attempts"], 1)
+
+    def test_crawl(self):
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/topstories/v2/home.json",
+                    {},
+                    {"results": [{"title": "Replayed"}]},
+                )
+            ]
+        )
+
+        queue = CrawlQueue(max_attempts=1)
+        queue.enqueue("top_stories")
+        queue.enqueue("top_stories", {"section": "world"})
+        queue.enqueue("_NYTAPI__request")
+
+        results = []
+        nyt = NYTAPI("key", cassette=Cassette(path))
+        completed = nyt.crawl(queue, sink=lambda unit, result: results.append(result))
+        self.assertEqual(completed, 1)
+        self.assertEqual(results, [[{"title": "Replayed"}]])
+        self.assertEqual(queue.status()["failed"], 2)
+
+    def test_backend(self):
+        class ListBackend(CrawlBackend):
+            """Backend that only keeps the status of every unit"""
+
+            def __init__(self):
+                self.units = []
+
+            def enqueue_many(self, units):
+                added = [
+                    {"id": i, "endpoint": endpoint, "params": params}
+                    for i, (endpoint, params) in enumerate(units, len(self.units))
+                ]
+                self.units += added
+                return len(added)
+
+            def lease(self, worker, seconds=300, count=1):
+                pending = [unit for unit in self.units if "status" not in unit]
+                for unit in pending[:count]:
+                    unit.update(status="leased", worker=worker, attempts=1)
+                return pending[:count]
+
+            def complete(self, unit):
+                unit["status"] = "done"
+                return True
+
+            def fail(self, unit, error):
+                unit["status"] = "failed"
+                return True
+
+            def release(self, unit):
+                del unit["status"]
+                return True
+
+            def status(self):
+                statuses = [unit.get("status", "pending") for unit in self.units]
+                return {
+                    name: statuses.count(name)
+                    for name in ["pending", "leased", "done", "failed"]
+                }
+
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/topstories/v2/home.json",
+                    {},
+                    {"results": [{"title": "Replayed"}]},
+                )
+            ]
+        )
+        backend = ListBackend()
+        backend.enqueue("top_stories")
+        backend.enqueue("top_stories", {"section": "world"})
+
+        nyt = NYTAPI("key", cassette=Cassette(path))
+        self.assertEqual(nyt.crawl(backend), 1)
+        self.assertEqual(backend.status()["failed"], 1)
+
+        with self.assertRaises(NotImplementedError):
+            CrawlBackend().enqueue("top_stories")
+
+    def test_pickle(self):
+        path = os.path.join(tempfile.mkdtemp(), "crawl.sqlite")
+        queue = CrawlQueue(path)
+        queue.enqueue("top_stories")
+        self.assertEqual(len(pickle.loads(pickle.dumps(queue))), 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            CrawlQueue(max_attempts=0)
+
+        with self.assertRaises(TypeError):
+            self.queue.enqueue("top_stories", ["home"])  # type:ignore
+
+
+class TestBackfillPlan(unittest.TestCase):
+    def test_requests(self):
+        self.assertEqual(backfill_search_requests(100, 10), 10)
+        self.assertEqual(backfill_search_requests(5000, 10), 201)
+        self.assertEqual(backfill_search_requests(100, 10, hits=25), 4)
+        self.assertEqual(backfill_search_requests(100, 10, hits=0), 1)
+
+    def test_windows(self):
+        self.assertEqual(
+            backfill_search_windows(5000, 10, 100),
+            [(0, 1000, 100), (1000, 1000, 100), (2000, 10, 1)],
+        )
+        self.assertEqual(backfill_search_windows(100, 10, 5, hits=25), [(0, 40, 4)])
+
+        # Every window also loads the list of its start
+        start = datetime.date(2020, 1, 1)
+        self.assertEqual(
+            backfill_history_windows(start, datetime.date(2020, 1, 20), 3),
+            [
+                (start, datetime.date(2020, 1, 15), 3),
+                (datetime.date(2020, 1, 16), datetime.date(2020, 1, 20), 2),
+            ],
+        )
+
+        # With one request a window only loads the list of its start
+        self.assertEqual(
+            backfill_history_windows(start, datetime.date(2020, 1, 2), 1),
+            [(start, start, 1), (datetime.date(2020, 1, 2),) * 2 + (1,)],
+        )
+
+    def test_schedule(self):
+        self.assertEqual(backfill_schedule([3, 3, 3, 1], 5, 5), [0, 1, 2, 2])
+        self.assertEqual(backfill_schedule([3, 1], 5, 2), [1, 1])
+        with self.assertRaises(ValueError):
+            backfill_schedule([6], 5, 5)
+
+    def test_plan(self):
+        nyt = NYTAPI("key", quota=Quota(per_day=20))
+        plan = nyt.backfill_plan(
+            archive_months=[datetime.date(2020, month, 1) for month in range(1, 13)],
+            searches=[{"query": "Election", "results": 100}],
+            best_sellers=[
+                {
+                    "name": "hardcover-fiction",
+                    "start": datetime.date(2020, 1, 5),
+                    "end": datetime.date(2020, 12, 27),
+                }
+            ],
+        )
+
+        # 12 months, 10 pages, 51 weekly lists after the first list of the
+        # 3 windows of the history
+        self.assertEqual(plan.requests, 76)
+        self.assertEqual(plan.days, 5)
+        self.assertEqual(
+            plan.summary()[0], {"day": 0, "steps": 12, "requests": 12, "minutes": 3}
+        )
+        self.assertTrue(all(day["requests"] <= 20 for day in plan.summary()))
+
+        queue = CrawlQueue()
+        self.assertEqual(plan.enqueue(queue), len(plan))
+        self.assertEqual(plan.enqueue(queue), 0)
+
+    def test_invalid(self):
+        nyt = NYTAPI("key")
+        with self.assertRaises(ValueError):
+            nyt.backfill_plan(searches=[{"query": "Election", "pages": 3}])
+
+        with self.assertRaises(TypeError):
+            nyt.backfill_plan(
+                best_sellers=[{"name": "hardcover-fiction", "start": "2020-01-05"}]
+            )
+
+    def test_one_request_per_day(self):
+        nyt = NYTAPI("key")
+        plan = nyt.backfill_plan(
+            best_sellers=[
+                {
+                    "name": "hardcover-fiction",
+                    "start": datetime.date(2020, 1, 5),
+                    "end": datetime.date(2020, 1, 7),
+                }
+            ],
+            per_day=1,
+        )
+        self.assertEqual([step["day"] for step in plan.steps], [0, 1, 2])
+
+    def test_backfill_days(self):
+        path = write_cassette(
+            (
+                f"api.nytimes.com/svc/archive/v1/2020/{month}.json",
+                {},
+                {"response": {"docs": [{"_id": f"{month}-0"}]}},
+            )
+            for month in range(1, 6)
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+        plan = nyt.backfill_plan(
+            archive_months=[datetime.date(2020, month, 1) for month in range(1, 6)],
+            per_day=3,
+        )
+        queue = CrawlQueue()
+        loaded = []
+
+        # A run stops at the end of a day of the plan
+        status = nyt.backfill(plan, queue, sink=lambda unit, docs: loaded.append(docs))
+        self.assertEqual((status["day"], status["done"]), (0, 3))
+        self.assertFalse(status["complete"])
+        self.assertEqual(len(loaded), 3)
+
+        status = nyt.backfill(plan, queue)
+        self.assertEqual((status["day"], status["done"]), (1, 5))
+        self.assertTrue(status["complete"])
+
+    def test_split_search(self):
+        # A search that does not fit in a day is split in ranges of pages
+        nyt = NYTAPI("key")
+        plan = nyt.backfill_plan(searches=[{"results": 2000}], per_day=100)
+        self.assertEqual(
+            [
+                (step["params"]["offset"], step["params"]["results"], step["day"])
+                for step in plan.steps
+            ],
+            [(0, 1000, 0), (1000, 1000, 1)],
+        )
+
+        # Loading starts at the page of the offset
+        path = write_cassette(
+            [
+                (
+                    "api.nytimes.com/svc/search/v2/articlesearch.json",
+                    {"fq": "", "page": "1", "q": "Election"},
+                    {"response": {"docs": [{"_id": "1-0"}], "meta": {"hits": 11}}},
+                )
+            ]
+        )
+        nyt = NYTAPI("key", cassette=Cassette(path))
+        articles = nyt.article_search("Election", offset=10)
+        self.assertEqual(articles, [{"_id": "1-0"}])
+
+        with self.assertRaises(ValueError):
+            nyt.article_search("Election", offset=5)
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.path = write_cassette(
+            (
+                "api.nytimes.com/svc/search/v2/articlesearch.json",
+                {"fq": "", "page": str(page), "q": "Election"},
+                {
+                    "response": {
+                        "docs": [{"_id": f"{page}-{i}"} for i in range(10)],
+                        "meta": {"hits": 100},
+                    }
+                },
+            )
+            for page in range(3)
+        )
+
+    def test_complete(self):
+        nyt = NYTAPI("key", cassette=Cassette(self.path))
+        articles = nyt.article_search("Election", results=30)
+        self.assertEqual(len(articles), 30)
+        self.assertFalse(articles.partial)
+        self.assertIsNone(articles.reason)
+
+    def test_max_requests(self):
+        nyt = NYTAPI("key", cassette=Cassette(self.path))
+        articles = nyt.article_search("Election", results=30, max_requests=2)
+        self.assertIsInstance(articles, PartialResults)
+        self.assertEqual(len(articles), 20)
+        self.assertTrue(articles.partial)
+        self.assertEqual(articles.reason, "max_requests")
+
+    def test_deadline(self):
+        # The second page is not started, its response is not expected
+        # before the deadline
+        nyt = NYTAPI("key", cassette=Cassette(self.path, latency=0.2))
+        start = time.monotonic()
+        articles = nyt.article_search("Election", results=30, deadline=0.3)
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(len(articles), 10)
+        self.assertTrue(articles.partial)
+        self.assertEqual(articles.reason, "deadline")
+
+        # A response that is slower than the deadline is not waited for
+        nyt = NYTAPI("key", cassette=Cassette(self.path, latency=1))
+        start = time.monotonic()
+        articles = nyt.article_search("Election", results=30, deadline=0.2)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(articles, [])
+        self.assertTrue(articles.partial)
+        self.assertEqual(articles.reason, "deadline")
+
+    def test_backoff_deadline(self):
+        # A retry that would sleep past the deadline is not made
+        history = (RequestHistory("GET", "/", None, 429, None),) * 2
+        retry = BackoffRetry(backoff_factor=10, backoff_jitter=0, history=history)
+        BackoffRetry.set_deadline(time.monotonic() + 1)
+        try:
+            with self.assertRaises(BudgetExceededError):
+                retry.sleep()
+        finally:
+            BackoffRetry.set_deadline(None)
+
+    def test_quota_timeout(self):
+        nyt = NYTAPI("key", quota=Quota(per_minute=1))
+        nyt.quota.acquire()
+        start = time.monotonic()
+        articles = nyt.article_search("Election", deadline=0.2)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(articles, [])
+        self.assertEqual(articles.reason, "deadline")
+
+    def test_article_search_local(self):
+        # Months that are not stored are searched with the API before the
+        # deadline
+        nyt = NYTAPI("key", quota=Quota(per_minute=1), store=ArticleStore())
+        nyt.quota.acquire()
+        articles = nyt.article_search_local(
+            "Election",
+            dates={
+                "begin": datetime.date(2020, 1, 1),
+                "end": datetime.date(2020, 1, 31),
+            },
+            deadline=0.2,
+        )
+        self.assertEqual(articles, [])
+        self.assertTrue(articles.partial)
+        self.assertEqual(articles.reason, "deadline")
+
+    def test_budget(self):
+        budget = RequestBudget(None, 1)
+        self.assertIsNone(budget.remaining())
+        budget.take()
+        with self.assertRaises(BudgetExceededError) as context:
+            budget.take()
+
+        self.assertEqual(context.exception.reason, "max_requests")
+
+    def test_invalid(self):
+        nyt = NYTAPI("key")
+        with self.assertRaises(ValueError):
+            nyt.article_search("Election", deadline=0)
+
+        with self.assertRaises(TypeError):
+            nyt.article_search("Election", max_requests=1.5)
+
+
 if __name__ == "__main__":
     if os.environ.get("FULL_TESTS", False):
         random_sleep_seconds = random.choice([0, 20, 40, 60, 80, 100])